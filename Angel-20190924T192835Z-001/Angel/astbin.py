@@ -0,0 +1,220 @@
+# coding: utf-8
+'''
+Formato binario compacto para los árboles de cast.py.
+
+    data = astbin.dumps(tree)
+    tree = astbin.loads(data)
+
+El archivo empieza con MAGIC, un byte de versión y 8 bytes con la huella
+de las clases de nodos (nombre y _fields de cada clase en AST._nodes, en
+orden). Después viene el árbol en preorden; cada valor empieza con un
+byte de etiqueta:
+
+    NODE   clase (varint, posición en AST._nodes), lineno y los campos
+    LIST   largo (varint) y los elementos
+    STR    largo (varint) y los bytes UTF-8; la cadena recibe el siguiente
+           número de la tabla de cadenas internadas
+    SREF   número (varint) de una cadena ya vista
+    INT    entero zigzag (varint)
+    FLOAT  8 bytes IEEE 754
+    NONE, TRUE, FALSE
+    ABSENT el nodo no tiene lineno
+
+Los nodos se decodifican sin pasar por el constructor (no se validan
+tipos) y ni la codificación ni la decodificación usan recursión.
+'''
+import hashlib
+import struct
+
+from cast import AST
+
+MAGIC = b'MCAST'
+VERSION = 1
+
+(NODE, LIST, STR, SREF, INT, FLOAT, NONE, TRUE, FALSE, ABSENT) = range(10)
+
+_double = struct.Struct('<d')
+
+# Marca de un nodo sin atributo lineno
+_absent = object()
+
+
+class FormatError(ValueError):
+	pass
+
+
+def _layout():
+	'''
+	Clases de nodos en orden, su tabla inversa y la huella del formato.
+	'''
+	classes = list(AST._nodes.values())
+	h = hashlib.sha256()
+	for cls in classes:
+		h.update(f'{cls.__name__}:{",".join(getattr(cls, "_fields", ()))};'.encode())
+	return classes, { cls: i for i, cls in enumerate(classes) }, h.digest()[:8]
+
+
+def _write_varint(out, value):
+	while value > 0x7f:
+		out.append((value & 0x7f) | 0x80)
+		value >>= 7
+	out.append(value)
+
+
+def dumps(tree):
+	'''
+	Codifica tree (un nodo, una lista o None) y retorna bytes.
+	'''
+	classes, kinds, fingerprint = _layout()
+	out = bytearray(MAGIC)
+	out.append(VERSION)
+	out += fingerprint
+	append = out.append
+	strings = { }
+	stack = [tree]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		value = pop()
+		cls = value.__class__
+		if cls is str:
+			index = strings.get(value)
+			if index is None:
+				strings[value] = len(strings)
+				data = value.encode('utf-8', 'surrogatepass')
+				append(STR)
+				_write_varint(out, len(data))
+				out += data
+			else:
+				append(SREF)
+				_write_varint(out, index)
+		elif value is None:
+			append(NONE)
+		elif cls is list:
+			append(LIST)
+			_write_varint(out, len(value))
+			for item in reversed(value):
+				push(item)
+		elif cls is bool:
+			append(TRUE if value else FALSE)
+		elif cls is int:
+			append(INT)
+			_write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+		elif cls is float:
+			append(FLOAT)
+			out += _double.pack(value)
+		elif isinstance(value, AST):
+			kind = kinds.get(cls)
+			if kind is None:
+				raise FormatError(f'Clase de nodo desconocida: {cls.__name__}')
+			append(NODE)
+			_write_varint(out, kind)
+			for name in reversed(cls._fields):
+				push(getattr(value, name))
+			lineno = getattr(value, 'lineno', _absent)
+			if lineno is _absent:
+				append(ABSENT)
+			else:
+				push(lineno)
+		else:
+			raise FormatError(f'No se puede codificar {cls.__name__}')
+	return bytes(out)
+
+
+def loads(data):
+	'''
+	Decodifica bytes producidos por dumps().
+	'''
+	classes, _, fingerprint = _layout()
+	header = len(MAGIC) + 1 + len(fingerprint)
+	if data[:len(MAGIC)] != MAGIC:
+		raise FormatError('No es un AST binario de MiniC')
+	if data[len(MAGIC)] != VERSION:
+		raise FormatError(f'Versión {data[len(MAGIC)]} no soportada')
+	if data[len(MAGIC)+1:header] != fingerprint:
+		raise FormatError('Las clases de cast.py no coinciden con las del archivo')
+
+	try:
+		return _decode(memoryview(data), header, classes)
+	except (IndexError, struct.error):
+		raise FormatError('Datos truncados') from None
+
+
+def _decode(data, pos, classes):
+	strings = []
+	absent = _absent
+	# Marco actual: destino, nombres de campos (None si es una lista),
+	# siguiente posición y total. La posición -1 de un nodo es su lineno.
+	# Los marcos de los contenedores abiertos se guardan en saved.
+	root = []
+	target, names, i, total = root, None, 0, 1
+	saved = []
+	while True:
+		tag = data[pos]
+		pos += 1
+		container = None
+		if tag <= INT:
+			n = 0
+			shift = 0
+			while True:
+				byte = data[pos]
+				pos += 1
+				n |= (byte & 0x7f) << shift
+				if byte < 0x80:
+					break
+				shift += 7
+			if tag == NODE:
+				cls = classes[n]
+				value = cls.__new__(cls)
+				container = (value, cls._fields, -1, len(cls._fields))
+			elif tag == SREF:
+				value = strings[n]
+			elif tag == STR:
+				if pos + n > len(data):
+					raise IndexError
+				value = str(data[pos:pos+n], 'utf-8', 'surrogatepass')
+				pos += n
+				strings.append(value)
+			elif tag == INT:
+				value = (n >> 1) if not n & 1 else -((n + 1) >> 1)
+			else:
+				value = []
+				container = (value, None, 0, n)
+		elif tag == NONE:
+			value = None
+		elif tag == FLOAT:
+			value = _double.unpack_from(data, pos)[0]
+			pos += 8
+		elif tag == TRUE:
+			value = True
+		elif tag == FALSE:
+			value = False
+		elif tag == ABSENT:
+			value = absent
+		else:
+			raise FormatError(f'Etiqueta desconocida {tag}')
+
+		# Guardar el valor en el contenedor actual
+		if names is None:
+			target.append(value)
+		elif i < 0:
+			if value is not absent:
+				target.lineno = value
+		else:
+			setattr(target, names[i], value)
+		i += 1
+		if container is not None:
+			saved.append((target, names, i, total))
+			target, names, i, total = container
+		while i >= total:
+			if not saved:
+				return root[0]
+			target, names, i, total = saved.pop()
+
+
+def dump(tree, f):
+	f.write(dumps(tree))
+
+
+def load(f):
+	return loads(f.read())
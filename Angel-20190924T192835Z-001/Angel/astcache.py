@@ -0,0 +1,199 @@
+# coding: utf-8
+'''
+Cache en disco de los AST producidos por cparse.parse().
+
+La llave de cada entrada es el hash del código fuente más una huella de
+la gramática (las tablas de cparse.Parser), de las clases de cast.py y
+del código fuente de los módulos que producen el árbol: cparse.py (las
+acciones de las reglas), lexer.py (las expresiones regulares) y el
+módulo del analizador léxico usado, p.ej. scanner.py. Cambiar cualquiera
+de ellos invalida el cache. En un acierto no se analiza nada: se carga
+el árbol guardado (en el formato de astbin) y se vuelven a reportar los
+mensajes de error que produjo el análisis original.
+
+    cache = ASTCache('/tmp/minic-cache', max_bytes=256 << 20)
+    ast = cache.parse(source)
+    print(cache.hits, cache.misses)
+
+Varios procesos pueden compartir el directorio: cada entrada se escribe
+en un archivo temporal y se renombra, y la política LRU usa la fecha de
+modificación de los archivos, que se actualiza en cada acierto. Cuando
+el directorio supera max_bytes se borran las entradas más viejas.
+'''
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+import astbin
+import errors
+from cast import AST
+
+# Se incrementa cada vez que cambie el formato de las entradas
+CACHE_VERSION = 2
+
+SUFFIX = '.ast'
+
+
+def _nodes_fingerprint():
+	layout = sorted((name, tuple(getattr(cls, '_fields', ()))) for name, cls in AST._nodes.items())
+	return repr(layout)
+
+
+def _module_fingerprint(name):
+	'''
+	Hash del código fuente del módulo name (ya importado).
+	'''
+	module = sys.modules[name]
+	h = hashlib.sha256(name.encode() + b'\0')
+	path = getattr(module, '__file__', None)
+	if path is not None:
+		with open(path, 'rb') as f:
+			h.update(f.read())
+	return h.hexdigest()
+
+
+class ASTCache(object):
+	'''
+	Cache LRU de AST en un directorio, limitado a max_bytes.
+	'''
+	def __init__(self, directory, max_bytes=256 << 20):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self._size = None
+		os.makedirs(directory, exist_ok=True)
+		import cparse
+		h = hashlib.sha256()
+		h.update(f'{CACHE_VERSION}:{cparse.Parser._fingerprint}:'.encode())
+		h.update(_nodes_fingerprint().encode())
+		for name in ('cparse', 'lexer'):
+			h.update(_module_fingerprint(name).encode())
+		self._fingerprint = h.digest()
+		self._lexers = { }
+
+	def _lexer_fingerprint(self, cls):
+		fp = self._lexers.get(cls)
+		if fp is None:
+			fp = f'{cls.__module__}.{cls.__qualname__}:{_module_fingerprint(cls.__module__)}'.encode()
+			self._lexers[cls] = fp
+		return fp
+
+	def key(self, source, lexer=None):
+		h = hashlib.sha256(self._fingerprint)
+		if lexer is None:
+			import cparse
+			cls = cparse.Lexer
+		else:
+			cls = type(lexer)
+		h.update(self._lexer_fingerprint(cls) + b'\0')
+		h.update(source.encode('utf-8', 'surrogatepass'))
+		return h.hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.directory, key + SUFFIX)
+
+	def parse(self, source, lexer=None, parser=None):
+		'''
+		Igual que cparse.parse(source, lexer), usando el cache. Si se da
+		parser, se usa en lugar de crear un cparse.Parser en cada fallo.
+		'''
+		key = self.key(source, lexer)
+		entry = self._load(key)
+		if entry is not None:
+			self.hits += 1
+			ast, records = entry
+		else:
+			self.misses += 1
+			import cparse
+			if parser is None:
+				parser = cparse.Parser()
+			if lexer is None:
+				lexer = cparse.Lexer()
+			with errors.Diagnostics(echo=False) as diag:
+				ast = parser.parse(lexer.tokenize(source))
+			records = diag.records
+			self._store(key, ast, records)
+		active = errors.current()
+		for d in records:
+			active.report(d.lineno, d.message, d.filename, d.column, d.code, d.severity)
+		return ast
+
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses}
+
+	def _load(self, key):
+		path = self._path(key)
+		try:
+			with open(path, 'rb') as f:
+				version, stored_key, data, records = pickle.load(f)
+			if version != CACHE_VERSION or stored_key != key:
+				return None
+			ast = astbin.loads(data)
+		except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError,
+				ImportError, TypeError):
+			return None
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return ast, records
+
+	def _store(self, key, ast, records):
+		data = pickle.dumps((CACHE_VERSION, key, astbin.dumps(ast), records), pickle.HIGHEST_PROTOCOL)
+		try:
+			fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+			with os.fdopen(fd, 'wb') as f:
+				f.write(data)
+			os.replace(tmp, self._path(key))
+		except OSError:
+			return
+		if self._size is None:
+			self._size = self._disk_usage()
+		else:
+			self._size += len(data)
+		if self._size > self.max_bytes:
+			self.evict()
+
+	def _entries(self):
+		entries = []
+		with os.scandir(self.directory) as it:
+			for entry in it:
+				if entry.name.endswith(SUFFIX):
+					try:
+						st = entry.stat()
+					except OSError:
+						continue
+					entries.append((st.st_mtime, st.st_size, entry.path))
+		return entries
+
+	def _disk_usage(self):
+		return sum(size for _, size, _ in self._entries())
+
+	def evict(self):
+		'''
+		Borra las entradas usadas hace más tiempo hasta dejar el directorio
+		por debajo del 90% de max_bytes.
+		'''
+		entries = sorted(self._entries())
+		total = sum(size for _, size, _ in entries)
+		limit = self.max_bytes * 9 // 10
+		for _, size, path in entries:
+			if total <= limit:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			total -= size
+		self._size = total
+
+	def clear(self):
+		for _, _, path in self._entries():
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+		self._size = 0
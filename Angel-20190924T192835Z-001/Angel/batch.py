@@ -0,0 +1,151 @@
+# coding: utf-8
+'''
+Compilación por lotes de muchos archivos MiniC.
+
+Los archivos se reparten entre los procesos de un ProcessPoolExecutor en
+grupos de CHUNKSIZE, para no pagar una tarea (y su envío entre procesos)
+por cada archivo pequeño. Cada proceso construye un solo Lexer y un solo
+Parser al arrancar y los reutiliza para todos sus archivos. Los
+resultados se entregan a medida que termina cada grupo. Con --cache los procesos comparten un
+astcache.ASTCache y los archivos sin cambios no se vuelven a analizar.
+
+    python minic.py batch [-j N] [--cache DIR] directorio_o_archivo ...
+'''
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from errors import Diagnostics
+
+FileResult = namedtuple('FileResult', ['filename', 'errors', 'seconds', 'cached'],
+	defaults=(False,))
+
+# Archivos por tarea del pool
+CHUNKSIZE = 16
+
+# Analizador "caliente" de cada proceso de trabajo
+_lexer = None
+_parser = None
+_cache = None
+
+
+def _init_worker(fast_scanner=False, cache_dir=None):
+	global _lexer, _parser, _cache
+	# SLY reporta advertencias de la gramática al importar cparse; no
+	# tiene sentido repetirlas una vez por proceso.
+	with contextlib.redirect_stderr(io.StringIO()):
+		from lexer import Lexer
+		from scanner import Scanner
+		from cparse import Parser
+	_lexer = Scanner() if fast_scanner else Lexer()
+	_parser = Parser()
+	if cache_dir:
+		from astcache import ASTCache
+		_cache = ASTCache(cache_dir)
+
+
+def check_file(filename):
+	'''
+	Analiza un archivo con el analizador del proceso y devuelve un
+	FileResult con la lista de errors.Diagnostic y el tiempo empleado.
+	'''
+	if _parser is None:
+		_init_worker()
+	start = time.perf_counter()
+	cached = False
+	with Diagnostics(filename=filename, echo=False) as diag:
+		try:
+			with open(filename) as f:
+				source = f.read()
+			if _cache is not None:
+				hits = _cache.hits
+				_cache.parse(source, _lexer, _parser)
+				cached = _cache.hits > hits
+			else:
+				_parser.parse(_lexer.tokenize(source))
+		except Exception as e:
+			diag.report(None, f'{type(e).__name__}: {e}', code='excepcion')
+	return FileResult(filename, diag.records, time.perf_counter() - start, cached)
+
+
+def check_chunk(filenames):
+	'''
+	check_file() de cada archivo de la lista, en orden.
+	'''
+	return [ check_file(name) for name in filenames ]
+
+
+def find_sources(paths, suffix='.c'):
+	'''
+	Expande directorios (recursivamente) a la lista de archivos fuente.
+	'''
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, files in os.walk(path):
+				dirs.sort()
+				for name in sorted(files):
+					if name.endswith(suffix):
+						yield os.path.join(root, name)
+		else:
+			yield path
+
+
+def check_files(filenames, jobs=None, fast_scanner=False, cache_dir=None, chunksize=CHUNKSIZE):
+	'''
+	Generador que produce un FileResult por archivo. Los archivos se
+	envían en grupos de chunksize y los resultados de cada grupo salen
+	juntos, en el orden en que terminan los grupos. Con fast_scanner=True
+	se usa scanner.Scanner en lugar de lexer.Lexer; con cache_dir se usa
+	un ASTCache en ese directorio.
+	'''
+	with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+			initargs=(fast_scanner, cache_dir)) as pool:
+		futures = []
+		chunk = []
+		for name in filenames:
+			chunk.append(name)
+			if len(chunk) >= chunksize:
+				futures.append(pool.submit(check_chunk, chunk))
+				chunk = []
+		if chunk:
+			futures.append(pool.submit(check_chunk, chunk))
+		for future in as_completed(futures):
+			yield from future.result()
+
+
+def main(argv=None):
+	import argparse
+	ap = argparse.ArgumentParser(prog='minic batch',
+		description='Analiza muchos archivos MiniC en paralelo')
+	ap.add_argument('paths', nargs='+', help='archivos o directorios')
+	ap.add_argument('-j', '--jobs', type=int, default=None, help='número de procesos')
+	ap.add_argument('--fast-scanner', action='store_true',
+		help='usar scanner.Scanner en lugar de lexer.Lexer')
+	ap.add_argument('--cache', metavar='DIR', default=None,
+		help='directorio del cache de AST')
+	ap.add_argument('-q', '--quiet', action='store_true', help='solo mostrar archivos con errores')
+	args = ap.parse_args(argv)
+
+	start = time.perf_counter()
+	nfiles = nfailed = nhits = 0
+	for result in check_files(find_sources(args.paths), args.jobs, args.fast_scanner, args.cache):
+		nfiles += 1
+		nhits += result.cached
+		if result.errors:
+			nfailed += 1
+			print(f'{result.filename}: {len(result.errors)} errores ({result.seconds*1000:.1f} ms)')
+			for diag in result.errors:
+				print(f'    {diag}')
+		elif not args.quiet:
+			print(f'{result.filename}: OK ({result.seconds*1000:.1f} ms)')
+		sys.stdout.flush()
+	elapsed = time.perf_counter() - start
+	summary = f'{nfiles} archivos, {nfailed} con errores, {elapsed:.2f} s'
+	if args.cache:
+		summary += f', {nhits} en cache'
+	print(summary, file=sys.stderr)
+	return 1 if nfailed else 0
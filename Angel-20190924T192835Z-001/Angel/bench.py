@@ -0,0 +1,1063 @@
+# coding: utf-8
+'''
+Pruebas de rendimiento del compilador MiniC.
+
+Uso:
+
+    python bench.py nombre [nombre ...]
+
+Ejecute "python bench.py" sin argumentos para ver la lista de pruebas.
+'''
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from constfold import count_nodes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _report(name, seconds, extra=''):
+	print(f'{name:<40} {seconds*1000:10.2f} ms {extra}')
+
+
+def _timeit(func):
+	start = time.perf_counter()
+	func()
+	return time.perf_counter() - start
+
+
+def bench_startup(repeat=5):
+	'''
+	Tiempo de importar cparse y obtener las tablas LALR, sin cache (frío)
+	y con el cache ya escrito (caliente).
+	'''
+	code = 'import cparse; cparse.Parser._lrtable'
+	cachedir = tempfile.mkdtemp(prefix='minic-bench-')
+	env = dict(os.environ, MINIC_CACHE_DIR=cachedir)
+	env.pop('MINIC_PARSER_DEBUG', None)
+	env.pop('MINIC_NO_TABLE_CACHE', None)
+
+	def run():
+		start = time.perf_counter()
+		subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+			stderr=subprocess.DEVNULL, check=True)
+		return time.perf_counter() - start
+
+	try:
+		cold = []
+		for _ in range(repeat):
+			shutil.rmtree(cachedir, ignore_errors=True)
+			cold.append(run())
+		warm = [ run() for _ in range(repeat) ]
+	finally:
+		shutil.rmtree(cachedir, ignore_errors=True)
+	_report('import cparse (frio)', min(cold))
+	_report('import cparse (caliente)', min(warm), f'x{min(cold)/min(warm):.1f}')
+
+
+def generate_source(nfuncs, seed=0):
+	'''
+	Genera un programa MiniC sintético con nfuncs funciones.
+	'''
+	import random
+	rnd = random.Random(seed)
+	out = []
+	for i in range(nfuncs):
+		out.append(f'int f{i}(int a, int b) {{\n')
+		out.append('    int x;\n    int y;\n')
+		for j in range(rnd.randint(2, 8)):
+			out.append(f'    x = a * {rnd.randint(1, 99)} + b - y / {rnd.randint(1, 9)};\n')
+			out.append(f'    while (x > {j}) {{ x = x - 1; y = y + x; }}\n')
+		out.append('    if (x < y) return x; else return y;\n}\n')
+	return ''.join(out)
+
+
+def build_tree(nfuncs, nstmts=8):
+	'''
+	Construye directamente (sin el analizador) un Program con nfuncs
+	funciones de la forma:
+
+	    int fI(int a, int b) {
+	        int x = a; int y = b;
+	        while (x > 0) { y = y + x * K; x = x - 1; }   (nstmts veces)
+	        if (y > K) return y - K; else return y + K;
+	    }
+	'''
+	from cast import (Program, FuncDeclaration, FuncParameter, SimpleType,
+		Compound_Stmt, LocalDecl, While_Stmt, If_Stmt, Return_Stmt, WriteLocation,
+		ReadLocation, SimpleLocation, BinOp, IntegerLiteral)
+
+	def var(name, line):
+		return ReadLocation(SimpleLocation(name, lineno=line), lineno=line)
+
+	def assign(name, value, line):
+		return WriteLocation(SimpleLocation(name, lineno=line), value, lineno=line)
+
+	decls = []
+	line = 1
+	for i in range(nfuncs):
+		int_t = SimpleType('int', lineno=line)
+		params = [FuncParameter('a', int_t, lineno=line), FuncParameter('b', int_t, lineno=line)]
+		local = [LocalDecl('x', int_t, var('a', line), lineno=line),
+			LocalDecl('y', int_t, var('b', line), lineno=line)]
+		stmts = []
+		for j in range(nstmts):
+			line += 1
+			k = IntegerLiteral(j + 1, lineno=line)
+			body = Compound_Stmt([], [
+				assign('y', BinOp('+', var('y', line), BinOp('*', var('x', line), k, lineno=line), lineno=line), line),
+				assign('x', BinOp('-', var('x', line), IntegerLiteral(1, lineno=line), lineno=line), line),
+			], lineno=line)
+			stmts.append(While_Stmt(BinOp('>', var('x', line), IntegerLiteral(0, lineno=line), lineno=line),
+				body, lineno=line))
+		line += 1
+		k = IntegerLiteral(nstmts, lineno=line)
+		stmts.append(If_Stmt(BinOp('>', var('y', line), k, lineno=line),
+			Return_Stmt(BinOp('-', var('y', line), k, lineno=line), lineno=line),
+			Return_Stmt(BinOp('+', var('y', line), k, lineno=line), lineno=line), lineno=line))
+		decls.append(FuncDeclaration(f'f{i}', params, int_t,
+			Compound_Stmt(local, stmts, lineno=line), lineno=line))
+		line += 1
+	return Program(decls)
+
+
+def bench_batch(nfiles=400):
+	'''
+	Análisis de muchos archivos: un Parser nuevo por archivo en un solo
+	proceso contra batch.check_files() con procesos y analizadores
+	reutilizados.
+	'''
+	import batch
+	tmpdir = tempfile.mkdtemp(prefix='minic-bench-')
+	try:
+		names = []
+		for i in range(nfiles):
+			name = os.path.join(tmpdir, f'f{i}.c')
+			with open(name, 'w') as f:
+				f.write(generate_parseable_source(20 + i % 7))
+			names.append(name)
+
+		with contextlib.redirect_stderr(io.StringIO()):
+			import cparse
+			start = time.perf_counter()
+			for name in names:
+				with open(name) as f:
+					cparse.parse(f.read())
+			serial = time.perf_counter() - start
+
+		start = time.perf_counter()
+		count = 0
+		for result in batch.check_files(names):
+			if not count:
+				first = time.perf_counter() - start
+			assert not result.errors, result
+			count += 1
+		parallel = time.perf_counter() - start
+	finally:
+		shutil.rmtree(tmpdir, ignore_errors=True)
+	_report(f'cparse.parse x{nfiles} (serie)', serial)
+	_report(f'batch.check_files x{count} ({os.cpu_count()} cpus)', parallel, f'x{serial/parallel:.1f}')
+	_report('batch.check_files primer resultado', first)
+
+
+def _count_tokens(lexer, text):
+	count = 0
+	for _ in lexer.tokenize(text):
+		count += 1
+	return count
+
+
+def bench_scanner(nfuncs=8000, repeat=3):
+	'''
+	Tokens por segundo de lexer.Lexer (SLY) y scanner.Scanner sobre un
+	programa generado. Antes de medir se verifica que ambos produzcan
+	exactamente los mismos tokens.
+	'''
+	import scanner
+	from lexer import Lexer
+	text = generate_parseable_source(nfuncs)
+	with contextlib.redirect_stderr(io.StringIO()):
+		diff = scanner.compare(text)
+	if diff is not None:
+		print(f'Los analizadores difieren en el token {diff[0]}: {diff[1]} != {diff[2]}')
+		raise SystemExit(1)
+	results = []
+	for name, lexer in [('lexer.Lexer', Lexer()), ('scanner.Scanner', scanner.Scanner())]:
+		best = None
+		with contextlib.redirect_stderr(io.StringIO()):
+			for _ in range(repeat):
+				start = time.perf_counter()
+				ntoks = _count_tokens(lexer, text)
+				elapsed = time.perf_counter() - start
+				best = elapsed if best is None else min(best, elapsed)
+		results.append(best)
+		_report(f'{name} ({len(text)//1024} KB)', best, f'{ntoks/best:12,.0f} tokens/s')
+	print(f'aceleración x{results[0]/results[1]:.1f}')
+
+
+def bench_stream(sizes=(1000, 8000)):
+	'''
+	Memoria pico (tracemalloc) al tokenizar archivos de distinto tamaño
+	leyéndolos completos contra scanner.tokenize_file().
+	'''
+	import tracemalloc
+	import scanner
+	tmpdir = tempfile.mkdtemp(prefix='minic-bench-')
+	try:
+		for nfuncs in sizes:
+			name = os.path.join(tmpdir, f'big{nfuncs}.c')
+			with open(name, 'w') as f:
+				f.write(generate_source(nfuncs))
+			size = os.path.getsize(name) // 1024
+
+			def whole():
+				with open(name) as f:
+					return _count_tokens(scanner.Scanner(), f.read())
+
+			def streamed():
+				with open(name) as f:
+					count = 0
+					for _ in scanner.tokenize_file(f, chunk_size=64 * 1024):
+						count += 1
+					return count
+
+			for label, func in [('f.read()', whole), ('tokenize_file', streamed)]:
+				with open(os.devnull, 'w') as null, contextlib.redirect_stderr(null):
+					tracemalloc.start()
+					start = time.perf_counter()
+					func()
+					elapsed = time.perf_counter() - start
+					peak = tracemalloc.get_traced_memory()[1]
+					tracemalloc.stop()
+				_report(f'{label} ({size} KB)', elapsed, f'pico {peak/1024:10.0f} KB')
+	finally:
+		shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _as_dict_nodes(node, classes):
+	'''
+	Copia del árbol con nodos que guardan sus campos en __dict__, como
+	antes de que cast.AST usara __slots__.
+	'''
+	from cast import AST
+	if isinstance(node, list):
+		return [ _as_dict_nodes(item, classes) for item in node ]
+	if not isinstance(node, AST):
+		return node
+	cls = type(node)
+	if cls not in classes:
+		classes[cls] = type(cls.__name__, (object,), {})
+	copy = classes[cls]()
+	for name in cls._fields:
+		setattr(copy, name, _as_dict_nodes(getattr(node, name), classes))
+	if hasattr(node, 'lineno'):
+		copy.lineno = node.lineno
+	return copy
+
+
+def bench_memory(nfuncs=2000):
+	'''
+	Bytes por nodo del AST con __slots__ contra nodos con __dict__.
+	'''
+	import tracemalloc
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	tree = build_tree(nfuncs)
+	slots = tracemalloc.get_traced_memory()[0] - before
+	classes = { }
+	_as_dict_nodes(build_tree(1), classes)
+	before = tracemalloc.get_traced_memory()[0]
+	dict_tree = _as_dict_nodes(tree, classes)
+	dicts = tracemalloc.get_traced_memory()[0] - before
+	tracemalloc.stop()
+	nodes = count_nodes(tree)
+	print(f'{nodes} nodos')
+	for label, size in [('__dict__', dicts), ('__slots__', slots)]:
+		print(f'{label:<12} {size/1024/1024:8.2f} MB  {size/nodes:8.1f} bytes/nodo')
+
+
+def bench_validate(nfuncs=2000, repeat=3):
+	'''
+	Construcción de nodos AST con validación de tipos (modo depuración)
+	y dentro de cast.trusted_nodes(), como lo hace cparse.Parser.
+	'''
+	from cast import trusted_nodes
+	checked = min(_timeit(lambda: build_tree(nfuncs)) for _ in range(repeat))
+	with trusted_nodes():
+		trusted = min(_timeit(lambda: build_tree(nfuncs)) for _ in range(repeat))
+	nodes = count_nodes(build_tree(nfuncs))
+	_report(f'validado ({nodes} nodos)', checked, f'{nodes/checked:12,.0f} nodos/s')
+	_report(f'confiado ({nodes} nodos)', trusted, f'{nodes/trusted:12,.0f} nodos/s x{checked/trusted:.1f}')
+
+
+def bench_visitor(nfuncs=5000):
+	'''
+	Recorrido de un árbol de ~1M nodos contando los BinOp con
+	cast.NodeVisitor (recursivo, getattr por nodo) y cast.NodeWalker (pila
+	explícita y tabla de despacho). También prueba una cadena de 100000
+	UnaryOp anidados, que NodeVisitor no puede recorrer.
+	'''
+	from cast import NodeVisitor, NodeWalker, UnaryOp, IntegerLiteral
+
+	class RecursiveCount(NodeVisitor):
+		def __init__(self):
+			self.count = 0
+		def visit_BinOp(self, node):
+			self.count += 1
+			self.generic_visit(node)
+
+	class WalkerCount(NodeWalker):
+		def __init__(self):
+			self.count = 0
+		def enter_BinOp(self, node):
+			self.count += 1
+
+	tree = build_tree(nfuncs)
+	nodes = count_nodes(tree)
+	results = []
+	for cls in (RecursiveCount, WalkerCount):
+		visitor = cls()
+		elapsed = _timeit(lambda: visitor.visit(tree))
+		results.append(elapsed)
+		_report(f'{cls.__bases__[0].__name__} ({nodes} nodos)', elapsed, f'{nodes/elapsed:12,.0f} nodos/s')
+	print(f'aceleración x{results[0]/results[1]:.1f}')
+
+	deep = IntegerLiteral(1)
+	for _ in range(100000):
+		deep = UnaryOp('-', deep)
+	for cls in (RecursiveCount, WalkerCount):
+		try:
+			cls().visit(deep)
+			print(f'{cls.__bases__[0].__name__}: 100000 niveles OK')
+		except RecursionError:
+			print(f'{cls.__bases__[0].__name__}: RecursionError')
+
+
+def bench_dump(nfuncs=2000):
+	'''
+	Volcado del AST como en cparse.main(): flatten() + print() contra
+	cparse.write_ast(). Reporta tiempo total, tiempo hasta la primera línea
+	y memoria extra pico (el árbol ya está construido).
+	'''
+	import tracemalloc
+	from cast import flatten
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	tree = build_tree(nfuncs)
+
+	class FirstWrite(object):
+		def __init__(self, out):
+			self.out = out
+			self.first = None
+		def write(self, text):
+			if self.first is None:
+				self.first = time.perf_counter()
+			self.out.write(text)
+
+	def old(out):
+		for depth, node in flatten(tree):
+			print('%s: %s%s' % (getattr(node, 'lineno', None), ' '*(4*depth), node), file=out)
+
+	def new(out):
+		cparse.write_ast(tree, out)
+
+	for label, func in [('flatten + print', old), ('write_ast', new)]:
+		with open(os.devnull, 'w') as null:
+			out = FirstWrite(null)
+			tracemalloc.start()
+			start = time.perf_counter()
+			func(out)
+			elapsed = time.perf_counter() - start
+			peak = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+		_report(label, elapsed, f'primera línea {(out.first-start)*1000:8.2f} ms, pico {peak/1024:8.0f} KB')
+
+
+def bench_dot(nfuncs=600):
+	'''
+	Generación del archivo DOT con DotVisitor (objetos de pydot y
+	to_string()) contra cast.write_dot(), escribiendo a os.devnull.
+	'''
+	import tracemalloc
+	from cast import DotVisitor, write_dot
+	tree = build_tree(nfuncs)
+	nodes = count_nodes(tree)
+
+	def with_pydot(out):
+		dot = DotVisitor()
+		dot.visit(tree)
+		out.write(repr(dot))
+
+	def streaming(out):
+		write_dot(tree, out)
+
+	for label, func in [('DotVisitor (pydot)', with_pydot), ('write_dot', streaming)]:
+		with open(os.devnull, 'w') as null:
+			tracemalloc.start()
+			elapsed = _timeit(lambda: func(null))
+			peak = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+		_report(f'{label} ({nodes} nodos)', elapsed, f'pico {peak/1024/1024:8.1f} MB')
+
+
+def bench_diagnostics(count=200000):
+	'''
+	Reporte de muchos errores con el colector global (una escritura por
+	mensaje, como antes) y con un colector Diagnostics que agrupa las
+	escrituras.
+	'''
+	import errors
+	with open(os.devnull, 'w') as null:
+		with contextlib.redirect_stderr(null):
+			def legacy():
+				for i in range(count):
+					errors.error(i, 'Error de prueba')
+			unbuffered = _timeit(legacy)
+			errors.clear_errors()
+
+		def batched():
+			with errors.Diagnostics(stream=null):
+				for i in range(count):
+					errors.error(i, 'Error de prueba')
+		buffered = _timeit(batched)
+	_report(f'error() global x{count}', unbuffered, f'{count/unbuffered:12,.0f} msg/s')
+	_report(f'error() en Diagnostics x{count}', buffered, f'{count/buffered:12,.0f} msg/s x{unbuffered/buffered:.1f}')
+
+
+def bench_astcache(nfiles=300):
+	'''
+	Análisis de un corpus sin cache, con el cache vacío (todo fallos) y
+	con el cache lleno (todo aciertos).
+	'''
+	from astcache import ASTCache
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	sources = [ generate_parseable_source(20) + f'int g{i};\n' for i in range(nfiles) ]
+	tmpdir = tempfile.mkdtemp(prefix='minic-bench-')
+	try:
+		cache = ASTCache(tmpdir)
+		with open(os.devnull, 'w') as null, contextlib.redirect_stderr(null):
+			plain = _timeit(lambda: [ cparse.parse(src) for src in sources ])
+			cold = _timeit(lambda: [ cparse.parse(src, cache=cache) for src in sources ])
+			warm = _timeit(lambda: [ cparse.parse(src, cache=cache) for src in sources ])
+	finally:
+		shutil.rmtree(tmpdir, ignore_errors=True)
+	_report(f'sin cache x{nfiles}', plain, f'{nfiles/plain:10,.0f} archivos/s')
+	_report(f'cache frío x{nfiles}', cold, f'{nfiles/cold:10,.0f} archivos/s')
+	_report(f'cache caliente x{nfiles}', warm, f'{nfiles/warm:10,.0f} archivos/s x{plain/warm:.1f}')
+	print(cache.stats())
+
+
+def bench_astbin(nfuncs=2000):
+	'''
+	Tamaño y velocidad de astbin contra pickle.
+	'''
+	import pickle
+	import astbin
+	tree = build_tree(nfuncs)
+	nodes = count_nodes(tree)
+	print(f'{nodes} nodos')
+	for label, dumps, loads in [('pickle', lambda t: pickle.dumps(t, pickle.HIGHEST_PROTOCOL), pickle.loads),
+			('astbin', astbin.dumps, astbin.loads)]:
+		data = dumps(tree)
+		encode = min(_timeit(lambda: dumps(tree)) for _ in range(3))
+		decode = min(_timeit(lambda: loads(data)) for _ in range(3))
+		print(f'{label:<8} {len(data)/1024:10.0f} KB {len(data)/nodes:6.1f} bytes/nodo'
+			f'  codificar {encode*1000:8.1f} ms  decodificar {decode*1000:8.1f} ms')
+
+
+def generate_parseable_source(nfuncs):
+	'''
+	Como generate_source() pero con construcciones que el analizador
+	acepta sin errores.
+	'''
+	out = []
+	for i in range(nfuncs):
+		out.append(f'int f{i}(int a, int b) {{\n    int x;\n    x = a + b * a;\n'
+			'    while (x) { x = x - a; b = b + x; }\n    return b;\n}\n')
+		if i % 4 == 0:
+			out.append(f'const k{i} = a + b;\n')
+	return ''.join(out)
+
+
+def bench_incremental(nfuncs=2000, nedits=50):
+	'''
+	Latencia de edición a AST con incremental.IncrementalParser contra
+	volver a analizar todo el archivo. Se editan funciones repartidas por
+	el archivo, sin cambiar el número de líneas y agregando una línea.
+	'''
+	import random
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	from incremental import IncrementalParser
+	from lexer import Lexer
+	lexer = Lexer()
+	text = generate_parseable_source(nfuncs)
+	rnd = random.Random(0)
+	inc = IncrementalParser(lexer)
+	inc.parse(text)
+	print(f'{len(text.splitlines())} líneas, {len(inc.ast.decl_list)} declaraciones')
+
+	for label, snippet in [('misma línea', ' + a'), ('línea nueva', ';\n    x = a')]:
+		partial = inc.partial_parses
+		incremental = 0
+		for _ in range(nedits):
+			pos = inc.text.index('* a;', rnd.randrange(len(inc.text) - 100)) + 3
+			incremental += _timeit(lambda: inc.edit(pos, pos, snippet))
+		incremental /= nedits
+		assert inc.partial_parses - partial == nedits
+		parser = cparse.Parser()
+		full = _timeit(lambda: parser.parse(lexer.tokenize(inc.text)))
+		_report(f'completo ({label})', full)
+		_report(f'incremental ({label})', incremental, f'x{full/incremental:.0f}')
+
+
+def bench_checker(nfuncs=5000):
+	'''
+	Nodos por segundo del análisis semántico (checker.check_program)
+	sobre un árbol sin errores.
+	'''
+	from checker import check_program
+	from errors import Diagnostics
+	tree = build_tree(nfuncs)
+	nodes = count_nodes(tree)
+	with Diagnostics(echo=False) as diag:
+		seconds = min(_timeit(lambda: check_program(tree)) for _ in range(3))
+	assert not diag.records
+	_report(f'check_program ({nodes} nodos)', seconds, f'{nodes/seconds:12,.0f} nodos/s')
+
+
+def bench_typecheck(sizes=(1000, 10000, 100000)):
+	'''
+	Verificación de tipos (typecheck.check_types) de una sola función con
+	cada vez más sentencias: los nodos/s no deberían caer con el tamaño.
+	'''
+	from typecheck import check_types
+	from errors import Diagnostics
+	for nstmts in sizes:
+		tree = build_tree(1, nstmts)
+		nodes = count_nodes(tree)
+		with Diagnostics(echo=False) as diag:
+			seconds = _timeit(lambda: check_types(tree))
+		assert not diag.records
+		_report(f'check_types ({nstmts} sentencias, {nodes} nodos)', seconds,
+			f'{nodes/seconds:12,.0f} nodos/s')
+
+
+def build_constant_tree(nfuncs, nstmts=8):
+	'''
+	Program con una constante y una función por cada i < nfuncs, llenas
+	de aritmética entre literales:
+
+	    const kI = 6 * 7;
+	    int fI(int a) {
+	        int x = a;
+	        x = (2 + 3 * (4 + 5)) * x * 1 + 0;   (nstmts veces)
+	        return x + kI - -1;
+	    }
+	'''
+	from cast import (Program, ConstDeclaration, FuncDeclaration, FuncParameter,
+		SimpleType, Compound_Stmt, LocalDecl, Return_Stmt, WriteLocation, ReadLocation,
+		SimpleLocation, BinOp, UnaryOp, IntegerLiteral)
+
+	def num(value):
+		return IntegerLiteral(value, lineno=1)
+
+	def var(name):
+		return ReadLocation(SimpleLocation(name, lineno=1), lineno=1)
+
+	decls = []
+	for i in range(nfuncs):
+		int_t = SimpleType('int', lineno=1)
+		decls.append(ConstDeclaration(f'k{i}', BinOp('*', num(6), num(7), lineno=1), lineno=1))
+		stmts = []
+		for j in range(nstmts):
+			value = BinOp('+', num(2), BinOp('*', num(3), BinOp('+', num(4), num(5), lineno=1), lineno=1), lineno=1)
+			value = BinOp('*', BinOp('*', value, var('x'), lineno=1), num(1), lineno=1)
+			stmts.append(WriteLocation(SimpleLocation('x', lineno=1),
+				BinOp('+', value, num(0), lineno=1), lineno=1))
+		stmts.append(Return_Stmt(BinOp('-', BinOp('+', var('x'), var(f'k{i}'), lineno=1),
+			UnaryOp('-', num(1), lineno=1), lineno=1), lineno=1))
+		decls.append(FuncDeclaration(f'f{i}', [FuncParameter('a', int_t, lineno=1)], int_t,
+			Compound_Stmt([LocalDecl('x', int_t, var('a'), lineno=1)], stmts, lineno=1), lineno=1))
+	return Program(decls)
+
+
+def bench_constfold(nfuncs=5000):
+	'''
+	Plegado de constantes (constfold.fold_constants): tiempo y número de
+	nodos antes y después.
+	'''
+	from constfold import fold_constants
+	tree = build_constant_tree(nfuncs)
+	start = time.perf_counter()
+	tree, stats = fold_constants(tree)
+	seconds = time.perf_counter() - start
+	_report(f"fold_constants ({stats['before']} nodos)", seconds,
+		f"{stats['before']/seconds:12,.0f} nodos/s")
+	print(f"{stats['before']} -> {stats['after']} nodos "
+		f"({100 - 100*stats['after']/stats['before']:.0f}% menos); plegados {stats['folded']}, "
+		f"simplificados {stats['simplified']}, propagados {stats['propagated']}")
+
+
+def bench_lower(nfuncs=5000):
+	'''
+	Velocidad de la traducción del AST a la representación intermedia
+	(ir.lower).
+	'''
+	import ir
+	tree = build_tree(nfuncs)
+	nodes = count_nodes(tree)
+	seconds = min(_timeit(lambda: ir.lower(tree)) for _ in range(3))
+	module = ir.lower(tree)
+	ninstr = sum(func.instructions() for func in module.functions)
+	nblocks = sum(len(func.blocks) for func in module.functions)
+	_report(f'ir.lower ({nodes} nodos)', seconds,
+		f'{nodes/seconds:12,.0f} nodos/s {ninstr/seconds:12,.0f} instr/s')
+	code = sum(func.blocks[0].code.itemsize * len(block.code)
+		for func in module.functions for block in func.blocks)
+	print(f'{ninstr} instrucciones en {nblocks} bloques, {code/ninstr:.0f} bytes/instrucción')
+
+KERNELS = '''
+int loop(int n) {
+    int i; int s;
+    i = 0; s = 0;
+    while (i < n) { s = s + i * 3 % 7; i = i + 1; }
+    return s;
+}
+int fib(int n) {
+    if (n < 2) return n;
+    return fib(n - 1) + fib(n - 2);
+}
+int kernel(int n) {
+    int a[]; int i; int r; int s;
+    a = new int[n];
+    i = 0;
+    while (i < n) { a[i] = i * i % 13; i = i + 1; }
+    s = 0; r = 0;
+    while (r < 10) {
+        i = 0;
+        while (i < n) { s = s + a[i]; i = i + 1; }
+        r = r + 1;
+    }
+    return s;
+}
+'''
+
+
+def _kernels():
+	'''
+	Analiza y verifica KERNELS; retorna el Program.
+	'''
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	from errors import Diagnostics
+	from typecheck import check_types
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(KERNELS)
+		check_types(ast)
+	assert not diag.records, diag.records
+	return ast
+
+
+def bench_vm():
+	'''
+	vm.VM contra el intérprete que recorre el AST (interp.Interpreter) en
+	un ciclo, fib recursivo y un kernel de arreglos (KERNELS).
+	'''
+	from interp import Interpreter
+	from vm import VM, compile_program
+	ast = _kernels()
+	seconds = _timeit(lambda: compile_program(ast))
+	bytecode = compile_program(ast)
+	ninstr = sum(len(code) for code in bytecode.functions)
+	_report('compile_program', seconds, f'{ninstr} instrucciones, {bytecode.size()} bytes')
+	interpreter = Interpreter(ast)
+	machine = VM(bytecode)
+	for name, arg in [('loop', 100000), ('fib', 20), ('kernel', 10000)]:
+		expected = interpreter.call(name, arg)
+		assert machine.call(name, arg) == expected, name
+		walk = min(_timeit(lambda: interpreter.call(name, arg)) for _ in range(3))
+		fast = min(_timeit(lambda: machine.call(name, arg)) for _ in range(3))
+		_report(f'{name}({arg}) árbol', walk)
+		_report(f'{name}({arg}) vm', fast, f'x{walk/fast:.1f}')
+
+def bench_closures():
+	'''
+	closures.ClosureInterpreter contra la evaluación con NodeVisitor
+	(interp.Interpreter) en los KERNELS de bench_vm.
+	'''
+	from closures import ClosureInterpreter
+	from interp import Interpreter
+	ast = _kernels()
+	seconds = _timeit(lambda: ClosureInterpreter(ast))
+	_report('ClosureInterpreter (compilar)', seconds)
+	interpreter = Interpreter(ast)
+	closures = ClosureInterpreter(ast)
+	for name, arg in [('loop', 100000), ('fib', 20), ('kernel', 10000)]:
+		expected = interpreter.call(name, arg)
+		assert closures.call(name, arg) == expected, name
+		walk = min(_timeit(lambda: interpreter.call(name, arg)) for _ in range(3))
+		fast = min(_timeit(lambda: closures.call(name, arg)) for _ in range(3))
+		_report(f'{name}({arg}) visitor', walk)
+		_report(f'{name}({arg}) clausuras', fast, f'x{walk/fast:.1f}')
+
+ARRAY_KERNELS = '''
+int mix(int n) {
+    int a[]; int b[]; int c[]; int i; int s;
+    a = new int[n]; b = new int[n]; c = new int[n];
+    i = 0;
+    while (i < a.size) { a[i] = i * i % 13 - 6; b[i] = i % 7 + 1; i = i + 1; }
+    i = 0;
+    while (i < n) { c[i] = a[i] * 3 + a[i] / b[i] - a[i] % 4; i = i + 1; }
+    s = 0; i = 0;
+    while (i < n) { s = s + c[i] * b[i]; i = i + 1; }
+    return s;
+}
+float axpy(int n) {
+    float x[]; float y[]; int i; float s;
+    x = new float[n]; y = new float[n];
+    i = 0;
+    while (i < n) { x[i] = 1.5; y[i] = 0.25; i = i + 1; }
+    i = 0;
+    while (i < n) { y[i] = x[i] * 2.0 + y[i]; i = i + 1; }
+    s = 0.0; i = 0;
+    while (i < n) { s = s + y[i] * x[i]; i = i + 1; }
+    return s;
+}
+'''
+
+
+def bench_numpy(n=200000):
+	'''
+	Arreglos grandes en closures.ClosureInterpreter: listas de Python
+	contra nparray.NumpyArrays con y sin verificación de índices, y con
+	los ciclos vectorizados.
+	'''
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	from closures import ClosureInterpreter, ListArrays
+	from errors import Diagnostics
+	from nparray import NumpyArrays
+	from typecheck import check_types
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(ARRAY_KERNELS)
+		check_types(ast)
+	assert not diag.records, diag.records
+	engines = [
+		('listas', ListArrays()),
+		('numpy', NumpyArrays(vectorize=False)),
+		('numpy release', NumpyArrays(checked=False, vectorize=False)),
+		('numpy vectorizado', NumpyArrays()),
+	]
+	for name in ('mix', 'axpy'):
+		base = None
+		expected = None
+		for label, arrays in engines:
+			interpreter = ClosureInterpreter(ast, arrays)
+			result = interpreter.call(name, n)
+			if expected is None:
+				expected = result
+			assert result == expected, (label, result, expected)
+			seconds = min(_timeit(lambda: interpreter.call(name, n)) for _ in range(3))
+			base = base or seconds
+			_report(f'{name}({n}) {label}', seconds, f'x{base/seconds:.1f}')
+
+def bench_pygen(nfuncs=500):
+	'''
+	pygen.PythonProgram (MiniC traducido a Python) contra los demás
+	motores en los KERNELS de bench_vm, y el costo de cargar un programa
+	de nfuncs funciones con el CodeCache vacío y lleno.
+	'''
+	from closures import ClosureInterpreter
+	from interp import Interpreter
+	from pygen import CodeCache, PythonProgram
+	from typecheck import check_types
+	from vm import VM, compile_program
+	ast = _kernels()
+	engines = [
+		('árbol', Interpreter(ast)),
+		('vm', VM(compile_program(ast))),
+		('clausuras', ClosureInterpreter(ast)),
+		('python', PythonProgram(ast)),
+	]
+	for name, arg in [('loop', 100000), ('fib', 20), ('kernel', 10000)]:
+		base = None
+		expected = None
+		for label, engine in engines:
+			result = engine.call(name, arg)
+			if expected is None:
+				expected = result
+			assert result == expected, (label, result, expected)
+			seconds = min(_timeit(lambda: engine.call(name, arg)) for _ in range(3))
+			base = base or seconds
+			_report(f'{name}({arg}) {label}', seconds, f'x{base/seconds:.1f}')
+
+	tree = build_tree(nfuncs)
+	check_types(tree)
+	cache = CodeCache()
+	cold = _timeit(lambda: PythonProgram(tree, cache=cache))
+	warm = _timeit(lambda: PythonProgram(tree, cache=cache))
+	_report(f'cargar {nfuncs} funciones (sin cache)', cold)
+	_report(f'cargar {nfuncs} funciones (con cache)', warm,
+		f'x{cold/warm:.1f} ({cache.hits} aciertos, {cache.misses} fallos)')
+
+
+def bench_x86():
+	'''
+	Código nativo de x86.py contra los motores interpretados en los
+	KERNELS de bench_vm. El tiempo nativo es el de la llamada, medido por
+	el main generado (sin el arranque del proceso).
+	'''
+	import ir
+	import x86
+	from closures import ClosureInterpreter
+	from interp import Interpreter
+	from pygen import PythonProgram
+	if shutil.which('cc') is None:
+		print('No hay compilador de C (cc): se omite la prueba')
+		return
+	ast = _kernels()
+	module = ir.lower(ast)
+	seconds = _timeit(lambda: x86.generate(module))
+	text = x86.generate(module)
+	_report('x86.generate', seconds, f'{text.count(chr(10))} líneas')
+	engines = [
+		('árbol', Interpreter(ast)),
+		('clausuras', ClosureInterpreter(ast)),
+		('python', PythonProgram(ast)),
+	]
+	tmpdir = tempfile.mkdtemp(prefix='minic-bench-')
+	try:
+		for name, arg in [('loop', 100000), ('fib', 20), ('kernel', 10000)]:
+			start = time.perf_counter()
+			exe = x86.build(text, module, name, os.path.join(tmpdir, name))
+			_report(f'{name} ensamblar y enlazar', time.perf_counter() - start)
+			base = None
+			expected = None
+			for label, engine in engines:
+				result = engine.call(name, arg)
+				if expected is None:
+					expected = result
+				assert result == expected, (label, result, expected)
+				seconds = min(_timeit(lambda: engine.call(name, arg)) for _ in range(3))
+				base = base or seconds
+				_report(f'{name}({arg}) {label}', seconds, f'x{base/seconds:.1f}')
+			for label, checked in [('nativo', True), ('nativo sin verificar', False)]:
+				if not checked:
+					exe = x86.build(x86.generate(module, checked=False), module, name,
+						os.path.join(tmpdir, name))
+				runs = []
+				for _ in range(3):
+					output = subprocess.run([exe, str(arg)], capture_output=True, text=True,
+						check=True).stdout.split()
+					assert int(output[0]) == expected, (label, output, expected)
+					runs.append(int(output[1]) / 1e9)
+				seconds = min(runs)
+				_report(f'{name}({arg}) {label}', seconds, f'x{base/seconds:.0f}')
+	finally:
+		shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_dataflow(sizes=(1000, 4000, 16000), repeat=5):
+	'''
+	CFG y análisis de flujo de datos (dataflow) de una función de
+	build_tree con cada vez más ciclos. Las visitas por nodo no dependen
+	del tamaño; en reaching_definitions y available_expressions el
+	universo (definiciones, expresiones) crece con la función, y con él
+	el costo de cada operación sobre los bitsets. Se toma el mínimo de
+	repeat corridas.
+	'''
+	import dataflow
+	for nstmts in sizes:
+		func = build_tree(1, nstmts).decl_list[0]
+		seconds = min(_timeit(lambda: dataflow.build_cfg(func)) for _ in range(repeat))
+		cfg = dataflow.build_cfg(func)
+		nodes = len(cfg.nodes)
+		_report(f'build_cfg ({nstmts} ciclos, {nodes} nodos)', seconds,
+			f'{seconds/nodes*1e6:6.2f} us/nodo')
+		for label, analysis in [('liveness', dataflow.liveness),
+				('reaching_definitions', lambda cfg: dataflow.reaching_definitions(cfg)[0]),
+				('available_expressions', dataflow.available_expressions)]:
+			solution = analysis(cfg)
+			seconds = min(_timeit(lambda: analysis(cfg)) for _ in range(repeat))
+			_report(f'  {label}', seconds,
+				f'{seconds/nodes*1e6:6.2f} us/nodo, {solution.visits/nodes:.1f} visitas/nodo')
+
+
+OPTIMIZE_KERNELS = '''
+int redundant(int n) {
+    int a[]; int b[]; int i; int s; int t; int u; int w;
+    a = new int[n]; b = new int[n];
+    i = 0;
+    while (i < n) { a[i] = i % 7; b[i] = i % 5; i = i + 1; }
+    s = 0; i = 0;
+    while (i < n) {
+        t = a[i] * b[i] + 1;
+        u = t * 3 + i;
+        w = (t + i) * (t + i);
+        s = s + a[i] * b[i] + (a[i] * b[i] + i) % 3 + t;
+        if (1 == 2) s = s - 1;
+        i = i + 1;
+    }
+    return s;
+    s = 0;
+}
+'''
+
+
+def _bench_passes(source, entry, n, variants):
+	'''
+	Optimiza source con cada variante (etiqueta, pasos, presupuesto de
+	inline), muestra las estadísticas de cada paso y compara el tiempo de
+	entry(n) en cada motor antes y después.
+	'''
+	with contextlib.redirect_stderr(io.StringIO()):
+		import cparse
+	from closures import ClosureInterpreter
+	from constfold import fold_constants
+	from errors import Diagnostics
+	from interp import Interpreter
+	from optimize import optimize
+	from pygen import PythonProgram
+	from typecheck import check_types
+	from vm import VM, compile_program
+
+	def parse():
+		with Diagnostics(echo=False) as diag:
+			ast = cparse.parse(source)
+			check_types(ast)
+		assert not diag.records, diag.records
+		return fold_constants(ast)[0]
+
+	before = parse()
+	optimized = []
+	for label, passes, budget in variants:
+		after, stats = optimize(parse(), passes, budget)
+		print(f'-- {label}')
+		for name in passes:
+			counters = ', '.join(f'{key}={value}' for key, value in stats[name].items() if key != 'seconds')
+			_report(f'paso {name}', stats[name]['seconds'], counters)
+		print(f"{stats['before']} nodos antes, {stats['after']} después")
+		optimized.append((label, after))
+	engines = [
+		('árbol', Interpreter),
+		('vm', lambda ast: VM(compile_program(ast))),
+		('clausuras', ClosureInterpreter),
+		('python', PythonProgram),
+	]
+	for engine, make in engines:
+		plain = make(before)
+		expected = plain.call(entry, n)
+		slow = min(_timeit(lambda: plain.call(entry, n)) for _ in range(5))
+		_report(f'{entry}({n}) {engine}', slow)
+		for label, after in optimized:
+			program = make(after)
+			assert program.call(entry, n) == expected, (engine, label)
+			fast = min(_timeit(lambda: program.call(entry, n)) for _ in range(5))
+			_report(f'{entry}({n}) {engine} {label}', fast, f'x{slow/fast:.2f}')
+
+
+def bench_optimize(n=20000):
+	'''
+	optimize.optimize con los pasos de DEFAULT_PASSES en OPTIMIZE_KERNELS:
+	estadísticas de cada paso y tiempo de cada motor antes y después.
+	'''
+	from optimize import DEFAULT_PASSES, INLINE_BUDGET
+
+	_bench_passes(OPTIMIZE_KERNELS, 'redundant', n,
+		[('optimizado', DEFAULT_PASSES, INLINE_BUDGET)])
+
+
+INLINE_KERNELS = '''
+int total;
+int scale = 3;
+int sq(int x) { return x * x; }
+int clamp(int v, int lo, int hi) {
+    if (v < lo) return lo;
+    if (v > hi) return hi;
+    return v;
+}
+void tally(int v) { total = total + v % 3; }
+int helpers(int n) {
+    int a[]; int i; int s;
+    a = new int[n];
+    i = 0;
+    while (i < a.size) { a[i] = (i * 7) % 13; i = i + 1; }
+    s = 0; i = 0; total = 0;
+    while (i < a.size) {
+        s = s + sq(a[i]) + clamp(a[i] * scale, 5, 30) + sq(scale + 1);
+        tally(a[i]);
+        i = i + 1;
+    }
+    return s + total;
+}
+'''
+
+
+def bench_inline(n=20000, small=8):
+	'''
+	Expansión en línea y código invariante de ciclos en INLINE_KERNELS:
+	llamadas a funciones pequeñas dentro de un ciclo cuya condición es
+	i < a.size. Con presupuesto small solo se expande sq; tally escribe
+	una global, así que lo que lee total no sale del ciclo (scale sí).
+	'''
+	from optimize import INLINE_BUDGET
+
+	_bench_passes(INLINE_KERNELS, 'helpers', n, [
+		('licm', ('licm',), INLINE_BUDGET),
+		(f'inline({small})+licm', ('inline', 'licm'), small),
+		('inline+licm', ('inline', 'licm'), INLINE_BUDGET),
+	])
+
+BENCHMARKS = {
+	'startup': bench_startup,
+	'batch': bench_batch,
+	'scanner': bench_scanner,
+	'stream': bench_stream,
+	'memory': bench_memory,
+	'validate': bench_validate,
+	'visitor': bench_visitor,
+	'dump': bench_dump,
+	'dot': bench_dot,
+	'diagnostics': bench_diagnostics,
+	'astcache': bench_astcache,
+	'astbin': bench_astbin,
+	'incremental': bench_incremental,
+	'checker': bench_checker,
+	'typecheck': bench_typecheck,
+	'constfold': bench_constfold,
+	'lower': bench_lower,
+	'vm': bench_vm,
+	'closures': bench_closures,
+	'numpy': bench_numpy,
+	'pygen': bench_pygen,
+	'x86': bench_x86,
+	'dataflow': bench_dataflow,
+	'optimize': bench_optimize,
+	'inline': bench_inline,
+}
+
+
+def main():
+	names = sys.argv[1:]
+	if not names:
+		sys.stderr.write('Uso: python bench.py %s\n' % ' | '.join(['all', *BENCHMARKS]))
+		raise SystemExit(1)
+	if names == ['all']:
+		names = list(BENCHMARKS)
+	for name in names:
+		if name not in BENCHMARKS:
+			sys.stderr.write(f'Prueba desconocida: {name}\n')
+			raise SystemExit(1)
+		print(f'== {name}')
+		BENCHMARKS[name]()
+
+if __name__ == '__main__':
+	main()
@@ -1,6 +1,60 @@
+import contextlib
+import contextvars
 import pydot;
+
+try:
+	import annotationlib    # Python 3.14
+except ImportError:
+	annotationlib = None
+
+# Mientras sea verdadero los constructores de los nodos no validan los
+# tipos de sus argumentos. Vea trusted_nodes().
+_trusted = contextvars.ContextVar('trusted_nodes', default=False)
+
+@contextlib.contextmanager
+def trusted_nodes():
+	'''
+	Desactiva la validación de tipos de los constructores de nodos dentro
+	del bloque with. La usa cparse.Parser: las anotaciones de las clases
+	cubren todo lo que producen las reglas de la gramática (lo comprueba
+	tests/test_cast.py), así que validar sus nodos solo cuesta tiempo. El
+	estado es propio de cada hilo (y de cada contexto de asyncio).
+	'''
+	token = _trusted.set(True)
+	try:
+		yield
+	finally:
+		_trusted.reset(token)
+
+def _annotated_names(namespace):
+	'''
+	Nombres anotados en el cuerpo de una clase, antes de crearla. Desde
+	Python 3.14 (PEP 649) el cuerpo guarda una función que calcula las
+	anotaciones en lugar del diccionario __annotations__.
+	'''
+	if '__annotations__' in namespace:
+		return tuple(namespace['__annotations__'])
+	if annotationlib is not None:
+		annotate = annotationlib.get_annotate_from_class_namespace(namespace)
+		if annotate is not None:
+			return tuple(annotationlib.call_annotate_function(annotate,
+				annotationlib.Format.FORWARDREF))
+	return ()
+
+class _ASTMeta(type):
+	'''
+	Agrega __slots__ a cada clase de nodo a partir de sus anotaciones para
+	que las instancias no tengan __dict__. Las clases abstractas (sin
+	anotaciones) reciben __slots__ vacío.
+	'''
+	def __new__(meta, name, bases, namespace):
+		if '__slots__' not in namespace:
+			namespace['__slots__'] = _annotated_names(namespace)
+		return super().__new__(meta, name, bases, namespace)
+
 # Nodos Abstract Syntax Tree (AST)
-class AST(object):
+class AST(object, metaclass=_ASTMeta):
+	__slots__ = ('lineno',)
 	_nodes = { }
 	
 	@classmethod
@@ -11,10 +65,17 @@ class AST(object):
 			return
 			
 		fields = list(cls.__annotations__.items())
+		names = [name for name,_ in fields]
 		
 		def __init__(self, *args, **kwargs):
 			if len(args) != len(fields):
 				raise TypeError(f'{len(fields)} argumentos esperados')
+			if _trusted.get():
+				for name, arg in zip(names, args):
+					setattr(self, name, arg)
+				for name, val in kwargs.items():
+					setattr(self, name, val)
+				return
 			for (name, ty), arg in zip(fields, args):
 				if isinstance(ty, list):
 					if not isinstance(arg, list):
@@ -29,7 +90,7 @@ class AST(object):
 				setattr(self, name, val)
 				
 		cls.__init__ = __init__
-		cls._fields = [name for name,_ in fields]
+		cls._fields = names
 		
 	def __repr__(self):
 		vals = [ getattr(self, name) for name in self._fields ]
@@ -42,7 +103,8 @@ class Statement(AST):
 	pass
 
 class Expression(AST):
-	pass
+	# Tipo calculado por typecheck.TypeCheckVisitor
+	__slots__ = ('type',)
 
 class Literal(Expression):
 	'''
@@ -54,7 +116,19 @@ class Type_Spec(AST):
 	pass
 
 class Location(AST):
-	pass
+	__slots__ = ('type',)
+
+class WriteLocation(Statement):
+	# La asignación también es una expresión y lleva su tipo
+	__slots__ = ('location', 'value', 'type')
+	location : Location
+	value    : (Expression, Statement)    # Statement: otra asignación
+
+# Lo que la gramática acepta donde espera una expresión (una asignación
+# como 'y = (x = 1)') y donde espera una sentencia (una expresión
+# seguida de ';')
+_Value = (Expression, WriteLocation)
+_Stmt = (Statement, Expression)
 
 # Nodos concretos del AST
 class Program(Statement):
@@ -88,12 +162,12 @@ class Size(Literal):
 	value : int
 
 class If_Stmt(Statement):
-	condition   : Expression
-	true_block  : Statement
-	false_block : (Statement,type(None))
+	condition   : _Value
+	true_block  : _Stmt
+	false_block : (*_Stmt,type(None))
 
 class While_Stmt(Statement):
-	condition : Expression
+	condition : _Value
 	body      : Statement
 
 class ForStmt(Statement):
@@ -107,8 +181,8 @@ class BinOp(Expression):
 	Un operador binario como 2 + 3 o x * y
 	'''
 	op    : str
-	left  : Expression
-	right : Expression
+	left  : _Value
+	right : _Value
 
 	def getClass():
 		return self.__class__.__name__
@@ -118,18 +192,18 @@ class UnaryOp(Expression):
 	Un operador unario como -2 o +3
 	'''
 	op    : str
-	right : Expression
+	right : _Value
 
 class FuncCall(Expression):
 	name      : str
-	arguments : [Expression]
+	arguments : [_Value]
 
 class ConstDeclaration(Statement):
 	'''
 	const name := value ;
 	'''
 	name  : str
-	value : Expression
+	value : _Value
 
 class FuncParameter(AST):
 	name : str
@@ -150,7 +224,7 @@ class SimpleType(Type_Spec):
 class LocalDecl(Statement):
 	name : str
 	type_spec : Type_Spec
-	value    : (Expression, type(None))    # Optional
+	value    : (*_Value, type(None))    # Optional
 
 
 class ArrayLocalDecl(Statement):
@@ -163,14 +237,14 @@ class Null_Stmt(Statement):
 	value : (type(None))
 
 class Return_Stmt(Statement):
-	value: (Expression,type(None))
+	value: (*_Value,type(None))
 
 class Break_Stmt(Statement):
 	value: (type(None))
 
 class Compound_Stmt(Statement):
 	local_decl: [Statement]
-	stmt_list: [Statement]
+	stmt_list: [_Stmt]
 
 class VarDeclaration(Statement):
 	'''
@@ -178,7 +252,7 @@ class VarDeclaration(Statement):
 	'''
 	name     : str
 	type_spec : Type_Spec
-	value    : (Expression, type(None))    # Optional
+	value    : (*_Value, type(None))    # Optional
 
 
 class ArrayDeclaration(Statement):
@@ -194,17 +268,19 @@ class SimpleLocation(Location):
 class ReadLocation(Expression):
 	location : Location
 
-class WriteLocation(Statement):
-	location : Location
-	value    : Expression
-
 class ArraySimpleLocation(Location):
 	name : str
-	size : Expression
+	size : _Value
 
 class NewArrayExpr(Expression):
 	type_spec: Type_Spec
-	expr : Expression
+	expr : _Value
+
+class ArraySize(Expression):
+	'''
+	name.size: número de elementos del arreglo
+	'''
+	name : str
 # ----------------------------------------------------------------------
 
 # ----------------------------------------------------------------------
@@ -271,6 +347,212 @@ class NodeVisitor(object):
 			if key.startswith('visit_'):
 				assert key[6:] in globals(), f"{key} no coincide con nodos AST"
 				
+class NodeWalker(NodeVisitor):
+	'''
+	Visitante iterativo con tabla de despacho precalculada.
+
+	NodeVisitor arma el nombre 'visit_' + clase y llama getattr en cada
+	nodo, y generic_visit() es recursivo, así que los árboles muy
+	profundos (expresiones largas, cadenas de else if) agotan el límite de
+	recursión de Python. NodeWalker calcula una sola vez por subclase qué
+	método atiende cada clase de nodo y recorre los hijos con una pila
+	explícita.
+
+	Una subclase puede definir:
+
+	  visit_NodeName(node)  como en NodeVisitor; el método decide si
+	                        visita los hijos (self.visit o self.generic_visit)
+	  enter_NodeName(node)  gancho en preorden
+	  leave_NodeName(node)  gancho en postorden, después de los hijos
+	  enter(node), leave(node)
+	                        ganchos para los nodos sin uno específico
+
+	Los ganchos enter/leave solo se usan en nodos sin visit_NodeName. Los
+	hijos se visitan en el orden de _fields.
+
+	class CountOps(NodeWalker):
+		def __init__(self):
+			self.count = 0
+		def enter_BinOp(self, node):
+			self.count += 1
+	'''
+	enter = None
+	leave = None
+
+	@classmethod
+	def __init_subclass__(cls):
+		for key in vars(cls):
+			if key.startswith(('enter_', 'leave_')):
+				assert key[6:] in AST._nodes, f"{key} no coincide con nodos AST"
+		super().__init_subclass__()
+		cls._dispatch = { }
+		for nodecls in AST._nodes.values():
+			cls._entry(nodecls)
+
+	@classmethod
+	def _entry(cls, nodecls):
+		'''
+		Calcula y guarda (visit, enter, leave, campos) para una clase de nodo.
+		'''
+		name = nodecls.__name__
+		visitor = getattr(cls, 'visit_' + name, None)
+		if visitor is None and cls.generic_visit is not NodeWalker.generic_visit:
+			visitor = cls.generic_visit
+		entry = (visitor,
+			getattr(cls, 'enter_' + name, cls.enter),
+			getattr(cls, 'leave_' + name, cls.leave),
+			tuple(reversed(getattr(nodecls, '_fields', ()))))
+		cls._dispatch[nodecls] = entry
+		return entry
+
+	def visit(self, node):
+		if isinstance(node, list):
+			self._walk([item for item in reversed(node) if isinstance(item, AST)])
+		elif isinstance(node, AST):
+			self._walk([node])
+
+	def generic_visit(self, node):
+		'''
+		Visita los hijos de node (sin volver a llamar sus ganchos).
+		'''
+		stack = []
+		self._push_children(node, stack, self._dispatch.get(node.__class__) or self._entry(node.__class__))
+		self._walk(stack)
+
+	@staticmethod
+	def _push_children(node, stack, entry):
+		for name in entry[3]:
+			value = getattr(node, name)
+			if value.__class__ is list:
+				stack.extend(item for item in reversed(value) if isinstance(item, AST))
+			elif isinstance(value, AST):
+				stack.append(value)
+
+	def _walk(self, stack):
+		dispatch = self._dispatch
+		pop = stack.pop
+		push = stack.append
+		while stack:
+			node = pop()
+			cls = node.__class__
+			if cls is tuple:
+				# Marca de postorden: (leave, nodo)
+				node[0](self, node[1])
+				continue
+			entry = dispatch.get(cls) or self._entry(cls)
+			visitor, enter, leave, fields = entry
+			if visitor is not None:
+				visitor(self, node)
+				continue
+			if enter is not None:
+				enter(self, node)
+			if leave is not None:
+				push((leave, node))
+			for name in fields:
+				value = getattr(node, name)
+				if value.__class__ is list:
+					for item in reversed(value):
+						if isinstance(item, AST):
+							push(item)
+				elif isinstance(value, AST):
+					push(value)
+
+class NodeTransformer(NodeVisitor):
+	'''
+	Contraparte de NodeVisitor que reescribe el árbol, al estilo de
+	ast.NodeTransformer pero sin recursión.
+
+	Los métodos visit_NodeName(node) se llaman en postorden, cuando los
+	hijos de node ya fueron transformados y reemplazados en sus campos.
+	Retornan el nodo que reemplaza a node (el mismo node si no cambia).
+	Dentro de una lista, None elimina el elemento; un nodo sin
+	visit_NodeName se conserva. Los ganchos enter_NodeName(node) se llaman
+	en preorden, antes de transformar los hijos, y no retornan nada.
+
+	class RemoveNull(NodeTransformer):
+		def visit_Null_Stmt(self, node):
+			return None
+
+	tree = RemoveNull().visit(tree)
+	'''
+	@classmethod
+	def __init_subclass__(cls):
+		for key in vars(cls):
+			if key.startswith('enter_'):
+				assert key[6:] in AST._nodes, f"{key} no coincide con nodos AST"
+		super().__init_subclass__()
+		cls._dispatch = { }
+
+	@classmethod
+	def _entry(cls, nodecls):
+		name = nodecls.__name__
+		entry = (getattr(cls, 'visit_' + name, None), getattr(cls, 'enter_' + name, None),
+			tuple(getattr(nodecls, '_fields', ())))
+		cls._dispatch[nodecls] = entry
+		return entry
+
+	def visit(self, node):
+		'''
+		Transforma node (un nodo o una lista) y retorna el resultado.
+		'''
+		if isinstance(node, list):
+			return [ item for item in (self.visit(item) for item in node) if item is not None ]
+		if not isinstance(node, AST):
+			return node
+
+		dispatch = self._dispatch
+		results = []
+		# Elementos de la pila: un nodo por transformar o (entry, nodo,
+		# número de hijos) para reconstruirlo cuando sus hijos ya están
+		# al final de results.
+		stack = [node]
+		pop = stack.pop
+		push = stack.append
+		while stack:
+			node = pop()
+			if node.__class__ is tuple:
+				entry, node, count = node
+				if count:
+					children = results[-count:]
+					del results[-count:]
+					i = 0
+					for name in entry[2]:
+						value = getattr(node, name)
+						if value.__class__ is list:
+							items = []
+							for item in value:
+								if isinstance(item, AST):
+									item = children[i]
+									i += 1
+									if item is None:
+										continue
+								items.append(item)
+							setattr(node, name, items)
+						elif isinstance(value, AST):
+							setattr(node, name, children[i])
+							i += 1
+				if entry[0] is not None:
+					node = entry[0](self, node)
+				results.append(node)
+				continue
+
+			entry = dispatch.get(node.__class__) or self._entry(node.__class__)
+			if entry[1] is not None:
+				entry[1](self, node)
+			marker = len(stack)
+			push(None)
+			for name in reversed(entry[2]):
+				value = getattr(node, name)
+				if value.__class__ is list:
+					for item in reversed(value):
+						if isinstance(item, AST):
+							push(item)
+				elif isinstance(value, AST):
+					push(value)
+			stack[marker] = (entry, node, len(stack) - marker - 1)
+		return results[0]
+
+
 # NO MODIFICAR
 def flatten(top):
 	'''
@@ -294,6 +576,34 @@ def flatten(top):
 	return d.nodes
 
 
+def iter_flatten(top):
+	'''
+	Versión perezosa de flatten(): produce las mismas tuplas (depth, node)
+	en el mismo orden a medida que recorre el árbol, sin construir la
+	lista completa ni usar recursión.
+	'''
+	stack = [(0, top)]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		depth, node = pop()
+		if isinstance(node, list):
+			for item in reversed(node):
+				push((depth, item))
+		elif isinstance(node, AST):
+			yield depth, node
+			for field in reversed(node._fields):
+				push((depth + 1, getattr(node, field, None)))
+
+
+def _dot_text(text):
+	'''
+	Escapa las barras invertidas de text para una etiqueta DOT, donde \\n
+	es el separador de líneas.
+	'''
+	return text.replace('\\', '\\\\')
+
+
 class DotVisitor(NodeVisitor):
 	'''
 	Crea archivo tipo 'dot' para Graphiz
@@ -344,7 +654,71 @@ class DotVisitor(NodeVisitor):
 			elif isinstance(value, AST):
 				self.dot.add_edge(pydot.Edge(id, self.st.pop()))
 			elif value:
-				label += '\\n' + '({}={})'.format(field, value)
+				label += '\\n' + _dot_text('({}={})'.format(field, value))
 
 		self.dot.add_node(pydot.Node(id, label=label))
 		self.st.append(id)
+
+def write_dot(top, out, max_depth=None, max_nodes=None, bufsize=4096):
+	'''
+	Escribe en out el grafo DOT del árbol (o subárbol) top a medida que lo
+	recorre, sin construir objetos de pydot. Los nodos tienen los mismos
+	identificadores ('n%02d' en preorden) y etiquetas que DotVisitor.
+
+	max_depth limita la profundidad (top tiene profundidad 0) y max_nodes
+	el número total de nodos. Los nodos cuyos hijos se omiten por la
+	profundidad llevan '...' al final de la etiqueta; al llegar a
+	max_nodes, cada nodo escrito al que le faltan hijos recibe un hijo
+	con la etiqueta '...'. Retorna el número de nodos escritos (sin
+	contar estas marcas).
+	'''
+	lines = ['digraph AST {\n',
+		'node [%s];\n' % ', '.join('%s=%s' % item for item in DotVisitor._dot_node_defaults.items())]
+	count = 0
+	stack = [(None, 0, top)]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		parent, depth, node = pop()
+		if isinstance(node, list):
+			for item in reversed(node):
+				push((parent, depth, item))
+			continue
+		if not isinstance(node, AST):
+			continue
+		if max_nodes is not None and count >= max_nodes:
+			# Una marca '...' por cada nodo con hijos sin escribir
+			marked = set()
+			for parent, _, node in [(parent, depth, node), *reversed(stack)]:
+				if parent in marked or not (isinstance(node, AST) or (isinstance(node, list) and node)):
+					continue
+				marked.add(parent)
+				id = '%s_more' % parent if parent is not None else 'more'
+				lines.append('%s [label="..."];\n' % id)
+				if parent is not None:
+					lines.append('%s -> %s;\n' % (parent, id))
+			break
+		count += 1
+		id = 'n%02d' % count
+		label = node.__class__.__name__
+		children = False
+		for field in node._fields:
+			value = getattr(node, field, None)
+			if isinstance(value, (list, AST)):
+				children = children or bool(value)
+			elif value:
+				label += '\\n' + _dot_text('({}={})'.format(field, value))
+		if children and max_depth is not None and depth >= max_depth:
+			label += '\\n...'
+		else:
+			for field in reversed(node._fields):
+				push((id, depth + 1, getattr(node, field, None)))
+		lines.append('%s [label="%s"];\n' % (id, label.replace('"', '\\"')))
+		if parent is not None:
+			lines.append('%s -> %s;\n' % (parent, id))
+		if len(lines) >= bufsize:
+			out.write(''.join(lines))
+			lines.clear()
+	lines.append('}\n')
+	out.write(''.join(lines))
+	return count
@@ -0,0 +1,245 @@
+# coding: utf-8
+'''
+Análisis semántico: resolución de nombres.
+
+CheckProgramVisitor recorre el AST con una tabla de símbolos de ámbitos
+encadenados y reporta con errors.error:
+
+  - identificadores no declarados (variables y funciones)
+  - declaraciones duplicadas en un mismo ámbito
+  - llamadas con un número de argumentos distinto al de la función
+  - llamadas a algo que no es una función
+
+Las funciones de toda la unidad de traducción se declaran antes de
+recorrer los cuerpos, así que una función puede llamar a otra definida
+más abajo. Las variables globales, en cambio, solo existen a partir de
+su declaración.
+
+    from checker import check_program
+    checker = check_program(ast)
+'''
+from sys import intern
+
+from errors import error
+from cast import *
+
+
+class Symbol(object):
+	'''
+	Entrada de la tabla de símbolos. kind es 'var', 'array', 'const',
+	'param' o 'func'; type es el nombre del tipo (para const, el de su
+	valor si ya se calculó). Para las funciones, params es la lista de
+	FuncParameter.
+	'''
+	__slots__ = ('name', 'kind', 'type', 'node', 'params')
+
+	def __init__(self, name, kind, type, node, params=None):
+		self.name = name
+		self.kind = kind
+		self.type = type
+		self.node = node
+		self.params = params
+
+	def __repr__(self):
+		return f'Symbol({self.name!r}, {self.kind!r}, {self.type!r})'
+
+
+class SymbolTable(object):
+	'''
+	Pila de ámbitos. Cada ámbito es un diccionario nombre -> Symbol que se
+	crea de una vez con todos los nombres que se van a declarar en él
+	(dict.fromkeys), así que no vuelve a crecer mientras se llena. Un
+	nombre con valor None está reservado pero todavía no declarado.
+	Los nombres se internan para que las comparaciones de llaves sean por
+	identidad.
+	'''
+	def __init__(self):
+		self.scopes = []
+
+	def push(self, names=()):
+		self.scopes.append(dict.fromkeys(names))
+
+	def pop(self):
+		return self.scopes.pop()
+
+	def declare(self, name, symbol):
+		'''
+		Declara name en el ámbito actual. Retorna el símbolo que ya estaba
+		declarado con ese nombre (o None).
+		'''
+		scope = self.scopes[-1]
+		previous = scope.get(name)
+		if previous is None:
+			scope[name] = symbol
+		return previous
+
+	def lookup(self, name):
+		scopes = self.scopes
+		i = len(scopes) - 1
+		while i >= 0:
+			symbol = scopes[i].get(name)
+			if symbol is not None:
+				return symbol
+			i -= 1
+		return None
+
+
+def _type_name(type_spec):
+	return getattr(type_spec, 'name', None)
+
+
+def _declared_names(decls):
+	return [ intern(decl.name) for decl in decls if getattr(decl, 'name', None) is not None ]
+
+
+class CheckProgramVisitor(NodeWalker):
+	'''
+	Resuelve los nombres del programa. Después del recorrido, globals es
+	el ámbito global y errors el número de errores reportados.
+	'''
+	def __init__(self):
+		self.symtab = SymbolTable()
+		self.globals = None
+		self.errors = 0
+		# Cuerpo de la función actual: comparte el ámbito de los parámetros
+		self._body = None
+		# Por cada Compound_Stmt abierto, si creó un ámbito
+		self._opened = []
+
+	def error(self, lineno, message, code):
+		self.errors += 1
+		error(lineno, message, code=code)
+
+	def declare(self, node, symbol):
+		previous = self.symtab.declare(symbol.name, symbol)
+		if previous is not None:
+			self.error(getattr(node, 'lineno', None),
+				f"'{symbol.name}' ya fue declarado en la línea {getattr(previous.node, 'lineno', '?')}",
+				'duplicado')
+
+	def lookup(self, node, name):
+		symbol = self.symtab.lookup(name)
+		if symbol is None:
+			self.error(getattr(node, 'lineno', None), f"'{name}' no está declarado", 'no-declarado')
+		return symbol
+
+	# Programa y funciones
+
+	def enter_Program(self, node):
+		self.symtab.push(_declared_names(node.decl_list))
+		self.globals = self.symtab.scopes[-1]
+		for decl in node.decl_list:
+			if isinstance(decl, FuncDeclaration):
+				decl.name = intern(decl.name)
+				self.declare(decl, Symbol(decl.name, 'func', _type_name(decl.type_spec), decl, decl.params))
+
+	def leave_Program(self, node):
+		self.symtab.pop()
+
+	def enter_FuncDeclaration(self, node):
+		body = node.body
+		names = _declared_names(node.params)
+		if isinstance(body, Compound_Stmt):
+			names += _declared_names(body.local_decl)
+			self._body = body
+		self.symtab.push(names)
+
+	def leave_FuncDeclaration(self, node):
+		self.symtab.pop()
+
+	def leave_FuncParameter(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'param', _type_name(node.type_spec), node))
+
+	def enter_Compound_Stmt(self, node):
+		if node is self._body:
+			self._body = None
+			self._opened.append(False)
+		else:
+			self.symtab.push(_declared_names(node.local_decl))
+			self._opened.append(True)
+
+	def leave_Compound_Stmt(self, node):
+		if self._opened.pop():
+			self.symtab.pop()
+
+	# Declaraciones. Se declaran al salir del nodo, después de resolver
+	# el valor inicial: en 'int x = x;' el segundo x es el de afuera.
+
+	def leave_VarDeclaration(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'var', _type_name(node.type_spec), node))
+
+	def leave_ArrayDeclaration(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'array', _type_name(node.type_spec), node))
+
+	def leave_ConstDeclaration(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'const', getattr(node.value, 'type', None), node))
+
+	def leave_LocalDecl(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'var', _type_name(node.type_spec), node))
+
+	def leave_ArrayLocalDecl(self, node):
+		node.name = intern(node.name)
+		self.declare(node, Symbol(node.name, 'array', _type_name(node.type_spec), node))
+
+	# Usos. Retornan el símbolo para las subclases (p.ej. typecheck).
+
+	def enter_SimpleLocation(self, node):
+		node.name = intern(node.name)
+		return self.lookup(node, node.name)
+
+	def enter_ArraySimpleLocation(self, node):
+		node.name = intern(node.name)
+		return self.lookup(node, node.name)
+
+	def enter_ArraySize(self, node):
+		node.name = intern(node.name)
+		return self.lookup(node, node.name)
+
+	def enter_FuncCall(self, node):
+		node.name = intern(node.name)
+		symbol = self.lookup(node, node.name)
+		if symbol is None:
+			return None
+		if symbol.kind != 'func':
+			self.error(node.lineno, f"'{node.name}' no es una función", 'no-es-funcion')
+			return None
+		if len(node.arguments) != len(symbol.params):
+			self.error(node.lineno, f"'{node.name}' espera {len(symbol.params)} argumentos "
+				f"y recibió {len(node.arguments)}", 'aridad')
+		return symbol
+
+
+def check_program(ast):
+	'''
+	Revisa el AST y retorna el CheckProgramVisitor usado.
+	'''
+	checker = CheckProgramVisitor()
+	checker.visit(ast)
+	return checker
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 checker.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_program(ast)
+	raise SystemExit(1 if diag.records else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,710 @@
+# coding: utf-8
+'''
+Intérprete por compilación a clausuras.
+
+En vez de despachar con getattr en cada nodo cada vez que se ejecuta
+(como interp.Interpreter), el AST se recorre una sola vez y cada nodo se
+convierte en una clausura de Python que llama directamente a las de sus
+hijos. BinOp('+', l, r) se vuelve
+
+    def ev(frame):
+        return left(frame) + right(frame)
+
+Los nombres se resuelven al compilar: cada variable local o parámetro
+tiene una posición fija en el marco (una lista por llamada) y cada
+global una posición en la lista de globales, así que leer una variable
+es un operator.itemgetter.
+
+Las clausuras de las expresiones retornan su valor. Las de las
+sentencias retornan None para seguir, BREAK para salir del ciclo o
+RETURN después de dejar el valor de retorno en frame[0]; no se usan
+excepciones para el control de flujo.
+
+La semántica es la misma de interp.Interpreter (y de vm), con int de
+64 bits. Como +, - y * conmutan con tomar el resto módulo 2**64, en una
+expresión int hecha solo de ellos (y del - unario) las clausuras
+interiores operan con los int de Python y solo la raíz comprueba que el
+resultado cabe y si no le da la vuelta con interp.wrap. Los arreglos
+los crea y accede un runtime intercambiable: ListArrays (listas de
+Python) por omisión, o nparray.NumpyArrays.
+
+    from closures import ClosureInterpreter
+    result = ClosureInterpreter(ast).call('fib', 20)
+'''
+import operator
+
+from cast import *
+from interp import ExecutionError, OPERATORS, INT_MIN, INT_MAX, wrap, zero, literal_value
+
+BREAK = 'break'
+RETURN = 'return'
+
+# Operadores que conmutan con tomar el resto módulo 2**64
+_ARITHMETIC = frozenset(['+', '-', '*', 'pe', 'me', 'te'])
+
+
+def _is_arithmetic(node):
+	if getattr(node, 'type', None) == 'float':
+		return False
+	cls = node.__class__
+	return (cls is BinOp and node.op in _ARITHMETIC) or (cls is UnaryOp and node.op == '-')
+
+
+def _binary(op, left, right, wrapped):
+	'''
+	Clausura de un operador binario. Los operadores más comunes se
+	escriben en línea para no pagar la llamada a la función de operator.
+	Con wrapped, el resultado de +, - y * se reduce a 64 bits.
+	'''
+	lo, hi = INT_MIN, INT_MAX
+	if wrapped and (op == '+' or op == 'pe'):
+		def ev(frame):
+			v = left(frame) + right(frame)
+			return v if lo <= v <= hi else wrap(v)
+	elif wrapped and (op == '-' or op == 'me'):
+		def ev(frame):
+			v = left(frame) - right(frame)
+			return v if lo <= v <= hi else wrap(v)
+	elif wrapped and (op == '*' or op == 'te'):
+		def ev(frame):
+			v = left(frame) * right(frame)
+			return v if lo <= v <= hi else wrap(v)
+	elif op == '+' or op == 'pe':
+		def ev(frame):
+			return left(frame) + right(frame)
+	elif op == '-' or op == 'me':
+		def ev(frame):
+			return left(frame) - right(frame)
+	elif op == '*' or op == 'te':
+		def ev(frame):
+			return left(frame) * right(frame)
+	elif op == '<':
+		def ev(frame):
+			return left(frame) < right(frame)
+	elif op == '<=':
+		def ev(frame):
+			return left(frame) <= right(frame)
+	elif op == '>':
+		def ev(frame):
+			return left(frame) > right(frame)
+	elif op == '>=':
+		def ev(frame):
+			return left(frame) >= right(frame)
+	elif op == '==':
+		def ev(frame):
+			return left(frame) == right(frame)
+	elif op == '!=':
+		def ev(frame):
+			return left(frame) != right(frame)
+	else:
+		func = OPERATORS.get(op)
+		if func is None:
+			raise ExecutionError(f"Operador '{op}' desconocido")
+		def ev(frame):
+			return func(left(frame), right(frame))
+	return ev
+
+
+def _binary_const(op, left, value, wrapped):
+	'''
+	Como _binary() cuando el operando derecho es un literal.
+	'''
+	lo, hi = INT_MIN, INT_MAX
+	if wrapped and (op == '+' or op == 'pe'):
+		def ev(frame):
+			v = left(frame) + value
+			return v if lo <= v <= hi else wrap(v)
+	elif wrapped and (op == '-' or op == 'me'):
+		def ev(frame):
+			v = left(frame) - value
+			return v if lo <= v <= hi else wrap(v)
+	elif wrapped and (op == '*' or op == 'te'):
+		def ev(frame):
+			v = left(frame) * value
+			return v if lo <= v <= hi else wrap(v)
+	elif op == '+' or op == 'pe':
+		def ev(frame):
+			return left(frame) + value
+	elif op == '-' or op == 'me':
+		def ev(frame):
+			return left(frame) - value
+	elif op == '*' or op == 'te':
+		def ev(frame):
+			return left(frame) * value
+	elif op == '<':
+		def ev(frame):
+			return left(frame) < value
+	elif op == '<=':
+		def ev(frame):
+			return left(frame) <= value
+	elif op == '>':
+		def ev(frame):
+			return left(frame) > value
+	elif op == '>=':
+		def ev(frame):
+			return left(frame) >= value
+	elif op == '==':
+		def ev(frame):
+			return left(frame) == value
+	elif op == '!=':
+		def ev(frame):
+			return left(frame) != value
+	else:
+		return None
+	return ev
+
+
+class ListArrays(object):
+	'''
+	Runtime de arreglos por omisión: listas de Python. Con checked un
+	índice negativo es un error; sin él se cuenta desde el final, como en
+	Python. Un índice mayor o igual al tamaño siempre es un error.
+
+	Otro runtime (p.ej. nparray.NumpyArrays) redefine estos métodos, que
+	el compilador llama una vez por nodo para obtener las clausuras.
+	'''
+	def __init__(self, checked=True):
+		self.checked = checked
+
+	def new(self, type):
+		'''
+		Función n -> arreglo nuevo de n elementos de tipo type.
+		'''
+		initial = zero(type)
+		def new(n):
+			return [initial] * n
+		return new
+
+	def load(self, array, index):
+		'''
+		Clausura que lee array(frame)[index(frame)].
+		'''
+		if not self.checked:
+			def ev(frame):
+				return array(frame)[index(frame)]
+			return ev
+		def ev(frame):
+			i = index(frame)
+			if i < 0:
+				raise IndexError(i)
+			return array(frame)[i]
+		return ev
+
+	def store(self, array, index):
+		'''
+		Función (frame, value) que escribe array(frame)[index(frame)].
+		'''
+		if not self.checked:
+			def store(frame, value):
+				array(frame)[index(frame)] = value
+			return store
+		def store(frame, value):
+			i = index(frame)
+			if i < 0:
+				raise IndexError(i)
+			array(frame)[i] = value
+		return store
+
+	def loop(self, compiler, node):
+		'''
+		Clausura frame -> bool que ejecuta el ciclo node completo y
+		retorna True, o False si no pudo y hay que ejecutarlo normalmente.
+		None si nunca puede.
+		'''
+		return None
+
+
+class _Function(object):
+	'''
+	Función compilada. body se asigna después de crear el objeto, para
+	que las llamadas (incluso recursivas) puedan referirse a él antes de
+	compilar su cuerpo.
+	'''
+	__slots__ = ('name', 'nparams', 'nslots', 'body')
+
+	def __init__(self, name, nparams):
+		self.name = name
+		self.nparams = nparams
+		self.nslots = 0
+		self.body = None
+
+
+class _Compiler(object):
+	'''
+	Traduce las declaraciones de un Program a clausuras.
+	'''
+	def __init__(self, functions, global_index, globals_, arrays):
+		self.functions = functions
+		self.arrays = arrays
+		self.global_index = global_index
+		self.globals = globals_
+		# Posición en el marco de cada variable visible; cada ámbito
+		# guarda lo que ocultó para restaurarlo al cerrar.
+		self.names = { }
+		self.scopes = []
+		self.nslots = 1
+
+	def push_scope(self):
+		self.scopes.append([])
+
+	def pop_scope(self):
+		names = self.names
+		for name, hidden in reversed(self.scopes.pop()):
+			if hidden is None:
+				del names[name]
+			else:
+				names[name] = hidden
+
+	def declare(self, name):
+		slot = self.nslots
+		self.nslots += 1
+		self.scopes[-1].append((name, self.names.get(name)))
+		self.names[name] = slot
+		return slot
+
+	# Funciones
+
+	def function(self, node, func):
+		self.push_scope()
+		for param in node.params:
+			self.declare(param.name)
+		body = node.body
+		if body.__class__ is Compound_Stmt:
+			func.body = self.compound(body, new_scope=False)
+		else:
+			func.body = self.stmt(body)
+		self.pop_scope()
+		func.nslots = self.nslots
+
+	# Sentencias
+
+	def stmt(self, node):
+		method = _STATEMENTS.get(node.__class__)
+		if method is not None:
+			return method(self, node)
+		return self.expr_stmt(node)
+
+	def expr_stmt(self, node):
+		if node.__class__ is WriteLocation and node.location.__class__ is SimpleLocation:
+			# Asignación a una variable como sentencia: sin valor de retorno
+			value = self.expr(node.value)
+			slot = self.names.get(node.location.name)
+			if slot is not None:
+				def st(frame):
+					frame[slot] = value(frame)
+			else:
+				g = self.global_(node.location.name)
+				globals_ = self.globals
+				def st(frame):
+					globals_[g] = value(frame)
+			return st
+		ev = self.expr(node)
+		def st(frame):
+			ev(frame)
+		return st
+
+	def compound(self, node, new_scope=True):
+		if new_scope:
+			self.push_scope()
+		stmts = [ self.stmt(decl) for decl in node.local_decl ]
+		stmts += [ self.stmt(stmt) for stmt in node.stmt_list ]
+		if new_scope:
+			self.pop_scope()
+		stmts = tuple(stmts)
+		def st(frame):
+			for s in stmts:
+				status = s(frame)
+				if status is not None:
+					return status
+		return st
+
+	def local(self, node):
+		value = self.expr(node.value) if node.value is not None else None
+		slot = self.declare(node.name)
+		if value is None:
+			initial = zero(getattr(node.type_spec, 'name', None))
+			def st(frame):
+				frame[slot] = initial
+		else:
+			def st(frame):
+				frame[slot] = value(frame)
+		return st
+
+	def array_local(self, node):
+		slot = self.declare(node.name)
+		def st(frame):
+			frame[slot] = None
+		return st
+
+	def if_stmt(self, node):
+		cond = self.expr(node.condition)
+		then = self.stmt(node.true_block)
+		if node.false_block is None:
+			def st(frame):
+				if cond(frame):
+					return then(frame)
+		else:
+			other = self.stmt(node.false_block)
+			def st(frame):
+				if cond(frame):
+					return then(frame)
+				return other(frame)
+		return st
+
+	def while_stmt(self, node):
+		cond = self.expr(node.condition)
+		body = self.stmt(node.body)
+		def st(frame):
+			while cond(frame):
+				status = body(frame)
+				if status is not None:
+					if status is BREAK:
+						break
+					return status
+		return self.vectorize(node, st)
+
+	def for_stmt(self, node):
+		self.push_scope()
+		init = self.stmt(node.initialStmt)
+		test = node.testExpr
+		cond = None if test is None or test.__class__ is Null_Stmt else self.expr(test)
+		update = self.expr(node.updpStmt) if node.updpStmt is not None else None
+		body = self.stmt(node.body)
+		def loop(frame):
+			while cond is None or cond(frame):
+				status = body(frame)
+				if status is not None:
+					if status is BREAK:
+						break
+					return status
+				if update is not None:
+					update(frame)
+		loop = self.vectorize(node, loop)
+		self.pop_scope()
+		def st(frame):
+			init(frame)
+			return loop(frame)
+		return st
+
+	def vectorize(self, node, loop):
+		'''
+		Si el runtime de arreglos sabe ejecutar el ciclo node de una vez
+		(vea nparray), retorna una clausura que lo intenta antes de caer
+		en loop; si no, retorna loop.
+		'''
+		vector = self.arrays.loop(self, node)
+		if vector is None:
+			return loop
+		def st(frame):
+			if not vector(frame):
+				return loop(frame)
+		return st
+
+	def break_stmt(self, node):
+		def st(frame):
+			return BREAK
+		return st
+
+	def return_stmt(self, node):
+		if node.value is None:
+			def st(frame):
+				frame[0] = None
+				return RETURN
+		else:
+			value = self.expr(node.value)
+			def st(frame):
+				frame[0] = value(frame)
+				return RETURN
+		return st
+
+	def null_stmt(self, node):
+		def st(frame):
+			pass
+		return st
+
+	# Expresiones
+
+	def expr(self, node):
+		method = _EXPRESSIONS.get(node.__class__)
+		if method is None:
+			raise ExecutionError(f'No se puede compilar {node.__class__.__name__}')
+		return method(self, node)
+
+	def literal(self, node):
+		value = literal_value(node)
+		def ev(frame):
+			return value
+		return ev
+
+	def operand(self, node):
+		'''
+		Como expr(), pero una expresión int de +, - y * (o - unario) no
+		se reduce a 64 bits: lo hace la raíz.
+		'''
+		if _is_arithmetic(node):
+			if node.__class__ is BinOp:
+				return self.binop(node, False)
+			return self.unaryop(node, False)
+		return self.expr(node)
+
+	def binop(self, node, wrapped=True):
+		op = node.op
+		if op in _ARITHMETIC and _is_arithmetic(node):
+			left = self.operand(node.left)
+			if node.right.__class__ in (IntegerLiteral, FloatLiteral):
+				return _binary_const(op, left, literal_value(node.right), wrapped)
+			return _binary(op, left, self.operand(node.right), wrapped)
+		left = self.expr(node.left)
+		if op == '&&' or op == '||':
+			right = self.expr(node.right)
+			if op == '&&':
+				def ev(frame):
+					return bool(left(frame)) and bool(right(frame))
+			else:
+				def ev(frame):
+					return bool(left(frame)) or bool(right(frame))
+			return ev
+		if (op == '/' or op == 'de') and getattr(node.left, 'type', None) == 'float':
+			right = self.expr(node.right)
+			def ev(frame):
+				return left(frame) / right(frame)
+			return ev
+		if node.right.__class__ in (IntegerLiteral, FloatLiteral):
+			ev = _binary_const(op, left, literal_value(node.right), False)
+			if ev is not None:
+				return ev
+		return _binary(op, left, self.expr(node.right), False)
+
+	def unaryop(self, node, wrapped=True):
+		op = node.op
+		if op == 'add' or op == 'sub':
+			return self.increment(node)
+		if op == '-' and _is_arithmetic(node):
+			operand = self.operand(node.right)
+			if not wrapped:
+				def ev(frame):
+					return -operand(frame)
+				return ev
+			def ev(frame):
+				return wrap(-operand(frame))
+			return ev
+		operand = self.expr(node.right)
+		if op == '-':
+			def ev(frame):
+				return -operand(frame)
+		elif op == '+':
+			return operand
+		elif op == '!':
+			def ev(frame):
+				return not operand(frame)
+		else:
+			raise ExecutionError(f"Operador '{op}' desconocido")
+		return ev
+
+	def increment(self, node):
+		step = 1 if node.op == 'add' else -1
+		operand = self.expr(node.right)
+		if node.right.__class__ is not ReadLocation:
+			def ev(frame):
+				return wrap(operand(frame) + step)
+			return ev
+		store = self.store(node.right.location)
+		def ev(frame):
+			value = wrap(operand(frame) + step)
+			store(frame, value)
+			return value
+		return ev
+
+	def global_(self, name):
+		g = self.global_index.get(name)
+		if g is None:
+			raise ExecutionError(f"'{name}' no está declarado")
+		return g
+
+	def variable(self, name):
+		'''
+		Función frame -> valor de la variable name.
+		'''
+		slot = self.names.get(name)
+		if slot is not None:
+			return operator.itemgetter(slot)
+		g = self.global_(name)
+		globals_ = self.globals
+		def ev(frame):
+			return globals_[g]
+		return ev
+
+	def setter(self, name):
+		'''
+		Función (frame, value) que asigna la variable name.
+		'''
+		slot = self.names.get(name)
+		if slot is not None:
+			def store(frame, value):
+				frame[slot] = value
+		else:
+			g = self.global_(name)
+			globals_ = self.globals
+			def store(frame, value):
+				globals_[g] = value
+		return store
+
+	def read(self, node):
+		location = node.location
+		if location.__class__ is ArraySimpleLocation:
+			return self.arrays.load(self.variable(location.name), self.expr(location.size))
+		return self.variable(location.name)
+
+	def store(self, location):
+		'''
+		Función store(frame, value) que escribe en location.
+		'''
+		if location.__class__ is ArraySimpleLocation:
+			return self.arrays.store(self.variable(location.name), self.expr(location.size))
+		return self.setter(location.name)
+
+	def write(self, node):
+		value = self.expr(node.value)
+		store = self.store(node.location)
+		def ev(frame):
+			v = value(frame)
+			store(frame, v)
+			return v
+		return ev
+
+	def call(self, node):
+		func = self.functions.get(node.name)
+		if func is None:
+			raise ExecutionError(f"La función '{node.name}' no existe")
+		args = tuple(self.expr(arg) for arg in node.arguments)
+		if len(args) != func.nparams:
+			raise ExecutionError(f"'{node.name}' espera {func.nparams} argumentos y recibió {len(args)}")
+		if len(args) == 1:
+			arg, = args
+			def ev(frame):
+				new = [None] * func.nslots
+				new[1] = arg(frame)
+				func.body(new)
+				return new[0]
+		elif len(args) == 2:
+			arg1, arg2 = args
+			def ev(frame):
+				new = [None] * func.nslots
+				new[1] = arg1(frame)
+				new[2] = arg2(frame)
+				func.body(new)
+				return new[0]
+		else:
+			def ev(frame):
+				new = [None] * func.nslots
+				new[1:len(args)+1] = [ arg(frame) for arg in args ]
+				func.body(new)
+				return new[0]
+		return ev
+
+	def new_array(self, node):
+		size = self.expr(node.expr)
+		new = self.arrays.new(getattr(node.type_spec, 'name', None))
+		def ev(frame):
+			n = size(frame)
+			if n < 0:
+				raise ExecutionError(f'Tamaño de arreglo negativo: {n}')
+			return new(n)
+		return ev
+
+	def array_size(self, node):
+		array = self.variable(node.name)
+		def ev(frame):
+			return len(array(frame))
+		return ev
+
+
+_STATEMENTS = {
+	Compound_Stmt: _Compiler.compound,
+	LocalDecl: _Compiler.local,
+	VarDeclaration: _Compiler.local,
+	ArrayLocalDecl: _Compiler.array_local,
+	If_Stmt: _Compiler.if_stmt,
+	While_Stmt: _Compiler.while_stmt,
+	ForStmt: _Compiler.for_stmt,
+	Break_Stmt: _Compiler.break_stmt,
+	Return_Stmt: _Compiler.return_stmt,
+	Null_Stmt: _Compiler.null_stmt,
+}
+
+_EXPRESSIONS = {
+	IntegerLiteral: _Compiler.literal,
+	FloatLiteral: _Compiler.literal,
+	BoolLiteral: _Compiler.literal,
+	CharLiteral: _Compiler.literal,
+	StringLiteral: _Compiler.literal,
+	BinOp: _Compiler.binop,
+	UnaryOp: _Compiler.unaryop,
+	ReadLocation: _Compiler.read,
+	WriteLocation: _Compiler.write,
+	FuncCall: _Compiler.call,
+	NewArrayExpr: _Compiler.new_array,
+	ArraySize: _Compiler.array_size,
+}
+
+
+class ClosureInterpreter(object):
+	'''
+	Compila un Program (ya verificado con typecheck) a clausuras y
+	evalúa las declaraciones globales; call() ejecuta una función.
+	arrays es el runtime de los arreglos (ListArrays por omisión).
+	'''
+	def __init__(self, program, arrays=None):
+		self.arrays = arrays if arrays is not None else ListArrays()
+		self.functions = { }
+		self.global_index = { }
+		self.globals = []
+		decls = program.decl_list
+		for decl in decls:
+			if decl.__class__ is FuncDeclaration:
+				self.functions[decl.name] = _Function(decl.name, len(decl.params))
+
+		for decl in decls:
+			if decl.__class__ in (VarDeclaration, ConstDeclaration, ArrayDeclaration):
+				self.global_index[decl.name] = len(self.globals)
+				self.globals.append(None)
+		for decl in decls:
+			if decl.__class__ is FuncDeclaration:
+				compiler = _Compiler(self.functions, self.global_index, self.globals, self.arrays)
+				compiler.function(decl, self.functions[decl.name])
+
+		# Valores iniciales de las globales, en orden
+		for decl in decls:
+			cls = decl.__class__
+			if cls is VarDeclaration or cls is ConstDeclaration:
+				if decl.value is not None:
+					value = _Compiler(self.functions, self.global_index, self.globals, self.arrays).expr(decl.value)
+					value = self._run(value, [None])
+				else:
+					value = zero(getattr(decl.type_spec, 'name', None))
+				self.globals[self.global_index[decl.name]] = value
+
+	def call(self, name, *args):
+		func = self.functions.get(name)
+		if func is None:
+			raise ExecutionError(f"La función '{name}' no existe")
+		if len(args) != func.nparams:
+			raise ExecutionError(f"'{name}' espera {func.nparams} argumentos y recibió {len(args)}")
+		frame = [None] * func.nslots
+		frame[1:len(args)+1] = args
+		self._run(func.body, frame)
+		return frame[0]
+
+	def _run(self, closure, frame):
+		try:
+			return closure(frame)
+		except IndexError:
+			raise ExecutionError('Índice fuera del arreglo') from None
+		except ZeroDivisionError:
+			raise ExecutionError('División por cero') from None
+		except RecursionError:
+			raise ExecutionError('Demasiadas llamadas anidadas') from None
+		except TypeError as e:
+			if 'NoneType' in str(e):
+				raise ExecutionError('Arreglo sin crear') from None
+			raise
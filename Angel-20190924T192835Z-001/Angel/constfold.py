@@ -0,0 +1,245 @@
+# coding: utf-8
+'''
+Plegado de constantes y simplificación algebraica.
+
+ConstantFolder es un cast.NodeTransformer que:
+
+  - evalúa los BinOp y UnaryOp cuyos operandos son literales
+    (IntegerLiteral, FloatLiteral, BoolLiteral), con la semántica de
+    interp: / y % enteros de C y enteros de 64 bits que dan la vuelta
+    (interp.wrap); una división por cero se deja como está;
+  - reemplaza los usos de una constante (ConstDeclaration) cuyo valor se
+    plegó a un literal, salvo donde un parámetro o variable local de la
+    función la oculta;
+  - simplifica las identidades x*1, 1*x, x/1, x+0, 0+x y x-0 (con 1.0 y
+    0.0 solo x*1.0, 1.0*x, x/1.0 y x-0.0, que son exactas en punto
+    flotante).
+
+Si el árbol ya pasó por typecheck, los literales nuevos conservan el
+atributo type del nodo que reemplazan, y una identidad solo se aplica
+si x tiene el mismo tipo que el literal.
+
+    from constfold import fold_constants
+    ast, stats = fold_constants(ast)
+    print(stats)       # {'before': ..., 'after': ..., 'folded': ..., ...}
+'''
+import operator
+
+from cast import *
+from interp import OPERATORS, INT_OPERATORS, wrap
+
+_TRUE, _FALSE = 'true', 'false'
+
+
+def _build_int_ops():
+	return { op: INT_OPERATORS[op] for op in ('+', '-', '*', '/', '%') }
+
+
+def _build_float_ops():
+	return { **{ op: OPERATORS[op] for op in ('+', '-', '*') }, '/': operator.truediv }
+
+_COMPARE = { op: OPERATORS[op] for op in ('<', '>', '<=', '>=', '==', '!=') }
+
+# (clase del literal, operador) -> función de Python
+ARITHMETIC = {
+	**{ (IntegerLiteral, op): f for op, f in _build_int_ops().items() },
+	**{ (FloatLiteral, op): f for op, f in _build_float_ops().items() },
+}
+
+# Identidades: (operador, lado del literal, valor del literal) -> se
+# conserva el otro operando. lado es 'left' o 'right'.
+IDENTITIES = {
+	('*', 'right', 1), ('*', 'left', 1), ('/', 'right', 1),
+	('+', 'right', 0), ('+', 'left', 0), ('-', 'right', 0),
+}
+
+_FLOAT_IDENTITIES = {
+	('*', 'right', 1.0), ('*', 'left', 1.0), ('/', 'right', 1.0), ('-', 'right', 0.0),
+}
+
+_LITERAL_TYPES = { IntegerLiteral: 'int', FloatLiteral: 'float', BoolLiteral: 'bool' }
+
+
+def count_nodes(node):
+	'''
+	Número de nodos AST alcanzables desde node.
+	'''
+	count = 0
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if node.__class__ is list:
+			stack.extend(node)
+		elif isinstance(node, AST):
+			count += 1
+			stack.extend(getattr(node, name) for name in node._fields)
+	return count
+
+
+def _bool(value):
+	return _TRUE if value else _FALSE
+
+
+class ConstantFolder(NodeTransformer):
+	'''
+	Pliega las expresiones constantes. Los contadores folded,
+	simplified y propagated cuentan cada tipo de reescritura.
+	'''
+	def __init__(self):
+		self.consts = { }
+		self.shadowed = frozenset()
+		self.folded = 0
+		self.simplified = 0
+		self.propagated = 0
+
+	def _literal(self, cls, value, node):
+		new = cls(value, lineno=getattr(node, 'lineno', None))
+		ty = getattr(node, 'type', None)
+		if ty is not None:
+			new.type = ty
+		self.folded += 1
+		return new
+
+	# Constantes
+
+	def visit_ConstDeclaration(self, node):
+		if node.value.__class__ in _LITERAL_TYPES:
+			self.consts[node.name] = node.value
+		else:
+			self.consts.pop(node.name, None)
+		return node
+
+	def enter_FuncDeclaration(self, node):
+		# Nombres que ocultan constantes en la función. Las declaraciones
+		# locales solo están en Compound_Stmt, así que no hace falta
+		# recorrer las expresiones.
+		names = { param.name for param in node.params }
+		stack = [node.body]
+		while stack:
+			item = stack.pop()
+			cls = item.__class__
+			if cls is Compound_Stmt:
+				names.update(decl.name for decl in item.local_decl if hasattr(decl, 'name'))
+				stack.extend(item.stmt_list)
+			elif cls is If_Stmt:
+				stack.append(item.true_block)
+				if item.false_block is not None:
+					stack.append(item.false_block)
+			elif cls is While_Stmt or cls is ForStmt:
+				stack.append(item.body)
+		self.shadowed = names
+
+	def visit_FuncDeclaration(self, node):
+		self.shadowed = frozenset()
+		return node
+
+	def visit_ReadLocation(self, node):
+		location = node.location
+		if location.__class__ is SimpleLocation:
+			value = self.consts.get(location.name)
+			if value is not None and location.name not in self.shadowed:
+				self.propagated += 1
+				new = value.__class__(value.value, lineno=getattr(node, 'lineno', None))
+				ty = getattr(value, 'type', None) or getattr(node, 'type', None)
+				if ty is not None:
+					new.type = ty
+				return new
+		return node
+
+	# Expresiones
+
+	def visit_UnaryOp(self, node):
+		operand = node.right
+		cls = operand.__class__
+		op = node.op
+		if cls is IntegerLiteral or cls is FloatLiteral:
+			if op == '-':
+				return self._literal(cls, wrap(-operand.value), node)
+			if op == '+':
+				return self._literal(cls, operand.value, node)
+		elif cls is BoolLiteral and op == '!':
+			return self._literal(BoolLiteral, _bool(operand.value == _FALSE), node)
+		return node
+
+	def visit_BinOp(self, node):
+		left, right = node.left, node.right
+		lcls, rcls = left.__class__, right.__class__
+		op = node.op
+		if lcls is rcls and lcls in _LITERAL_TYPES:
+			a, b = wrap(left.value), wrap(right.value)
+			if lcls is BoolLiteral:
+				if op == '&&':
+					return self._literal(BoolLiteral, _bool(a == _TRUE and b == _TRUE), node)
+				if op == '||':
+					return self._literal(BoolLiteral, _bool(a == _TRUE or b == _TRUE), node)
+				if op in ('==', '!='):
+					return self._literal(BoolLiteral, _bool(_COMPARE[op](a, b)), node)
+				return node
+			compare = _COMPARE.get(op)
+			if compare is not None:
+				return self._literal(BoolLiteral, _bool(compare(a, b)), node)
+			func = ARITHMETIC.get((lcls, op))
+			if func is None or (op in ('/', '%') and b == 0):
+				return node
+			return self._literal(lcls, func(a, b), node)
+		if rcls is IntegerLiteral or rcls is FloatLiteral:
+			if self._identity(op, 'right', right, left):
+				self.simplified += 1
+				return left
+		if lcls is IntegerLiteral or lcls is FloatLiteral:
+			if self._identity(op, 'left', left, right):
+				self.simplified += 1
+				return right
+		return node
+
+	def _identity(self, op, side, literal, other):
+		if literal.__class__ is IntegerLiteral:
+			if (op, side, literal.value) not in IDENTITIES:
+				return False
+		elif (op, side, literal.value) not in _FLOAT_IDENTITIES:
+			return False
+		ty = getattr(other, 'type', None)
+		return ty is None or ty == _LITERAL_TYPES[literal.__class__]
+
+
+def fold_constants(ast):
+	'''
+	Pliega las constantes de ast. Retorna el árbol resultante y un
+	diccionario con el número de nodos antes y después y el de cada tipo
+	de reescritura.
+	'''
+	before = count_nodes(ast)
+	folder = ConstantFolder()
+	ast = folder.visit(ast)
+	stats = {
+		'before': before,
+		'after': count_nodes(ast),
+		'folded': folder.folded,
+		'simplified': folder.simplified,
+		'propagated': folder.propagated,
+	}
+	return ast, stats
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file, write_ast
+	from errors import Diagnostics
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 constfold.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics():
+		ast = parse_file(sys.argv[1])
+	if ast is None:
+		raise SystemExit(1)
+	ast, stats = fold_constants(ast)
+	write_ast(ast, sys.stdout)
+	print(f"{stats['before']} nodos antes, {stats['after']} después", file=sys.stderr)
+
+if __name__ == '__main__':
+	main()
@@ -92,15 +92,21 @@ Para hacer el proyecto, siga las instrucciones que siguen a continuación.
 #
 # vea http://sly.readthedocs.io/en/latest/
 # ----------------------------------------------------------------------
+import os
 import sly
 
+# ----------------------------------------------------------------------
+# Las tablas LALR se guardan en disco para no reconstruirlas en cada 
+# proceso. Vea lrcache.py.
+from lrcache import CachedParser
+
 # ----------------------------------------------------------------------
 # El siguiente import carga la función error(lineno, msg) que se debe
 # usar para informar todos los mensajes de error emitidos por su analizador. 
 # Las pruebas unitarias y otras características del compilador se basarán 
 # en esta función. Consulte el archivo errors.py para obtener más 
 # documentación sobre el mecanismo de manejo de errores.
-from errors import error
+from errors import error, Diagnostics
 
 # ------------------------------------------------- ---------------------
 # Importar la clase lexer. Su lista de tokens es necesaria para validar y 
@@ -112,8 +118,13 @@ from lexer import Lexer
 # Lea las instrucciones en ast.py 
 from cast import *
 
-class Parser(sly.Parser):
-	debugfile = 'parser.txt'
+class Parser(CachedParser):
+	# El archivo parser.txt solo se genera si se define la variable de
+	# entorno MINIC_PARSER_DEBUG=parser.txt
+
+	# Los nodos que construyen las reglas no validan los tipos de sus
+	# argumentos salvo en modo de depuración (MINIC_VALIDATE_AST=1).
+	validate = bool(os.environ.get('MINIC_VALIDATE_AST'))
 
 	tokens = Lexer.tokens
 	
@@ -315,7 +326,7 @@ class Parser(sly.Parser):
 		
 	@_('IDENT "." SIZE')
 	def expr(self,p):
-		pass
+		return ArraySize(p.IDENT,lineno=p.lineno)
 		
 	@_('BOOL_LIT')
 	def expr(self,p):
@@ -362,6 +373,12 @@ class Parser(sly.Parser):
 	def empty(self,p):
 		return Null_Stmt(None)
 
+	def parse(self, tokens):
+		if self.validate:
+			return super().parse(tokens)
+		with trusted_nodes():
+			return super().parse(tokens)
+
 	# ----------------------------------------------------------------------
 	# NO MODIFIQUE
 	#
@@ -370,23 +387,51 @@ class Parser(sly.Parser):
 	# el final de archivo (EOF).
 	def error(self, p):
 		if p:
-			error(p.lineno, "Error de sintaxis en la entrada en el token '%s'" % p.value)
+			error(p.lineno, "Error de sintaxis en la entrada en el token '%s'" % p.value, code='sintaxis')
 		else:
-			error('EOF','Error de sintaxis. No mas entrada.')
+			error('EOF','Error de sintaxis. No mas entrada.', code='sintaxis')
 			
 # ----------------------------------------------------------------------
 #                  NO MODIFIQUE NADA A CONTINUACIÓN
 # ----------------------------------------------------------------------
 
-def parse(source):
+def parse(source, lexer=None, cache=None):
 	'''
 	Parser el código fuente en un AST. Devuelve la parte superior del árbol AST.
+	lexer puede ser cualquier objeto con tokenize(), p.ej. scanner.Scanner().
+	cache puede ser un astcache.ASTCache.
 	'''
-	lexer  = Lexer()
+	if cache is not None:
+		return cache.parse(source, lexer)
+	if lexer is None:
+		lexer = Lexer()
 	parser = Parser()
 	ast = parser.parse(lexer.tokenize(source))
 	return ast
+
+def parse_file(filename, lexer=None):
+	'''
+	Igual que parse() pero lee el archivo por bloques en lugar de cargarlo
+	completo en memoria. Vea scanner.tokenize_file().
+	'''
+	from scanner import tokenize_file
+	parser = Parser()
+	with open(filename) as f:
+		return parser.parse(tokenize_file(f, lexer))
 	
+def write_ast(ast, out, bufsize=4096):
+	'''
+	Escribe el volcado del AST (una línea por nodo) en out a medida que
+	se recorre el árbol. Las líneas se agrupan de a bufsize por escritura.
+	'''
+	lines = []
+	for depth, node in iter_flatten(ast):
+		lines.append('%s: %s%s\n' % (getattr(node, 'lineno', None), ' '*(4*depth), node))
+		if len(lines) >= bufsize:
+			out.write(''.join(lines))
+			lines.clear()
+	out.write(''.join(lines))
+
 def main():
 	'''
 	Programa principal. Usado para probar.
@@ -398,11 +443,11 @@ def main():
 		raise SystemExit(1)
 
 	# Parse y crea el AST
-	ast = parse(open(sys.argv[1]).read())
+	with Diagnostics():
+		ast = parse_file(sys.argv[1], Lexer())
 
 	# Genera el árbol de análisis sintáctico resultante
-	for depth, node in flatten(ast):
-		print('%s: %s%s' % (getattr(node, 'lineno', None), ' '*(4*depth), node))
+	write_ast(ast, sys.stdout)
 		
 if __name__ == '__main__':
 	main()
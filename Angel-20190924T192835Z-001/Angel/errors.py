@@ -24,37 +24,156 @@ errores informados hasta el momento. Diferentes etapas del compilador
 pueden usar esto para decidir si continuar o no procesando.
 
 Use clear_errors() para borrar el número total de errores.
+
+Los mensajes se guardan como registros Diagnostic (archivo, línea, columna,
+severidad, código y mensaje) en un colector Diagnostics. Cada compilación
+puede usar su propio colector, de modo que varias compilaciones en hilos
+distintos no comparten contadores:
+
+    with Diagnostics(filename='foo.c') as diag:
+        ast = parse(source)
+    if diag.num_errors:
+        for d in diag.records:
+            ...
+
+Dentro del bloque with, error(), errors_reported() y clear_errors() usan
+ese colector. Fuera de cualquier bloque se usa un colector global que
+escribe cada mensaje de inmediato, como antes, y no guarda los
+registros (solo los cuenta), así que no crece durante la vida del
+proceso. Los colectores creados por el usuario agrupan los mensajes y
+los escriben de a muchos.
 '''
 
+import contextvars
 import sys
+from collections import deque, namedtuple
+
+
+class Diagnostic(namedtuple('Diagnostic', ['filename', 'lineno', 'column', 'severity', 'code', 'message'])):
+    '''
+    Un mensaje del compilador. str() da el mismo formato que imprime error().
+    '''
+    __slots__ = ()
 
-_num_errors = 0
+    def __str__(self):
+        if not self.filename:
+            return "{}: {}".format(self.lineno, self.message)
+        elif self.lineno is None:
+            return "{}: {}".format(self.filename, self.message)
+        else:
+            return "{}:{}: {}".format(self.filename, self.lineno, self.message)
+
+
+class Diagnostics(object):
+    '''
+    Colector de mensajes de una compilación.
+
+    filename  nombre de archivo por omisión de los mensajes
+    stream    destino de los mensajes (por omisión sys.stderr al escribir)
+    echo      si es False los mensajes solo se guardan en records
+    batch     número de mensajes pendientes que provoca una escritura; con
+              1 cada mensaje se escribe al reportarlo, sin flush()
+    keep      máximo de mensajes que se guardan en records (los más
+              recientes); None los guarda todos y 0 ninguno
+    '''
+    def __init__(self, filename=None, stream=None, echo=True, batch=256, keep=None):
+        self.filename = filename
+        self.stream = stream
+        self.echo = echo
+        self.batch = batch
+        self.keep = keep
+        self.records = self._new_records()
+        self.num_errors = 0
+        self._pending = []
+        self._tokens = []
+
+    def _new_records(self):
+        return [] if self.keep is None else deque(maxlen=self.keep)
+
+    def report(self, lineno, message, filename=None, column=None, code=None, severity='error'):
+        '''
+        Guarda un mensaje. Solo los de severidad 'error' cuentan en num_errors.
+        '''
+        diag = Diagnostic(filename or self.filename, lineno, column, severity, code, message)
+        self.records.append(diag)
+        if severity == 'error':
+            self.num_errors += 1
+        if self.echo:
+            if self.batch <= 1:
+                (self.stream or sys.stderr).write(str(diag) + '\n')
+            else:
+                self._pending.append(diag)
+                if len(self._pending) >= self.batch:
+                    self.flush()
+        return diag
+
+    def flush(self):
+        '''
+        Escribe los mensajes pendientes en una sola operación.
+        '''
+        pending = self._pending
+        if pending:
+            self._pending = []
+            stream = self.stream or sys.stderr
+            stream.write(''.join(str(diag) + '\n' for diag in pending))
+            stream.flush()
+
+    def clear(self):
+        self.flush()
+        self.records = self._new_records()
+        self.num_errors = 0
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._tokens.pop())
+        self.flush()
+
+
+# Colector global, usado fuera de cualquier bloque with Diagnostics()
+_default = Diagnostics(batch=1, keep=0)
+_current = contextvars.ContextVar('minic_diagnostics')
+
+
+def current():
+    '''
+    Retorna el colector activo en el contexto (hilo o tarea) actual.
+    '''
+    return _current.get(_default)
 
 
-def error(lineno, message, filename=None):
+def error(lineno, message, filename=None, column=None, code=None):
     '''
     Reporta un error de compilación a todos los suscriptores
     '''
-    global _num_errors
-    if not filename:
-        errmsg = "{}: {}".format(lineno, message)
-    else:
-        errmsg = "{}:{}: {}".format(filename, lineno, message)
+    current().report(lineno, message, filename, column, code)
+
 
-    print(errmsg, file=sys.stderr)
-    _num_errors += 1
+def warning(lineno, message, filename=None, column=None, code=None):
+    '''
+    Reporta una advertencia. No cuenta en errors_reported().
+    '''
+    current().report(lineno, message, filename, column, code, severity='warning')
+
+
+def column(text, index):
+    '''
+    Columna (desde 1) de la posición index dentro de text.
+    '''
+    return index - text.rfind('\n', 0, index)
 
 
 def errors_reported():
     '''
     Retorna el número de errores reportados
     '''
-    return _num_errors
+    return current().num_errors
 
 
 def clear_errors():
     '''
     Borre la cantidad total de errores reportados.
     '''
-    global _num_errors
-    _num_errors = 0
+    current().clear()
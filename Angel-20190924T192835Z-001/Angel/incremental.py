@@ -0,0 +1,213 @@
+# coding: utf-8
+'''
+Análisis incremental para editores y modo "watch".
+
+IncrementalParser conserva el texto, el AST y la posición de cada
+declaración de nivel superior (obtenida con Parser.index_position). Ante
+una edición solo se vuelven a analizar, léxica y sintácticamente, las
+declaraciones que toca la edición; el resto de los subárboles se
+reutilizan tal cual y, si la edición agregó o quitó líneas, solo se
+corrige su lineno.
+
+    inc = IncrementalParser()
+    ast = inc.parse(text)
+    ast = inc.edit(start, end, 'nuevo texto')   # reemplaza text[start:end]
+    ast = inc.update(nuevo_texto)               # calcula la edición solo
+
+El árbol se actualiza en el lugar: ast es siempre el mismo Program.
+
+La región que se vuelve a analizar va desde el final de la declaración
+anterior a las tocadas hasta el principio de la siguiente. El análisis
+léxico de la región continúa hasta el primer token que le sigue; si ese
+token no empieza justo donde empezaba la declaración siguiente (p.ej.
+porque la edición abrió un comentario), o si la región produce algún
+error, se vuelve a analizar todo el texto. Los errores se reportan solo
+en ese análisis completo, así que son los mismos que daría cparse.parse().
+'''
+import bisect
+
+import errors
+from cast import AST, Program
+from cparse import Lexer, Parser
+
+
+class IncrementalParser(object):
+	'''
+	Analizador que reutiliza el AST anterior después de cada edición.
+	lexer puede ser un lexer.Lexer (por omisión) o un scanner.Scanner.
+	'''
+	def __init__(self, lexer=None, parser=None):
+		self.lexer = lexer if lexer is not None else Lexer()
+		self.parser = parser if parser is not None else Parser()
+		self.text = ''
+		self.ast = None
+		# Por cada declaración de self.ast.decl_list: [inicio, fin,
+		# lineno del primer token, lineno del último token]. None si el
+		# último análisis tuvo errores.
+		self.spans = None
+		self.full_parses = 0
+		self.partial_parses = 0
+
+	def parse(self, text):
+		'''
+		Analiza el texto completo y retorna el AST.
+		'''
+		self.text = text
+		self.full_parses += 1
+		tokens = []
+		with errors.Diagnostics(echo=False) as diag:
+			ast = self._parse(self._record(self.lexer.tokenize(text), tokens))
+		active = errors.current()
+		for d in diag.records:
+			active.report(d.lineno, d.message, d.filename, d.column, d.code, d.severity)
+
+		spans = None
+		if not diag.records and isinstance(ast, Program):
+			spans = self._spans(ast.decl_list, tokens)
+		if self.ast is not None and isinstance(ast, Program):
+			# Conservar el mismo Program para quien guarde una referencia
+			self.ast.decl_list = ast.decl_list
+		else:
+			self.ast = ast
+		self.spans = spans
+		return self.ast
+
+	def edit(self, start, end, new_text):
+		'''
+		Reemplaza self.text[start:end] por new_text y retorna el AST
+		actualizado.
+		'''
+		old = self.text
+		if not 0 <= start <= end <= len(old):
+			raise ValueError(f'Edición fuera del texto: {start}:{end}')
+		text = old[:start] + new_text + old[end:]
+		spans = self.spans
+		if spans is None or not spans:
+			return self.parse(text)
+
+		# Declaraciones tocadas por la edición: first <= i < last
+		starts = [ s[0] for s in spans ]
+		first = bisect.bisect_left([ s[1] for s in spans ], start)
+		last = bisect.bisect_right(starts, end)
+		first = min(first, last)
+
+		delta = len(new_text) - (end - start)
+		lo = spans[first-1][1] if first > 0 else 0
+		lineno = spans[first-1][3] if first > 0 else 1
+		if last < len(spans):
+			hi = spans[last][0] + delta
+			next_lineno = spans[last][2]
+		else:
+			hi = len(text)
+			next_lineno = None
+
+		with errors.Diagnostics(echo=False) as diag:
+			result = self._reparse(text, lo, hi, lineno, next_lineno)
+		if result is None or diag.records:
+			return self.parse(text)
+		decls, new_spans, shift = result
+		if not decls and last - first == len(spans):
+			# Un programa sin declaraciones es un error de sintaxis
+			return self.parse(text)
+
+		self.text = text
+		self.partial_parses += 1
+		for span in spans[last:]:
+			span[0] += delta
+			span[1] += delta
+		if shift:
+			for span in spans[last:]:
+				span[2] += shift
+				span[3] += shift
+			for decl in self.ast.decl_list[last:]:
+				_shift_lines(decl, shift)
+		spans[first:last] = new_spans
+		self.ast.decl_list[first:last] = decls
+		return self.ast
+
+	def update(self, text):
+		'''
+		Igual que edit() pero recibe el texto nuevo completo; la edición
+		es lo que queda entre el prefijo y el sufijo comunes.
+		'''
+		old = self.text
+		n = min(len(old), len(text))
+		start = 0
+		while start < n and old[start] == text[start]:
+			start += 1
+		end = 0
+		while end < n - start and old[-1-end] == text[-1-end]:
+			end += 1
+		return self.edit(start, len(old) - end, text[start:len(text)-end])
+
+	def _reparse(self, text, lo, hi, lineno, next_lineno):
+		'''
+		Analiza text[lo:hi]. Retorna las declaraciones, sus posiciones y el
+		cambio de lineno de lo que sigue, o None si hay que analizar todo.
+		'''
+		# Análisis léxico de la región, hasta el primer token siguiente
+		tokens = []
+		shift = 0
+		stream = self.lexer.tokenize(text, lineno, lo)
+		try:
+			for tok in stream:
+				if tok.index >= hi:
+					if tok.index != hi:
+						return None
+					shift = tok.lineno - next_lineno
+					break
+				tokens.append(tok)
+			else:
+				# La región se tragó la declaración siguiente
+				if next_lineno is not None:
+					return None
+		finally:
+			stream.close()
+		if not tokens:
+			return [], [], shift
+		ast = self._parse(iter(tokens))
+		if not isinstance(ast, Program):
+			return None
+		return ast.decl_list, self._spans(ast.decl_list, tokens), shift
+
+	def _parse(self, tokens):
+		# SLY guarda la posición de cada valor reducido y nunca limpia esas
+		# tablas; se vacían para que no crezcan con cada edición.
+		if hasattr(self.parser, '_index_positions'):
+			self.parser._index_positions.clear()
+			self.parser._line_positions.clear()
+		return self.parser.parse(tokens)
+
+	def _record(self, tokens, out):
+		for tok in tokens:
+			out.append(tok)
+			yield tok
+
+	def _spans(self, decls, tokens):
+		last_lineno = { tok.end: tok.lineno for tok in tokens }
+		spans = []
+		for decl in decls:
+			start, end = self.parser.index_position(decl)
+			spans.append([start, end, self.parser.line_position(decl), last_lineno[end]])
+		return spans
+
+
+def _shift_lines(node, shift):
+	'''
+	Suma shift al lineno de todos los nodos del subárbol.
+	'''
+	stack = [node]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		node = pop()
+		if node.__class__ is list:
+			stack.extend(node)
+		elif isinstance(node, AST):
+			lineno = getattr(node, 'lineno', None)
+			if lineno.__class__ is int:
+				node.lineno = lineno + shift
+			for name in node._fields:
+				value = getattr(node, name)
+				if value is not None and value.__class__ is not str:
+					push(value)
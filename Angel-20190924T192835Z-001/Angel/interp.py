@@ -0,0 +1,355 @@
+# coding: utf-8
+'''
+Intérprete de referencia que recorre el AST.
+
+Interpreter es un cast.NodeVisitor que evalúa cada nodo con un método
+visit_X que retorna su valor. Es la implementación más directa posible:
+los ámbitos son una lista de diccionarios que se recorre en cada acceso,
+return y break son excepciones y los arreglos son listas. Sirve para
+comprobar los resultados de los intérpretes más rápidos (vm) y como
+punto de comparación en bench.py.
+
+La semántica es la de la representación intermedia (ir): / y % enteros
+son los de C y los bool (literales, valores iniciales, comparaciones y
+!) son True y False; solo x86 los representa como 1 y 0. Los int son de
+64 bits en complemento a dos: un resultado de +, -, *, / o del - unario
+que no cabe da la vuelta (wrap()), igual que en x86 y en los arreglos de
+NumPy, en vez de crecer como un int de Python. Todos los motores (vm,
+closures, nparray, pygen, x86) siguen esta regla. El árbol debe venir de
+typecheck, para distinguir la división entera de la de punto flotante.
+
+    from interp import Interpreter
+    result = Interpreter(ast).call('main', 10)
+'''
+import operator
+
+from cast import *
+
+
+class ExecutionError(Exception):
+	'''
+	Error durante la ejecución de un programa MiniC (índice fuera del
+	arreglo, división por cero, arreglo sin crear, etc.).
+	'''
+
+
+# Rango de int (int64_t de C)
+INT_MIN = -1 << 63
+INT_MAX = (1 << 63) - 1
+
+_INT_MASK = (1 << 64) - 1
+
+
+def wrap(value):
+	'''
+	Reduce un int de Python a 64 bits en complemento a dos. Los valores
+	que no son int (float, bool, ...) se retornan sin cambios.
+	'''
+	if value.__class__ is int and not INT_MIN <= value <= INT_MAX:
+		return ((value - INT_MIN) & _INT_MASK) + INT_MIN
+	return value
+
+
+def c_div(a, b):
+	'''
+	División entera de C: trunca hacia cero. INT_MIN / -1 da INT_MIN.
+	'''
+	q = abs(a) // abs(b)
+	return wrap(q if (a < 0) == (b < 0) else -q)
+
+
+def c_mod(a, b):
+	'''
+	Resto de C: tiene el signo del dividendo.
+	'''
+	r = abs(a) % abs(b)
+	return r if a >= 0 else -r
+
+
+def _wrapped(func):
+	lo, hi = INT_MIN, INT_MAX
+	def op(a, b):
+		v = func(a, b)
+		return v if lo <= v <= hi else wrap(v)
+	return op
+
+
+# Operador binario de MiniC -> función de Python sobre escalares, con la
+# semántica entera de C para / y %. && y || no están: evalúan en corto.
+OPERATORS = {
+	'+': operator.add, '-': operator.sub, '*': operator.mul, '/': c_div, '%': c_mod,
+	'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+	'==': operator.eq, '!=': operator.ne,
+	# Operadores compuestos de la gramática (vea typecheck._COMPOUND)
+	'pe': operator.add, 'me': operator.sub, 'te': operator.mul, 'de': c_div, 'mde': c_mod,
+}
+
+# Como OPERATORS, pero +, - y * dan la vuelta en 64 bits: para operandos int
+INT_OPERATORS = {
+	**OPERATORS,
+	**{ op: _wrapped(OPERATORS[op]) for op in ('+', '-', '*', 'pe', 'me', 'te') },
+}
+
+
+def zero(type):
+	'''
+	Valor inicial de una variable de tipo type.
+	'''
+	if type == 'float':
+		return 0.0
+	if type == 'bool':
+		return False
+	if type in ('int', 'char'):
+		return 0
+	return None
+
+
+def literal_value(node):
+	'''
+	Valor de un literal en tiempo de ejecución.
+	'''
+	cls = node.__class__
+	if cls is BoolLiteral:
+		return node.value == 'true'
+	if cls is CharLiteral:
+		return ord(node.value[1]) if len(node.value) >= 3 else 0
+	if cls is StringLiteral:
+		return node.value[1:-1]
+	if cls is IntegerLiteral:
+		return wrap(node.value)
+	return node.value
+
+
+class _Return(Exception):
+	def __init__(self, value):
+		self.value = value
+
+
+class _Break(Exception):
+	pass
+
+
+class Interpreter(NodeVisitor):
+	'''
+	Evalúa un Program. Al construirlo se evalúan las declaraciones
+	globales; call() ejecuta una función.
+	'''
+	def __init__(self, program):
+		self.functions = { }
+		self.globals = { }
+		self.scopes = []
+		self.visit(program)
+
+	def visit(self, node):
+		return getattr(self, 'visit_' + node.__class__.__name__)(node)
+
+	def call(self, name, *args):
+		func = self.functions.get(name)
+		if func is None:
+			raise ExecutionError(f"La función '{name}' no existe")
+		saved = self.scopes
+		self.scopes = [{ param.name: arg for param, arg in zip(func.params, args) }]
+		try:
+			self.visit(func.body)
+		except _Return as ret:
+			return ret.value
+		finally:
+			self.scopes = saved
+		return None
+
+	# Nombres
+
+	def lookup(self, name):
+		for scope in reversed(self.scopes):
+			if name in scope:
+				return scope
+		if name in self.globals:
+			return self.globals
+		raise ExecutionError(f"'{name}' no está declarado")
+
+	def declare(self, name, value):
+		(self.scopes[-1] if self.scopes else self.globals)[name] = value
+
+	def store(self, location, value):
+		if location.__class__ is ArraySimpleLocation:
+			array = self.lookup(location.name)[location.name]
+			index = self.visit(location.size)
+			self.check_index(location.name, array, index)
+			array[index] = value
+		else:
+			self.lookup(location.name)[location.name] = value
+
+	def check_index(self, name, array, index):
+		if array is None:
+			raise ExecutionError(f"El arreglo '{name}' no fue creado")
+		if not 0 <= index < len(array):
+			raise ExecutionError(f"Índice {index} fuera de '{name}' ({len(array)} elementos)")
+
+	# Declaraciones
+
+	def visit_Program(self, node):
+		for decl in node.decl_list:
+			if decl.__class__ is FuncDeclaration:
+				self.functions[decl.name] = decl
+			else:
+				self.visit(decl)
+
+	def visit_VarDeclaration(self, node):
+		value = self.visit(node.value) if node.value is not None else zero(node.type_spec.name)
+		self.declare(node.name, value)
+
+	visit_LocalDecl = visit_VarDeclaration
+
+	def visit_ConstDeclaration(self, node):
+		self.declare(node.name, self.visit(node.value))
+
+	def visit_ArrayDeclaration(self, node):
+		self.declare(node.name, None)
+
+	def visit_ArrayLocalDecl(self, node):
+		self.declare(node.name, None)
+
+	# Sentencias
+
+	def visit_Compound_Stmt(self, node):
+		self.scopes.append({ })
+		try:
+			for decl in node.local_decl:
+				self.visit(decl)
+			for stmt in node.stmt_list:
+				self.visit(stmt)
+		finally:
+			self.scopes.pop()
+
+	def visit_If_Stmt(self, node):
+		if self.visit(node.condition):
+			self.visit(node.true_block)
+		elif node.false_block is not None:
+			self.visit(node.false_block)
+
+	def visit_While_Stmt(self, node):
+		try:
+			while self.visit(node.condition):
+				self.visit(node.body)
+		except _Break:
+			pass
+
+	def visit_ForStmt(self, node):
+		self.scopes.append({ })
+		try:
+			self.visit(node.initialStmt)
+			test = node.testExpr
+			if isinstance(test, Null_Stmt):
+				test = None
+			while test is None or self.visit(test):
+				self.visit(node.body)
+				if node.updpStmt is not None:
+					self.visit(node.updpStmt)
+		except _Break:
+			pass
+		finally:
+			self.scopes.pop()
+
+	def visit_Break_Stmt(self, node):
+		raise _Break()
+
+	def visit_Return_Stmt(self, node):
+		raise _Return(self.visit(node.value) if node.value is not None else None)
+
+	def visit_Null_Stmt(self, node):
+		return None
+
+	# Expresiones
+
+	def visit_IntegerLiteral(self, node):
+		return wrap(node.value)
+
+	def visit_FloatLiteral(self, node):
+		return node.value
+
+	def visit_BoolLiteral(self, node):
+		return literal_value(node)
+
+	visit_CharLiteral = visit_BoolLiteral
+	visit_StringLiteral = visit_BoolLiteral
+
+	def visit_BinOp(self, node):
+		op = node.op
+		if op == '&&':
+			return bool(self.visit(node.left)) and bool(self.visit(node.right))
+		if op == '||':
+			return bool(self.visit(node.left)) or bool(self.visit(node.right))
+		a = self.visit(node.left)
+		b = self.visit(node.right)
+		try:
+			if op == '+' or op == 'pe':
+				return wrap(a + b)
+			if op == '-' or op == 'me':
+				return wrap(a - b)
+			if op == '*' or op == 'te':
+				return wrap(a * b)
+			if op == '/' or op == 'de':
+				return a / b if getattr(node.left, 'type', None) == 'float' else c_div(a, b)
+			if op == '%' or op == 'mde':
+				return c_mod(a, b)
+		except ZeroDivisionError:
+			raise ExecutionError('División por cero') from None
+		if op == '<':
+			return a < b
+		if op == '<=':
+			return a <= b
+		if op == '>':
+			return a > b
+		if op == '>=':
+			return a >= b
+		if op == '==':
+			return a == b
+		if op == '!=':
+			return a != b
+		raise ExecutionError(f"Operador '{op}' desconocido")
+
+	def visit_UnaryOp(self, node):
+		op = node.op
+		value = self.visit(node.right)
+		if op == '-':
+			return wrap(-value)
+		if op == '+':
+			return value
+		if op == '!':
+			return not value
+		if op == 'add' or op == 'sub':
+			value = wrap(value + 1 if op == 'add' else value - 1)
+			if node.right.__class__ is ReadLocation:
+				self.store(node.right.location, value)
+			return value
+		raise ExecutionError(f"Operador '{op}' desconocido")
+
+	def visit_ReadLocation(self, node):
+		location = node.location
+		if location.__class__ is ArraySimpleLocation:
+			array = self.lookup(location.name)[location.name]
+			index = self.visit(location.size)
+			self.check_index(location.name, array, index)
+			return array[index]
+		return self.lookup(location.name)[location.name]
+
+	def visit_WriteLocation(self, node):
+		value = self.visit(node.value)
+		self.store(node.location, value)
+		return value
+
+	def visit_FuncCall(self, node):
+		args = [ self.visit(arg) for arg in node.arguments ]
+		return self.call(node.name, *args)
+
+	def visit_ArraySize(self, node):
+		array = self.lookup(node.name)[node.name]
+		if array is None:
+			raise ExecutionError(f"El arreglo '{node.name}' no fue creado")
+		return len(array)
+
+	def visit_NewArrayExpr(self, node):
+		size = self.visit(node.expr)
+		if size < 0:
+			raise ExecutionError(f'Tamaño de arreglo negativo: {size}')
+		return [zero(node.type_spec.name)] * size
@@ -0,0 +1,736 @@
+# coding: utf-8
+'''
+Representación intermedia de tres direcciones.
+
+lower(program) traduce un Program (de preferencia ya verificado con
+typecheck, para elegir las operaciones de punto flotante) a un Module:
+una lista de Function, cada una con sus bloques básicos y su grafo de
+control de flujo. If_Stmt, While_Stmt, ForStmt, Break_Stmt, Return_Stmt
+y los operadores && y || se vuelven saltos explícitos.
+
+Cada instrucción son cuatro enteros (op, d, a, b) guardados seguidos en
+un array('q') por bloque. Los operandos son:
+
+  - registros virtuales: enteros >= 0, densos por función;
+  - constantes: enteros < 0; -1-k es la posición k de Function.consts;
+  - inmediatos: números de bloque, de global, de función o de argumentos.
+
+FORMATS dice, para cada código de operación, qué es cada uno de los tres
+campos: W (registro que se escribe), R (operando que se lee), I
+(inmediato) o '-' (sin uso). Las variables locales y parámetros son
+registros que se pueden escribir varias veces; los temporales de las
+expresiones se escriben una sola vez.
+
+La última instrucción de cada bloque es JUMP, BR o RET/RETV, y de ella
+salen los sucesores del bloque.
+
+    from ir import lower
+    module = lower(ast)
+    print(module.dump())
+'''
+from array import array
+
+from cast import *
+from interp import zero, literal_value
+
+# Códigos de operación y el formato de sus campos (d, a, b)
+OPCODES = [
+	('NOP',     '---'),
+	('MOV',     'WR-'),    # d = a
+	('ADD',     'WRR'),    # d = a + b (enteros)
+	('SUB',     'WRR'),
+	('MUL',     'WRR'),
+	('DIV',     'WRR'),    # división entera de C (trunca hacia cero)
+	('MOD',     'WRR'),    # resto de C (signo del dividendo)
+	('NEG',     'WR-'),
+	('FADD',    'WRR'),
+	('FSUB',    'WRR'),
+	('FMUL',    'WRR'),
+	('FDIV',    'WRR'),
+	('FNEG',    'WR-'),
+	('NOT',     'WR-'),    # d = not a (bool)
+	('LT',      'WRR'),    # comparaciones: d = True o False (1 o 0 en x86)
+	('LE',      'WRR'),
+	('GT',      'WRR'),
+	('GE',      'WRR'),
+	('EQ',      'WRR'),
+	('NE',      'WRR'),
+	('LOADG',   'WI-'),    # d = globals[a]
+	('STOREG',  'IR-'),    # globals[d] = a
+	('ALOAD',   'WRR'),    # d = a[b]
+	('ASTORE',  'RRR'),    # d[a] = b
+	('NEWARRAY', 'WRR'),   # d = arreglo de a elementos; b es la constante del typecode
+	('ALEN',    'WR-'),    # d = número de elementos del arreglo a
+	('PARAM',   '-R-'),    # agrega a a los argumentos de la próxima llamada
+	('CALL',    'WII'),    # d = functions[a](últimos b PARAM)
+	('JUMP',    'I--'),    # salta al bloque d
+	('BR',      'RII'),    # salta al bloque a si d != 0, si no al bloque b
+	('RET',     'R--'),
+	('RETV',    '---'),
+]
+
+OPNAMES = [ name for name, _ in OPCODES ]
+FORMATS = [ fmt for _, fmt in OPCODES ]
+for _i, _name in enumerate(OPNAMES):
+	globals()[_name] = _i
+del _i, _name
+
+TERMINATORS = frozenset([JUMP, BR, RET, RETV])
+
+# Operaciones sin efectos fuera de su registro destino (se pueden
+# eliminar si nadie usa el resultado)
+PURE = frozenset([MOV, ADD, SUB, MUL, NEG, FADD, FSUB, FMUL, FDIV, FNEG, NOT,
+	LT, LE, GT, GE, EQ, NE, LOADG, ALEN])
+
+# Operadores binarios de MiniC -> (código entero, código flotante)
+BINARY = {
+	'+': (ADD, FADD), '-': (SUB, FSUB), '*': (MUL, FMUL), '/': (DIV, FDIV), '%': (MOD, None),
+	'<': (LT, LT), '<=': (LE, LE), '>': (GT, GT), '>=': (GE, GE), '==': (EQ, EQ), '!=': (NE, NE),
+	# Operadores compuestos de la gramática (vea typecheck._COMPOUND)
+	'pe': (ADD, FADD), 'me': (SUB, FSUB), 'te': (MUL, FMUL), 'de': (DIV, FDIV), 'mde': (MOD, None),
+}
+
+# Typecode de array para cada tipo de elemento
+TYPECODES = { 'int': 'q', 'float': 'd', 'bool': 'b', 'char': 'B' }
+
+
+def is_const(operand):
+	return operand < 0
+
+
+class Block(object):
+	'''
+	Bloque básico. code guarda las instrucciones de a cuatro enteros;
+	succ y pred son listas de números de bloque.
+	'''
+	__slots__ = ('index', 'code', 'succ', 'pred')
+
+	def __init__(self, index):
+		self.index = index
+		self.code = array('q')
+		self.succ = []
+		self.pred = []
+
+	def __len__(self):
+		return len(self.code) >> 2
+
+	def __iter__(self):
+		code = self.code
+		for i in range(0, len(code), 4):
+			yield code[i], code[i+1], code[i+2], code[i+3]
+
+	def emit(self, op, d=0, a=0, b=0):
+		self.code.extend((op, d, a, b))
+
+	@property
+	def terminated(self):
+		code = self.code
+		return len(code) > 0 and code[-4] in TERMINATORS
+
+	def successors(self):
+		'''
+		Sucesores según la instrucción final.
+		'''
+		code = self.code
+		if not code:
+			return []
+		op = code[-4]
+		if op == JUMP:
+			return [code[-3]]
+		if op == BR:
+			return [code[-2], code[-1]] if code[-2] != code[-1] else [code[-2]]
+		return []
+
+
+class Function(object):
+	'''
+	Función en la representación intermedia. params son los registros de
+	los parámetros, en orden; regnames da el nombre de las variables (o
+	None para los temporales); rettype es el tipo de retorno de MiniC.
+	'''
+	def __init__(self, name, rettype='void'):
+		self.name = name
+		self.rettype = rettype
+		self.params = []
+		self.regnames = []
+		self.regtypes = []
+		self.consts = []
+		self._const_index = { }
+		self.blocks = []
+
+	@property
+	def nregs(self):
+		return len(self.regnames)
+
+	def new_reg(self, name=None, type=None):
+		self.regnames.append(name)
+		self.regtypes.append(type)
+		return len(self.regnames) - 1
+
+	def const(self, value):
+		'''
+		Operando de la constante value (reutiliza las ya vistas).
+		'''
+		key = (type(value), value)
+		k = self._const_index.get(key)
+		if k is None:
+			k = self._const_index[key] = len(self.consts)
+			self.consts.append(value)
+		return -1 - k
+
+	def value(self, operand):
+		'''
+		Valor de un operando constante.
+		'''
+		return self.consts[-1 - operand]
+
+	def new_block(self):
+		block = Block(len(self.blocks))
+		self.blocks.append(block)
+		return block
+
+	def build_cfg(self):
+		'''
+		Recalcula succ y pred de todos los bloques.
+		'''
+		for block in self.blocks:
+			block.pred = []
+		for block in self.blocks:
+			block.succ = block.successors()
+			for s in block.succ:
+				self.blocks[s].pred.append(block.index)
+
+	def instructions(self):
+		return sum(len(block) for block in self.blocks)
+
+	def format_operand(self, operand):
+		if operand < 0:
+			return repr(self.value(operand))
+		name = self.regnames[operand]
+		return f'r{operand}' if name is None else f'{name}.{operand}'
+
+	def dump(self, module=None):
+		params = ', '.join(self.format_operand(r) for r in self.params)
+		lines = [f'function {self.name}({params}) -> {self.rettype}']
+		for block in self.blocks:
+			preds = ', '.join(f'B{p}' for p in block.pred)
+			lines.append(f'  B{block.index}:' + (f'    ; pred {preds}' if preds else ''))
+			for op, d, a, b in block:
+				lines.append('    ' + format_instruction(self, op, d, a, b, module))
+		return '\n'.join(lines)
+
+
+def format_instruction(func, op, d, a, b, module=None):
+	fmt = FORMATS[op]
+	name = OPNAMES[op].lower()
+	if op == JUMP:
+		return f'jump B{d}'
+	if op == BR:
+		return f'br {func.format_operand(d)}, B{a}, B{b}'
+	if op == CALL:
+		callee = module.functions[a].name if module is not None else f'#{a}'
+		return f'{func.format_operand(d)} = call {callee}, {b}'
+	if op in (LOADG, STOREG):
+		g = a if op == LOADG else d
+		gname = module.globals[g] if module is not None else f'#{g}'
+		if op == LOADG:
+			return f'{func.format_operand(d)} = loadg {gname}'
+		return f'storeg {gname}, {func.format_operand(a)}'
+	fields = [ func.format_operand(v) if kind in 'WR' else str(v) for kind, v in zip(fmt, (d, a, b)) if kind != '-' ]
+	if fmt[0] == 'W':
+		return f'{fields[0]} = {name} ' + ', '.join(fields[1:])
+	return ' '.join([name, ', '.join(fields)]) if fields else name
+
+
+class Module(object):
+	'''
+	Unidad de traducción: funciones, variables globales (nombres, tipos y
+	valores iniciales) y la función init, que asigna los valores iniciales
+	que no son constantes.
+	'''
+	def __init__(self):
+		self.functions = []
+		self.function_index = { }
+		self.globals = []
+		self.global_types = []
+		self.global_values = []
+		self.global_index = { }
+		self.init = None
+
+	def add_global(self, name, type, value):
+		self.global_index[name] = len(self.globals)
+		self.globals.append(name)
+		self.global_types.append(type)
+		self.global_values.append(value)
+		return len(self.globals) - 1
+
+	def dump(self):
+		out = []
+		for name, ty, value in zip(self.globals, self.global_types, self.global_values):
+			out.append(f'global {name}: {ty} = {value!r}')
+		for func in [self.init, *self.functions]:
+			if func is not None:
+				out.append(func.dump(self))
+		return '\n'.join(out)
+
+
+class _Lowering(object):
+	'''
+	Traduce una función (o los inicializadores globales) a bloques.
+	'''
+	def __init__(self, module, func):
+		self.module = module
+		self.func = func
+		self.block = func.new_block()
+		# Orden en que se empieza a emitir cada bloque; al final los
+		# bloques se renumeran en ese orden (vea finish()).
+		self.order = [self.block]
+		# Registro de cada variable visible. Cada ámbito abierto guarda
+		# lo que sus declaraciones ocultaron, para restaurarlo al cerrar.
+		self.names = { }
+		self.scopes = []
+		# Bloques de salida de los ciclos abiertos (para break)
+		self.loops = []
+
+	# Utilidades
+
+	def emit(self, op, d=0, a=0, b=0):
+		self.block.emit(op, d, a, b)
+
+	def temp(self, type=None):
+		return self.func.new_reg(None, type)
+
+	def switch(self, block):
+		'''
+		Continúa la emisión en block.
+		'''
+		self.block = block
+		self.order.append(block)
+
+	def start(self, block):
+		'''
+		Como switch(), pero si el bloque actual no terminó salta a block.
+		'''
+		if not self.block.terminated:
+			self.emit(JUMP, block.index)
+		self.switch(block)
+
+	def finish(self):
+		'''
+		Termina el último bloque y renumera los bloques en el orden en
+		que se emitieron, corrigiendo los saltos.
+		'''
+		if not self.block.terminated:
+			self.emit(RETV)
+		func = self.func
+		seen = set()
+		blocks = []
+		for block in self.order:
+			if block.index not in seen:
+				seen.add(block.index)
+				blocks.append(block)
+		blocks.extend(block for block in func.blocks if block.index not in seen)
+		mapping = { block.index: i for i, block in enumerate(blocks) }
+		func.blocks = blocks
+		for block in blocks:
+			block.index = mapping[block.index]
+			code = block.code
+			for i in range(0, len(code), 4):
+				op = code[i]
+				if op == JUMP:
+					code[i+1] = mapping[code[i+1]]
+				elif op == BR:
+					code[i+2] = mapping[code[i+2]]
+					code[i+3] = mapping[code[i+3]]
+		func.build_cfg()
+
+	def push_scope(self):
+		self.scopes.append([])
+
+	def pop_scope(self):
+		names = self.names
+		for name, hidden in reversed(self.scopes.pop()):
+			if hidden is None:
+				del names[name]
+			else:
+				names[name] = hidden
+
+	def declare(self, name, type):
+		reg = self.func.new_reg(name, type)
+		self.scopes[-1].append((name, self.names.get(name)))
+		self.names[name] = reg
+		return reg
+
+	# Sentencias
+
+	def function(self, node):
+		func = self.func
+		self.push_scope()
+		for param in node.params:
+			func.params.append(self.declare(param.name, getattr(param.type_spec, 'name', None)))
+		body = node.body
+		if isinstance(body, Compound_Stmt):
+			# El cuerpo comparte el ámbito de los parámetros
+			self.compound(body, new_scope=False)
+		else:
+			self.stmt(body)
+		self.pop_scope()
+		self.finish()
+
+	def stmt(self, node):
+		method = _STATEMENTS.get(node.__class__)
+		if method is not None:
+			method(self, node)
+		elif isinstance(node, Expression) or isinstance(node, WriteLocation):
+			self.expr(node)
+
+	def compound(self, node, new_scope=True):
+		if new_scope:
+			self.push_scope()
+		for decl in node.local_decl:
+			self.stmt(decl)
+		for stmt in node.stmt_list:
+			self.stmt(stmt)
+		if new_scope:
+			self.pop_scope()
+
+	def local(self, node):
+		type = getattr(node.type_spec, 'name', None)
+		value = self.expr(node.value) if node.value is not None else self.func.const(zero(type))
+		reg = self.declare(node.name, type)
+		self.emit(MOV, reg, value)
+
+	def array_local(self, node):
+		reg = self.declare(node.name, getattr(node.type_spec, 'name', None) + '[]')
+		self.emit(MOV, reg, self.func.const(None))
+
+	def if_stmt(self, node):
+		func = self.func
+		then = func.new_block()
+		join = func.new_block()
+		other = func.new_block() if node.false_block is not None else join
+		self.cond(node.condition, then, other)
+		self.switch(then)
+		self.stmt(node.true_block)
+		if node.false_block is not None:
+			if not self.block.terminated:
+				self.emit(JUMP, join.index)
+			self.switch(other)
+			self.stmt(node.false_block)
+		self.start(join)
+
+	def while_stmt(self, node):
+		func = self.func
+		header = func.new_block()
+		body = func.new_block()
+		exit = func.new_block()
+		self.start(header)
+		self.cond(node.condition, body, exit)
+		self.switch(body)
+		self.loops.append(exit)
+		self.stmt(node.body)
+		self.loops.pop()
+		if not self.block.terminated:
+			self.emit(JUMP, header.index)
+		self.switch(exit)
+
+	def for_stmt(self, node):
+		func = self.func
+		self.push_scope()
+		self.stmt(node.initialStmt)
+		header = func.new_block()
+		body = func.new_block()
+		exit = func.new_block()
+		self.start(header)
+		test = node.testExpr
+		if isinstance(test, Null_Stmt) or test is None:
+			self.emit(JUMP, body.index)
+		else:
+			self.cond(test, body, exit)
+		self.switch(body)
+		self.loops.append(exit)
+		self.stmt(node.body)
+		self.loops.pop()
+		if node.updpStmt is not None:
+			self.expr(node.updpStmt)
+		if not self.block.terminated:
+			self.emit(JUMP, header.index)
+		self.switch(exit)
+		self.pop_scope()
+
+	def break_stmt(self, node):
+		if self.loops:
+			self.emit(JUMP, self.loops[-1].index)
+			self.switch(self.func.new_block())
+
+	def return_stmt(self, node):
+		if node.value is None:
+			self.emit(RETV)
+		else:
+			self.emit(RET, self.expr(node.value))
+		# Lo que siga en el mismo bloque de código es inalcanzable
+		self.switch(self.func.new_block())
+
+	def null_stmt(self, node):
+		pass
+
+	# Expresiones. Retornan el operando con el resultado.
+
+	def expr(self, node):
+		cls = node.__class__
+		if cls is BinOp and node.op not in ('&&', '||'):
+			return self.binop(node)
+		method = _EXPRESSIONS.get(cls)
+		if method is None:
+			raise TypeError(f'No se puede traducir {cls.__name__}')
+		return method(self, node)
+
+	def literal(self, node):
+		return self.func.const(literal_value(node))
+
+	def binop(self, node):
+		# Las cadenas a + b + c + ... se anidan por la izquierda; se
+		# recorren con un ciclo para no agotar el límite de recursión.
+		spine = []
+		while node.__class__ is BinOp and node.op not in ('&&', '||'):
+			spine.append(node)
+			node = node.left
+		value = self.expr(node)
+		for node in reversed(spine):
+			right = self.expr(node.right)
+			operand_type = getattr(node.left, 'type', None)
+			codes = BINARY.get(node.op)
+			if codes is None:
+				raise TypeError(f"Operador '{node.op}' desconocido")
+			op = codes[1] if operand_type == 'float' and codes[1] is not None else codes[0]
+			result = self.temp(getattr(node, 'type', None))
+			self.emit(op, result, value, right)
+			value = result
+		return value
+
+	def logical(self, node):
+		'''
+		&& y || con cortocircuito: el resultado queda en un temporal.
+		'''
+		func = self.func
+		result = self.temp('bool')
+		rhs = func.new_block()
+		done = func.new_block()
+		left = self.expr(node.left)
+		if node.op == '&&':
+			self.emit(MOV, result, func.const(False))
+			self.emit(BR, left, rhs.index, done.index)
+		else:
+			self.emit(MOV, result, func.const(True))
+			self.emit(BR, left, done.index, rhs.index)
+		self.switch(rhs)
+		right = self.expr(node.right)
+		self.emit(NE, result, right, func.const(0))
+		self.emit(JUMP, done.index)
+		self.switch(done)
+		return result
+
+	def cond(self, node, true_block, false_block):
+		'''
+		Emite el salto de una condición. && y || saltan directamente sin
+		materializar el valor.
+		'''
+		if node.__class__ is BinOp and node.op in ('&&', '||'):
+			middle = self.func.new_block()
+			if node.op == '&&':
+				self.cond(node.left, middle, false_block)
+			else:
+				self.cond(node.left, true_block, middle)
+			self.switch(middle)
+			self.cond(node.right, true_block, false_block)
+			return
+		if node.__class__ is UnaryOp and node.op == '!':
+			self.cond(node.right, false_block, true_block)
+			return
+		value = self.expr(node)
+		self.emit(BR, value, true_block.index, false_block.index)
+
+	def unaryop(self, node):
+		op = node.op
+		if op == '+':
+			return self.expr(node.right)
+		if op in ('add', 'sub'):
+			# Incremento/decremento: se guarda en la variable y el valor
+			# de la expresión es el nuevo valor.
+			location = node.right.location if node.right.__class__ is ReadLocation else None
+			value = self.expr(node.right)
+			is_float = getattr(node.right, 'type', None) == 'float'
+			one = self.func.const(1.0 if is_float else 1)
+			result = self.temp(getattr(node, 'type', None))
+			if op == 'add':
+				self.emit(FADD if is_float else ADD, result, value, one)
+			else:
+				self.emit(FSUB if is_float else SUB, result, value, one)
+			if location is not None:
+				self.store(location, result)
+			return result
+		value = self.expr(node.right)
+		result = self.temp(getattr(node, 'type', None))
+		if op == '-':
+			self.emit(FNEG if getattr(node.right, 'type', None) == 'float' else NEG, result, value)
+		elif op == '!':
+			self.emit(NOT, result, value)
+		else:
+			raise TypeError(f"Operador '{op}' desconocido")
+		return result
+
+	def read(self, node):
+		location = node.location
+		if location.__class__ is ArraySimpleLocation:
+			array_ = self.variable(location.name)
+			index = self.expr(location.size)
+			result = self.temp(getattr(node, 'type', None))
+			self.emit(ALOAD, result, array_, index)
+			return result
+		return self.variable(location.name)
+
+	def variable(self, name):
+		reg = self.names.get(name)
+		if reg is not None:
+			return reg
+		g = self.module.global_index.get(name)
+		if g is None:
+			raise NameError(f"'{name}' no está declarado")
+		result = self.temp(self.module.global_types[g])
+		self.emit(LOADG, result, g)
+		return result
+
+	def store(self, location, value):
+		if location.__class__ is ArraySimpleLocation:
+			array_ = self.variable(location.name)
+			index = self.expr(location.size)
+			self.emit(ASTORE, array_, index, value)
+			return
+		reg = self.names.get(location.name)
+		if reg is not None:
+			self.emit(MOV, reg, value)
+			return
+		g = self.module.global_index.get(location.name)
+		if g is None:
+			raise NameError(f"'{location.name}' no está declarado")
+		self.emit(STOREG, g, value)
+
+	def write(self, node):
+		value = self.expr(node.value)
+		self.store(node.location, value)
+		return value
+
+	def call(self, node):
+		args = [ self.expr(arg) for arg in node.arguments ]
+		for arg in args:
+			self.emit(PARAM, 0, arg)
+		index = self.module.function_index.get(node.name)
+		if index is None:
+			raise NameError(f"La función '{node.name}' no está declarada")
+		result = self.temp(getattr(node, 'type', None))
+		self.emit(CALL, result, index, len(args))
+		return result
+
+	def array_size(self, node):
+		result = self.temp('int')
+		self.emit(ALEN, result, self.variable(node.name))
+		return result
+
+	def new_array(self, node):
+		size = self.expr(node.expr)
+		elem = getattr(node.type_spec, 'name', 'int')
+		result = self.temp(elem + '[]')
+		self.emit(NEWARRAY, result, size, self.func.const(TYPECODES.get(elem, 'q')))
+		return result
+
+
+_STATEMENTS = {
+	Compound_Stmt: _Lowering.compound,
+	LocalDecl: _Lowering.local,
+	VarDeclaration: _Lowering.local,
+	ArrayLocalDecl: _Lowering.array_local,
+	If_Stmt: _Lowering.if_stmt,
+	While_Stmt: _Lowering.while_stmt,
+	ForStmt: _Lowering.for_stmt,
+	Break_Stmt: _Lowering.break_stmt,
+	Return_Stmt: _Lowering.return_stmt,
+	Null_Stmt: _Lowering.null_stmt,
+}
+
+_EXPRESSIONS = {
+	IntegerLiteral: _Lowering.literal,
+	FloatLiteral: _Lowering.literal,
+	BoolLiteral: _Lowering.literal,
+	CharLiteral: _Lowering.literal,
+	StringLiteral: _Lowering.literal,
+	BinOp: _Lowering.logical,
+	UnaryOp: _Lowering.unaryop,
+	ReadLocation: _Lowering.read,
+	WriteLocation: _Lowering.write,
+	FuncCall: _Lowering.call,
+	NewArrayExpr: _Lowering.new_array,
+	ArraySize: _Lowering.array_size,
+}
+
+
+def lower(program):
+	'''
+	Traduce un Program a un Module.
+	'''
+	module = Module()
+	funcs = [ decl for decl in program.decl_list if isinstance(decl, FuncDeclaration) ]
+	for decl in funcs:
+		module.function_index[decl.name] = len(module.functions)
+		module.functions.append(Function(decl.name, getattr(decl.type_spec, 'name', 'void')))
+
+	init = Function('__init__')
+	lowering = _Lowering(module, init)
+	lowering.push_scope()
+	for decl in program.decl_list:
+		cls = decl.__class__
+		if cls is VarDeclaration or cls is ConstDeclaration:
+			type = getattr(decl.type_spec, 'name', None) if cls is VarDeclaration \
+				else getattr(decl.value, 'type', None)
+			if decl.value is None:
+				module.add_global(decl.name, type, zero(type))
+			elif isinstance(decl.value, Literal):
+				module.add_global(decl.name, type, literal_value(decl.value))
+			else:
+				# Se declara después de calcular el valor: 'int x = x;'
+				# no puede referirse a sí misma.
+				value = lowering.expr(decl.value)
+				g = module.add_global(decl.name, type, zero(type))
+				lowering.emit(STOREG, g, value)
+		elif cls is ArrayDeclaration:
+			module.add_global(decl.name, getattr(decl.type_spec, 'name', None) + '[]', None)
+	lowering.finish()
+	module.init = init
+
+	for decl, func in zip(funcs, module.functions):
+		_Lowering(module, func).function(decl)
+	return module
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 ir.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			from typecheck import check_types
+			check_types(ast)
+	if diag.records:
+		raise SystemExit(1)
+	print(lower(ast).dump())
+
+if __name__ == '__main__':
+	main()
@@ -1,4 +1,4 @@
-from errors import error
+from errors import error, column
 import sly
 
 class Lexer(sly.Lexer):
@@ -7,13 +7,13 @@ class Lexer(sly.Lexer):
     'float', 'size', 'bool', 'true', 'false', 'const', 'new', 'sub', 'add', 'mde', 'te', 'de', 'pe', 'me'}
 
     tokens = {
-        * { kw.upper() for kw in keywords},LE, GE, EQ, NE, LT, GT, OR, AND, NOT,
+        * { kw.upper() for kw in keywords},LE, GE, EQ, NE, OR, AND, NOT,
         INT_LIT, FLOAT_LIT, IDENT, BOOL_LIT, CHAR_LIT, STRING_LIT, INC, DEC,
         ADDEQ, SUBEQ, MULEQ, DIVEQ, MODEQ}
 
     literals = {'(', ')', '{', '}', ';', ',', '.', '+', '-', '*', '/', '%', '<', '>', '=', '!', '[', ']'}
 
-    ignore = '\t\n\ \;\(\)\{\}\='
+    ignore = ' \t'
 
     LE = r'<='
 
@@ -21,9 +21,7 @@ class Lexer(sly.Lexer):
 
     EQ = r'=='
 
-    LT = r'<'
-
-    GT = r'>'
+    NE = r'!='
 
     OR = r'\|\|'
 
@@ -43,71 +41,58 @@ class Lexer(sly.Lexer):
 
     MODEQ = r'\%\='
 
-    INT = r'int'
-
-    IF = r'if'
-
-    ELSE = r'else'
-
-    FOR = r'for'
-
-    DO = r'do'
-
-    WHILE = r'while'
-
-    RETURN = r'return'
-
-    BREAK = r'break'
-
-    CHAR = r'char'
-
-    DELETE = r'delete'
-
-    VOID = r'void'
-
-    FLOAT = r'float'
-
-    SIZE = r'size'
-
-    BOOL = r'bool'
-
-    TRUE = r'true'
-
-    FALSE = r'false'
-
-    CONST = r'const'
-
     ignore_multiline_comment = r'\/\*.*\*\/'
-    ignore_line_comment = r'\/\/.*\n'
+    ignore_line_comment = r'\/\/.*'
 
     @_(r'\/\*.*')
     def multilineCommentNotClosedError(self, t):
-        error(self.lineno, 'Comentario no cerrado')
-        self.index += 1
+        error(self.lineno, 'Comentario no cerrado', column=column(self.text, t.index),
+              code='comentario-no-cerrado')
 
 
-    @_(r'[-]?[0-9]+[.][0-9]*')
+    @_(r'[0-9]+[.][0-9]*')
     def FLOAT_LIT(self, t):
         t.value = float(t.value)
+        return t
 
 
-    @_(r'0[bB][01]+', r'[1-9][0-9]*', r'0[xX][0-9a-fA-F]+')
+    @_(r'0[bB][01]+', r'0[xX][0-9a-fA-F]+', r'[1-9][0-9]*', r'0')
     def INT_LIT(self, t):
-        if '0b' in t.value or '0B' in t.value:
+        if t.value[:2] in ('0b', '0B'):
             t.value = int(t.value, 2)
-        elif '0x' in t.value or '0X' in t.value:
+        elif t.value[:2] in ('0x', '0X'):
             t.value = int(t.value, 16)
         else:
-            t.value = int(t.value, 10);
-
+            t.value = int(t.value, 10)
+        return t
 
-    NOT = r'not'
 
     CHAR_LIT = r'[\'\"].[\'\"]'
 
     STRING_LIT = r'[\"\'].*[\"\']'
 
+    # Las palabras reservadas se reconocen después de leer el identificador
+    # completo, así 'interval' o 'format' son un solo IDENT.
     IDENT = r'[a-zA-Z]+[a-zA-Z0-9]*'
+    IDENT['int'] = INT
+    IDENT['if'] = IF
+    IDENT['else'] = ELSE
+    IDENT['for'] = FOR
+    IDENT['do'] = DO
+    IDENT['while'] = WHILE
+    IDENT['return'] = RETURN
+    IDENT['break'] = BREAK
+    IDENT['char'] = CHAR
+    IDENT['delete'] = DELETE
+    IDENT['void'] = VOID
+    IDENT['float'] = FLOAT
+    IDENT['size'] = SIZE
+    IDENT['bool'] = BOOL
+    IDENT['true'] = TRUE
+    IDENT['false'] = FALSE
+    IDENT['const'] = CONST
+    IDENT['new'] = NEW
+    IDENT['not'] = NOT
 
     @_(r'\n+')
     def ignore_newline(self, t):
@@ -115,11 +100,12 @@ class Lexer(sly.Lexer):
         return t
     @_(r'\r')
     def scapeCodError(self,t):
-        error(self.lineno, 'En la línea Cadena de código de escape invalido')
-        self.endex +=1
+        error(self.lineno, 'En la línea Cadena de código de escape invalido',
+              column=column(self.text, t.index), code='escape-invalido')
 
     def error(self, t):
-        error(self.lineno, 'En la línea se encuentra un caracter ilegal %r' % t.value[0])
+        error(self.lineno, 'En la línea se encuentra un caracter ilegal %r' % t.value[0],
+              column=column(self.text, t.index), code='caracter-ilegal')
         self.index += 1
 
 
@@ -128,11 +114,11 @@ def main():
     if len(sys.argv) != 2:
         sys.stderr.write('Uso: python3 lexer.py filename\n')
         raise SystemExit(1)
-    f = open(sys.argv[1], "r")
-    text = f.read()
+    from scanner import tokenize_file
     lexer = Lexer()
-    for tok in lexer.tokenize(text):
-        print(tok)
+    with open(sys.argv[1], "r") as f:
+        for tok in tokenize_file(f, lexer):
+            print(tok)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,179 @@
+# coding: utf-8
+'''
+Cache persistente de las tablas LALR construidas por SLY.
+
+Cada proceso que importa cparse le pide a SLY que reconstruya todo el
+autómata LALR de Parser. Esta clase base guarda las tablas (lr_action,
+lr_goto y defaulted_states) en disco, indexadas por un hash de las reglas
+de la gramática, la tabla de precedencia y los tokens del lexer. Si la
+gramática no cambia, los siguientes procesos solo cargan el archivo, y lo
+hacen de forma perezosa la primera vez que se analiza una entrada.
+
+La ubicación del cache se puede cambiar con la variable de entorno
+MINIC_CACHE_DIR. Para forzar la reconstrucción basta con borrar el
+directorio o con definir MINIC_NO_TABLE_CACHE.
+
+SLY no tiene una forma pública de construir la gramática sin construir
+también las tablas, así que CachedParser._build() llama a dos métodos
+privados de sly.Parser. Solo se aceptan las versiones de SLY en
+SLY_VERSIONS: con otra, importar este módulo es un ImportError.
+'''
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+import sly
+from sly.yacc import LRTable, YaccError
+
+# Se incrementa cada vez que cambie el formato del archivo guardado
+CACHE_VERSION = 1
+
+# Versiones de SLY con las que se probó CachedParser._build() y los
+# métodos privados de sly.Parser que usa
+SLY_VERSIONS = ('0.5',)
+_SLY_PRIVATE = ('_Parser__validate_specification', '_Parser__build_grammar')
+
+
+def _check_sly():
+	missing = [ name for name in _SLY_PRIVATE if not hasattr(sly.Parser, name) ]
+	if sly.__version__ not in SLY_VERSIONS or missing:
+		raise ImportError(f'lrcache necesita SLY {" o ".join(SLY_VERSIONS)}, pero está instalado '
+			f'SLY {sly.__version__}' + (f' (sin {", ".join(missing)})' if missing else ''))
+
+_check_sly()
+
+CACHE_DIR = os.environ.get('MINIC_CACHE_DIR',
+	os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__'))
+
+
+class _Tablas(object):
+	'''
+	Subconjunto de LRTable que necesita Parser.parse() en tiempo de
+	ejecución.
+	'''
+	def __init__(self, lr_action, lr_goto, defaulted_states, sr_conflicts, rr_conflicts):
+		self.lr_action = lr_action
+		self.lr_goto = lr_goto
+		self.defaulted_states = defaulted_states
+		self.sr_conflicts = sr_conflicts
+		self.rr_conflicts = rr_conflicts
+
+
+class _TablasPerezosas(object):
+	'''
+	Descriptor que carga (o construye) las tablas la primera vez que se
+	accede a _lrtable y luego se reemplaza a sí mismo en la clase.
+	'''
+	def __get__(self, obj, owner):
+		tablas = owner._load_lrtable()
+		owner._lrtable = tablas
+		return tablas
+
+
+def fingerprint(cls):
+	'''
+	Hash de todo lo que determina las tablas: producciones (en orden),
+	precedencia, tokens, símbolo inicial y versiones del formato y de SLY.
+	'''
+	h = hashlib.sha256()
+	h.update(f'{CACHE_VERSION}:{sly.__version__}\n'.encode())
+	for prod in cls._grammar.Productions:
+		h.update(f'{prod.number}:{prod}:{prod.prec}\n'.encode())
+	h.update(repr(getattr(cls, 'precedence', ())).encode())
+	h.update(repr(sorted(cls.tokens)).encode())
+	h.update(repr(getattr(cls, 'start', None)).encode())
+	return h.hexdigest()[:16]
+
+
+class CachedParser(sly.Parser):
+	'''
+	Reemplazo de sly.Parser que guarda las tablas LALR en disco.
+
+	El archivo de depuración (debugfile) solo se escribe si la subclase lo
+	define explícitamente o si se define la variable MINIC_PARSER_DEBUG con
+	el nombre del archivo.
+	'''
+	debugfile = os.environ.get('MINIC_PARSER_DEBUG')
+
+	@classmethod
+	def _build(cls, definitions):
+		if vars(cls).get('_build', False):
+			return
+
+		rules = [ (name, value) for name, value in definitions
+			if callable(value) and hasattr(value, 'rules') ]
+
+		if not cls._Parser__validate_specification():
+			raise YaccError('Invalid parser specification')
+		cls._Parser__build_grammar(rules)
+		cls._fingerprint = fingerprint(cls)
+
+		if cls.debugfile:
+			# El volcado necesita el LRTable completo, no el del cache
+			lrtable = cls._build_lrtable()
+			with open(cls.debugfile, 'w') as f:
+				f.write(str(cls._grammar))
+				f.write('\n')
+				f.write(str(lrtable))
+			cls.log.info('Parser debugging for %s written to %s', cls.__qualname__, cls.debugfile)
+		else:
+			cls._lrtable = _TablasPerezosas()
+
+	@classmethod
+	def cache_path(cls):
+		return os.path.join(CACHE_DIR, f'{cls.__name__}.lrtab-{cls._fingerprint}.pickle')
+
+	@classmethod
+	def _build_lrtable(cls):
+		'''
+		Construye las tablas con SLY, reporta conflictos y las guarda.
+		'''
+		lrtable = LRTable(cls._grammar)
+		cls._report_conflicts(len(lrtable.sr_conflicts), len(lrtable.rr_conflicts))
+		cls._lrtable = lrtable
+		cls._save_lrtable(_Tablas(lrtable.lr_action, lrtable.lr_goto, lrtable.defaulted_states,
+			len(lrtable.sr_conflicts), len(lrtable.rr_conflicts)))
+		return lrtable
+
+	@classmethod
+	def _load_lrtable(cls):
+		if not os.environ.get('MINIC_NO_TABLE_CACHE'):
+			try:
+				with open(cls.cache_path(), 'rb') as f:
+					version, key, tablas = pickle.load(f)
+				if version == CACHE_VERSION and key == cls._fingerprint:
+					cls._report_conflicts(tablas.sr_conflicts, tablas.rr_conflicts)
+					return tablas
+			except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+				pass
+		return cls._build_lrtable()
+
+	@classmethod
+	def _save_lrtable(cls, tablas):
+		if os.environ.get('MINIC_NO_TABLE_CACHE'):
+			return
+		# Se escribe en un temporal y se renombra para que otros procesos
+		# nunca vean un archivo a medio escribir.
+		try:
+			os.makedirs(CACHE_DIR, exist_ok=True)
+			fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+			with os.fdopen(fd, 'wb') as f:
+				pickle.dump((CACHE_VERSION, cls._fingerprint, tablas), f, pickle.HIGHEST_PROTOCOL)
+			os.replace(tmp, cls.cache_path())
+		except OSError as e:
+			print(f'No se pudo guardar el cache de tablas: {e}', file=sys.stderr)
+
+	@classmethod
+	def _report_conflicts(cls, num_sr, num_rr):
+		if num_sr != getattr(cls, 'expected_shift_reduce', None):
+			if num_sr == 1:
+				cls.log.warning('1 shift/reduce conflict')
+			elif num_sr > 1:
+				cls.log.warning('%d shift/reduce conflicts', num_sr)
+		if num_rr != getattr(cls, 'expected_reduce_reduce', None):
+			if num_rr == 1:
+				cls.log.warning('1 reduce/reduce conflict')
+			elif num_rr > 1:
+				cls.log.warning('%d reduce/reduce conflicts', num_rr)
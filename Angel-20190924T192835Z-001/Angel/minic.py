@@ -0,0 +1,22 @@
+# coding: utf-8
+'''
+Punto de entrada del compilador MiniC.
+
+    python minic.py batch [opciones] directorio_o_archivo ...
+'''
+import sys
+
+COMMANDS = {
+	'batch': 'batch',
+}
+
+
+def main():
+	if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+		sys.stderr.write('Uso: python minic.py {%s} ...\n' % ','.join(COMMANDS))
+		raise SystemExit(1)
+	module = __import__(COMMANDS[sys.argv[1]])
+	raise SystemExit(module.main(sys.argv[2:]))
+
+if __name__ == '__main__':
+	main()
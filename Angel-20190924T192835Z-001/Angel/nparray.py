@@ -0,0 +1,381 @@
+# coding: utf-8
+'''
+Runtime de arreglos con NumPy para closures.ClosureInterpreter.
+
+NumpyArrays guarda los arreglos de int, float, bool y char en buffers
+tipados de NumPy (DTYPES) en vez de listas de valores de Python. Con
+checked=False (modo release) se omite la verificación de índices
+negativos en cada acceso; los índices mayores que el tamaño los sigue
+rechazando NumPy.
+
+Con vectorize (por omisión) los ciclos simples sobre arreglos se
+ejecutan como operaciones de NumPy sobre rebanadas. Un ciclo se
+reconoce si tiene la forma
+
+    while (i < E) { ...; i = i + 1; }         (o i <= E, o i++)
+    for (int i = ...; i < E; i = i + 1) { ... }
+
+y cada sentencia del cuerpo es
+
+    A[i] = expr;          (elemento a elemento)
+    s = s + expr;         (reducción)
+
+donde expr solo usa literales, i, B[i], B.size, variables que el ciclo
+no escribe y operadores aritméticos, de comparación y lógicos; E no lee
+arreglos ni variables que el ciclo escribe. Como cada iteración solo
+toca la posición i, ejecutar cada sentencia sobre todo el rango da el
+mismo resultado que el ciclo. Antes de escribir nada se comprueba que
+el rango cabe en todos los arreglos; si no (o si i no es un int), el
+ciclo se ejecuta normalmente y falla en la misma iteración que fallaría
+sin vectorizar. Las reducciones de float se acumulan en orden
+(np.add.accumulate) para dar exactamente la misma suma. Las operaciones
+de NumPy sobre int64 dan la vuelta en 64 bits, que es la semántica de
+interp para los int (interp.wrap), y las reducciones de int también.
+
+    from closures import ClosureInterpreter
+    from nparray import NumpyArrays
+    result = ClosureInterpreter(ast, NumpyArrays()).call('kernel', 10**6)
+'''
+import numpy as np
+
+from cast import *
+from closures import ListArrays
+from interp import ExecutionError, literal_value, wrap
+
+# Tipo de elemento de MiniC -> dtype de NumPy
+DTYPES = {
+	'int': np.int64,
+	'float': np.float64,
+	'bool': np.bool_,
+	'char': np.uint8,
+}
+
+
+def _vdiv(a, b, is_float):
+	if np.any(np.asarray(b) == 0):
+		raise ExecutionError('División por cero')
+	if is_float:
+		return np.true_divide(a, b)
+	# np.abs(INT_MIN) es INT_MIN: se parte de la división entera por
+	# abajo y se corrige cuando hay resto y los signos difieren. INT_MIN
+	# / -1 da INT_MIN, como en interp.c_div.
+	with np.errstate(over='ignore'):
+		q = np.floor_divide(a, b)
+		inexact = (np.multiply(q, b) != a) & ((np.asarray(a) < 0) != (np.asarray(b) < 0))
+		return q + inexact
+
+
+def _vmod(a, b):
+	return np.subtract(a, np.multiply(b, _vdiv(a, b, False)))
+
+# Operador de MiniC -> ufunc de NumPy. / y % se tratan aparte.
+_UFUNCS = {
+	'+': np.add, '-': np.subtract, '*': np.multiply,
+	'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+	'==': np.equal, '!=': np.not_equal,
+	'&&': np.logical_and, '||': np.logical_or,
+	'pe': np.add, 'me': np.subtract, 'te': np.multiply,
+}
+
+_DIVISION = frozenset(['/', '%', 'de', 'mde'])
+
+
+class NumpyArrays(ListArrays):
+	'''
+	Arreglos como np.ndarray. vectorized cuenta los ciclos que se
+	compilaron en forma vectorizada.
+	'''
+	def __init__(self, checked=True, vectorize=True):
+		super().__init__(checked)
+		self.vectorize = vectorize
+		self.vectorized = 0
+
+	def new(self, type):
+		dtype = DTYPES.get(type, np.int64)
+		def new(n):
+			return np.zeros(n, dtype)
+		return new
+
+	def load(self, array, index):
+		# item() retorna un int/float de Python: seguir operando con
+		# escalares de NumPy sería más lento.
+		if not self.checked:
+			def ev(frame):
+				return array(frame).item(index(frame))
+			return ev
+		def ev(frame):
+			i = index(frame)
+			if i < 0:
+				raise IndexError(i)
+			return array(frame).item(i)
+		return ev
+
+	def loop(self, compiler, node):
+		if not self.vectorize:
+			return None
+		loop = _match_loop(node)
+		if loop is None:
+			return None
+		self.vectorized += 1
+		return _Vectorizer(compiler, loop).compile()
+
+
+class _Loop(object):
+	'''
+	Ciclo reconocido: variable, límite (y si es inclusivo) y sentencias.
+	'''
+	def __init__(self, var, limit, inclusive, stmts):
+		self.var = var
+		self.limit = limit
+		self.inclusive = inclusive
+		self.stmts = stmts
+		# Variables que escribe el ciclo
+		self.written = { var } | { stmt.location.name for stmt in stmts
+			if stmt.location.__class__ is SimpleLocation }
+
+
+def _is_var(node, name):
+	return node.__class__ is ReadLocation and node.location.__class__ is SimpleLocation \
+		and node.location.name == name
+
+
+def _is_increment(node, var):
+	'''
+	i = i + 1, i = 1 + i o i++ / ++i
+	'''
+	cls = node.__class__
+	if cls is UnaryOp:
+		return node.op == 'add' and _is_var(node.right, var)
+	if cls is WriteLocation and node.location.__class__ is SimpleLocation \
+			and node.location.name == var and node.value.__class__ is BinOp \
+			and node.value.op == '+':
+		left, right = node.value.left, node.value.right
+		one = IntegerLiteral
+		return (_is_var(left, var) and right.__class__ is one and right.value == 1) or \
+			(_is_var(right, var) and left.__class__ is one and left.value == 1)
+	return False
+
+
+def _statements(body):
+	if body.__class__ is Compound_Stmt:
+		if body.local_decl:
+			return None
+		return list(body.stmt_list)
+	return [body]
+
+
+def _match_loop(node):
+	'''
+	_Loop si node es un ciclo vectorizable, si no None.
+	'''
+	if node.__class__ is While_Stmt:
+		cond = node.condition
+		stmts = _statements(node.body)
+		if not stmts:
+			return None
+		increment = stmts.pop()
+	elif node.__class__ is ForStmt:
+		cond = node.testExpr
+		stmts = _statements(node.body)
+		increment = node.updpStmt
+		if stmts is None or increment is None:
+			return None
+	else:
+		return None
+
+	if cond.__class__ is not BinOp or cond.op not in ('<', '<='):
+		return None
+	if cond.left.__class__ is not ReadLocation or cond.left.location.__class__ is not SimpleLocation:
+		return None
+	if getattr(cond.left, 'type', None) != 'int':
+		return None
+	var = cond.left.location.name
+	if stmts is None or not _is_increment(increment, var):
+		return None
+
+	for stmt in stmts:
+		if stmt.__class__ is not WriteLocation:
+			return None
+		location = stmt.location
+		if location.__class__ is ArraySimpleLocation:
+			if not _is_var(location.size, var):
+				return None
+		elif location.__class__ is SimpleLocation:
+			value = stmt.value
+			if location.name == var or value.__class__ is not BinOp or value.op not in ('+', 'pe') \
+					or not _is_var(value.left, location.name):
+				return None
+		else:
+			return None
+
+	loop = _Loop(var, cond.right, cond.op == '<=', stmts)
+	if not _invariant(cond.right, loop.written):
+		return None
+	for stmt in stmts:
+		value = stmt.value.right if stmt.location.__class__ is SimpleLocation else stmt.value
+		if not _elementwise(value, var, loop.written):
+			return None
+	return loop
+
+
+def _invariant(node, written):
+	'''
+	node no lee arreglos ni variables escritas, y no tiene efectos.
+	'''
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		cls = node.__class__
+		if cls is ReadLocation:
+			if node.location.__class__ is not SimpleLocation or node.location.name in written:
+				return False
+		elif cls is BinOp:
+			stack.append(node.left)
+			stack.append(node.right)
+		elif cls is UnaryOp:
+			if node.op not in ('-', '+', '!'):
+				return False
+			stack.append(node.right)
+		elif cls is not ArraySize and not isinstance(node, Literal):
+			return False
+	return True
+
+
+def _elementwise(node, var, written):
+	'''
+	node se puede evaluar sobre todo el rango: solo lee i, B[i],
+	B.size y variables que el ciclo no escribe (fuera de i). Dentro de &&
+	y || no puede haber divisiones: NumPy evalúa ambos lados.
+	'''
+	stack = [(node, False)]
+	while stack:
+		node, logical = stack.pop()
+		cls = node.__class__
+		if cls is ReadLocation:
+			location = node.location
+			if location.__class__ is ArraySimpleLocation:
+				if not _is_var(location.size, var):
+					return False
+			elif location.name != var and location.name in written:
+				return False
+		elif cls is BinOp:
+			if node.op in _DIVISION:
+				if logical:
+					return False
+			elif node.op not in _UFUNCS:
+				return False
+			logical = logical or node.op in ('&&', '||')
+			stack.append((node.left, logical))
+			stack.append((node.right, logical))
+		elif cls is UnaryOp:
+			if node.op not in ('-', '+', '!'):
+				return False
+			stack.append((node.right, logical))
+		elif cls is StringLiteral:
+			return False
+		elif cls is not ArraySize and not isinstance(node, Literal):
+			return False
+	return True
+
+
+class _Vectorizer(object):
+	'''
+	Compila un _Loop a una clausura frame -> bool.
+	'''
+	def __init__(self, compiler, loop):
+		self.compiler = compiler
+		self.loop = loop
+		# Arreglos que se leen o escriben en el ciclo: nombre -> getter
+		self.arrays = { }
+
+	def array(self, name):
+		get = self.arrays.get(name)
+		if get is None:
+			get = self.arrays[name] = self.compiler.variable(name)
+		return get
+
+	def compile(self):
+		loop = self.loop
+		compiler = self.compiler
+		get_var = compiler.variable(loop.var)
+		set_var = compiler.setter(loop.var)
+		limit = compiler.expr(loop.limit)
+		extra = 1 if loop.inclusive else 0
+		stmts = []
+		for stmt in loop.stmts:
+			location = stmt.location
+			if location.__class__ is ArraySimpleLocation:
+				stmts.append((self.array(location.name), None, self.expr(stmt.value)))
+			else:
+				is_float = getattr(location, 'type', None) == 'float'
+				stmts.append((compiler.variable(location.name), compiler.setter(location.name),
+					self.expr(stmt.value.right), is_float))
+		arrays = tuple(self.arrays.values())
+
+		def run(frame):
+			lo = get_var(frame)
+			hi = limit(frame) + extra
+			if lo.__class__ is not int or hi.__class__ is not int:
+				return False
+			if lo >= hi:
+				return True
+			if lo < 0:
+				return False
+			for get in arrays:
+				array = get(frame)
+				if array.__class__ is not np.ndarray or hi > len(array):
+					return False
+			for stmt in stmts:
+				if stmt[1] is None:
+					target, _, value = stmt
+					target(frame)[lo:hi] = value(frame, lo, hi)
+				else:
+					get, put, value, is_float = stmt
+					v = np.broadcast_to(value(frame, lo, hi), (hi - lo,))
+					if is_float:
+						total = np.add.accumulate(np.concatenate(([get(frame)], v)))[-1].item()
+					else:
+						total = wrap(get(frame) + int(np.sum(v, dtype=np.int64)))
+					put(frame, total)
+			set_var(frame, hi)
+			return True
+		return run
+
+	def expr(self, node):
+		'''
+		Función (frame, lo, hi) -> arreglo (o escalar) con el valor de node
+		para i en [lo, hi).
+		'''
+		loop = self.loop
+		cls = node.__class__
+		if cls is ReadLocation:
+			location = node.location
+			if location.__class__ is ArraySimpleLocation:
+				get = self.array(location.name)
+				return lambda frame, lo, hi: get(frame)[lo:hi]
+			if location.name == loop.var:
+				return lambda frame, lo, hi: np.arange(lo, hi, dtype=np.int64)
+		if cls is BinOp:
+			left = self.expr(node.left)
+			right = self.expr(node.right)
+			op = node.op
+			if op in ('/', 'de'):
+				is_float = getattr(node.left, 'type', None) == 'float'
+				return lambda frame, lo, hi: _vdiv(left(frame, lo, hi), right(frame, lo, hi), is_float)
+			if op in ('%', 'mde'):
+				return lambda frame, lo, hi: _vmod(left(frame, lo, hi), right(frame, lo, hi))
+			ufunc = _UFUNCS[op]
+			return lambda frame, lo, hi: ufunc(left(frame, lo, hi), right(frame, lo, hi))
+		if cls is UnaryOp:
+			operand = self.expr(node.right)
+			if node.op == '-':
+				return lambda frame, lo, hi: np.negative(operand(frame, lo, hi))
+			if node.op == '!':
+				return lambda frame, lo, hi: np.logical_not(operand(frame, lo, hi))
+			return operand
+		if isinstance(node, Literal):
+			value = literal_value(node)
+			return lambda frame, lo, hi: value
+		# Escalar invariante (variable o B.size): se evalúa una vez
+		scalar = self.compiler.expr(node)
+		return lambda frame, lo, hi: scalar(frame)
@@ -0,0 +1,1367 @@
+# coding: utf-8
+'''
+Optimización del AST con los análisis de dataflow.
+
+optimize(ast) aplica a cada FuncDeclaration los pasos de PASSES, en
+orden, y retorna el árbol y las estadísticas de cada paso:
+
+  - inline: expande en línea las llamadas a funciones no recursivas cuyo
+    cuerpo tiene a lo más budget nodos. Si el cuerpo es solo return de
+    una expresión sin efectos, la llamada se reemplaza por esa expresión
+    (en cualquier parte, también en la condición de un ciclo). Si no, la
+    llamada se adelanta a la sentencia que la contiene, cuando lo que se
+    evalúa antes no tiene efectos, no falla y solo lee locales: los
+    parámetros y las locales de la función pasan a ser variables
+    _f1_nombre de la que llama, asignadas antes del cuerpo, y cada
+    return asigna el resultado. Solo se expanden funciones cuyos
+    return se pueden dejar al final (ninguno dentro de un ciclo) y que
+    no usan globales tapadas por locales de la que llama;
+  - unreachable: reemplaza If_Stmt, While_Stmt y ForStmt con condición
+    true o false por la rama que se ejecuta, y borra las sentencias que
+    no se alcanzan desde la entrada (después de Return_Stmt o
+    Break_Stmt, o en un ciclo que nunca termina);
+  - dead: borra las asignaciones (WriteLocation, x++ y el valor inicial
+    de LocalDecl) a variables locales que no están vivas después, y las
+    LocalDecl de variables que nunca se leen. Solo se borra un valor que
+    no puede fallar ni tener efectos (sin llamadas, divisiones por algo
+    que no sea una constante distinta de cero ni lecturas de arreglos);
+    si el valor es una llamada o una asignación, queda como sentencia.
+    Se repite hasta que no cambia nada;
+  - cse: eliminación de subexpresiones comunes, local (dentro de una
+    sentencia) y global (con available_expressions). Las expresiones son
+    las de dataflow.Expressions, que ya hace hash-consing: dos
+    ocurrencias con el mismo número calculan el mismo valor. Cada
+    expresión que es redundante en algún punto recibe una variable
+    _cseN: la primera evaluación en cada camino la guarda,
+    (_cseN = a[i] * b[i]), y las redundantes la leen. Solo se consideran
+    las expresiones de al menos min_size nodos;
+  - licm: saca de los ciclos las expresiones invariantes (i < a.size
+    calcula a.size una vez antes del ciclo). Con dataflow: una escritura
+    a una variable, a un elemento de arreglo o una llamada (que puede
+    escribir cualquier global) dentro del ciclo hace que lo que la lee
+    no sea invariante. Una expresión que puede fallar solo se saca de la
+    condición del ciclo, que se evalúa al menos una vez.
+
+Las globales nunca se consideran muertas: otra función puede leerlas. El
+árbol debe venir de typecheck; las variables nuevas copian el tipo de la
+expresión. Los pasos modifican el árbol en su lugar.
+
+    from optimize import optimize
+    ast, stats = optimize(ast)
+    print(stats['cse'])     # {'expressions': ..., 'replaced': ..., 'seconds': ...}
+'''
+import copy
+import time
+
+from cast import *
+from constfold import count_nodes
+from dataflow import (COND, STMT, available_expressions, bits, build_cfg, constant_condition,
+	expression_kills, liveness)
+
+# Máximo de vueltas del paso dead
+MAX_ROUNDS = 10
+
+# Máximo de nodos del cuerpo de una función que se expande en línea
+INLINE_BUDGET = 40
+
+# Tipos que pueden tener las variables temporales
+SCALAR_TYPES = ('int', 'float', 'bool', 'char')
+
+
+def _block(stmts):
+	'''
+	Sentencia con la lista stmts (las declaraciones van en local_decl).
+	'''
+	decls = [ stmt for stmt in stmts if stmt.__class__ in (LocalDecl, ArrayLocalDecl) ]
+	rest = [ stmt for stmt in stmts if stmt.__class__ not in (LocalDecl, ArrayLocalDecl) ]
+	return Compound_Stmt(decls, rest, lineno=getattr(stmts[0], 'lineno', None))
+
+
+def map_statements(stmt, fn):
+	'''
+	Aplica fn a stmt y a cada sentencia que contiene, de adentro hacia
+	afuera, y retorna el reemplazo de stmt. fn(s) retorna la sentencia
+	que reemplaza a s, o None para borrarla: dentro de una lista se
+	quita, y en otro campo queda un Null_Stmt.
+	'''
+	cls = stmt.__class__
+	if cls is Compound_Stmt:
+		stmt.local_decl = _map_list(stmt.local_decl, fn)
+		stmt.stmt_list = _map_list(stmt.stmt_list, fn)
+	elif cls is If_Stmt:
+		stmt.true_block = _map_field(stmt.true_block, fn)
+		if stmt.false_block is not None:
+			stmt.false_block = map_statements(stmt.false_block, fn)
+	elif cls is While_Stmt:
+		stmt.body = _map_field(stmt.body, fn)
+	elif cls is ForStmt:
+		stmt.initialStmt = _map_field(stmt.initialStmt, fn)
+		stmt.body = _map_field(stmt.body, fn)
+	return fn(stmt)
+
+
+def _map_list(stmts, fn):
+	result = []
+	for stmt in stmts:
+		new = map_statements(stmt, fn)
+		if new is not None:
+			result.append(new)
+	return result
+
+
+def _map_field(stmt, fn):
+	new = map_statements(stmt, fn)
+	if new is None:
+		new = Null_Stmt(None, lineno=getattr(stmt, 'lineno', None))
+	return new
+
+
+def _safe(expr):
+	'''
+	expr no tiene efectos y no puede fallar: se puede dejar de evaluar.
+	'''
+	stack = [expr]
+	while stack:
+		expr = stack.pop()
+		cls = expr.__class__
+		if cls is BinOp:
+			if expr.op in ('/', '%', 'de', 'mde'):
+				divisor = expr.right
+				if divisor.__class__ not in (IntegerLiteral, FloatLiteral) or divisor.value == 0:
+					return False
+			stack.append(expr.left)
+			stack.append(expr.right)
+		elif cls is UnaryOp:
+			if expr.op not in ('-', '+', '!'):
+				return False
+			stack.append(expr.right)
+		elif cls is ReadLocation:
+			if expr.location.__class__ is not SimpleLocation:
+				return False
+		elif cls is NewArrayExpr:
+			size = expr.expr
+			if size.__class__ is not IntegerLiteral or size.value < 0:
+				return False
+		elif not isinstance(expr, Literal):
+			return False
+	return True
+
+
+def _increment_target(expr):
+	'''
+	Location que incrementa o decrementa expr (x++, --a[i]), o None.
+	'''
+	if expr.__class__ is UnaryOp and expr.op in ('add', 'sub'):
+		return getattr(expr.right, 'location', None)
+	return None
+
+
+def _nodes(node):
+	'''
+	Todos los nodos AST alcanzables desde node.
+	'''
+	result = []
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if node.__class__ is list:
+			stack.extend(node)
+		elif isinstance(node, AST):
+			result.append(node)
+			stack.extend(getattr(node, name) for name in node._fields)
+	return result
+
+
+def _walk_statements(stmt):
+	'''
+	stmt y todas las sentencias que contiene.
+	'''
+	result = []
+	stack = [stmt]
+	while stack:
+		stmt = stack.pop()
+		result.append(stmt)
+		cls = stmt.__class__
+		if cls is Compound_Stmt:
+			stack.extend(stmt.local_decl)
+			stack.extend(stmt.stmt_list)
+		elif cls is If_Stmt:
+			stack.append(stmt.true_block)
+			if stmt.false_block is not None:
+				stack.append(stmt.false_block)
+		elif cls is While_Stmt:
+			stack.append(stmt.body)
+		elif cls is ForStmt:
+			stack.append(stmt.initialStmt)
+			stack.append(stmt.body)
+	return result
+
+
+def _map_children(expr, fn):
+	'''
+	Reemplaza cada subexpresión de expr por map_expression(hijo, fn).
+	'''
+	cls = expr.__class__
+	if cls is BinOp:
+		expr.left = map_expression(expr.left, fn)
+		expr.right = map_expression(expr.right, fn)
+	elif cls is UnaryOp:
+		expr.right = map_expression(expr.right, fn)
+	elif cls is ReadLocation:
+		location = expr.location
+		if location.__class__ is ArraySimpleLocation:
+			location.size = map_expression(location.size, fn)
+	elif cls is WriteLocation:
+		expr.value = map_expression(expr.value, fn)
+		location = expr.location
+		if location.__class__ is ArraySimpleLocation:
+			location.size = map_expression(location.size, fn)
+	elif cls is FuncCall:
+		expr.arguments = [ map_expression(arg, fn) for arg in expr.arguments ]
+	elif cls is NewArrayExpr:
+		expr.expr = map_expression(expr.expr, fn)
+
+
+def map_expression(expr, fn):
+	'''
+	Como map_statements para expresiones: aplica fn de adentro hacia
+	afuera y retorna el reemplazo de expr.
+	'''
+	_map_children(expr, fn)
+	return fn(expr)
+
+
+def _declared_names(func):
+	'''
+	Nombres de los parámetros y de todas las declaraciones locales de func.
+	'''
+	names = { param.name for param in func.params }
+	for stmt in _walk_statements(func.body):
+		if stmt.__class__ in (LocalDecl, ArrayLocalDecl):
+			names.add(stmt.name)
+	return names
+
+
+def _fresh(names, base):
+	'''
+	Primer nombre base1, base2, ... que no está en names. Lo agrega a names.
+	'''
+	k = 1
+	while f'{base}{k}' in names:
+		k += 1
+	name = f'{base}{k}'
+	names.add(name)
+	return name
+
+
+def _temp_decl(name, ty, line):
+	return LocalDecl(name, SimpleType(ty, lineno=line), None, lineno=line)
+
+
+def _location(name, ty, line):
+	location = SimpleLocation(name, lineno=line)
+	location.type = ty
+	return location
+
+
+def _variable(name, ty, line):
+	node = ReadLocation(_location(name, ty, line), lineno=line)
+	node.type = ty
+	return node
+
+
+def _assign(location, value, ty):
+	node = WriteLocation(location, value, lineno=getattr(value, 'lineno', None))
+	node.type = ty
+	return node
+
+
+def _splice(stmts, wrappers):
+	'''
+	Lista stmts con el contenido de los Compound_Stmt sin declaraciones
+	de wrappers (id -> bloque) en lugar de ellos.
+	'''
+	result = []
+	for stmt in stmts:
+		if wrappers.get(id(stmt)) is stmt:
+			result.extend(stmt.stmt_list)
+		else:
+			result.append(stmt)
+	return result
+
+
+def _declare_temps(func, decls):
+	'''
+	Agrega las declaraciones decls al principio del cuerpo de func.
+	'''
+	func.body.local_decl[:0] = decls
+
+
+# Pasos
+
+def eliminate_unreachable(func, stats):
+	'''
+	Ramas con condición constante y sentencias inalcanzables.
+	'''
+	def simplify(stmt):
+		cls = stmt.__class__
+		if cls is If_Stmt:
+			value = constant_condition(stmt.condition)
+			if value is not None:
+				stats['branches'] += 1
+				return stmt.true_block if value else stmt.false_block
+		elif cls is While_Stmt:
+			if constant_condition(stmt.condition) is False:
+				stats['branches'] += 1
+				return None
+		elif cls is ForStmt:
+			if constant_condition(stmt.testExpr) is False:
+				# La inicialización sí se ejecuta, en su propio ámbito
+				stats['branches'] += 1
+				init = stmt.initialStmt
+				return None if init.__class__ is Null_Stmt else _block([init])
+		return stmt
+
+	func.body = map_statements(func.body, simplify) or Compound_Stmt([], [])
+
+	cfg = build_cfg(func)
+	seen = cfg.reachable()
+	dead = set()
+	for node in cfg.nodes:
+		if seen[node.index] or node.stmt is None:
+			continue
+		if cfg.node_of.get(id(node.stmt)) is node:
+			dead.add(id(node.stmt))
+		elif node.stmt.__class__ is ForStmt and node.expr is node.stmt.updpStmt:
+			# Cuerpo que nunca llega a la actualización
+			node.stmt.updpStmt = None
+			stats['statements'] += 1
+
+	def remove(stmt):
+		if id(stmt) in dead:
+			stats['statements'] += 1
+			return None
+		return stmt
+
+	if dead:
+		func.body = map_statements(func.body, remove) or Compound_Stmt([], [])
+
+
+def eliminate_dead_stores(func, stats):
+	'''
+	Asignaciones a locales muertas y LocalDecl que nunca se leen.
+	'''
+	for _ in range(MAX_ROUNDS):
+		cfg = build_cfg(func)
+		live = liveness(cfg).after
+		seen = cfg.reachable()
+		decls = cfg.variables.decls
+		var_of = cfg.var_of
+		changes = { }
+		# También cuentan los usos inalcanzables: sin la declaración, esas
+		# sentencias ya no se podrían traducir.
+		used = 0
+		for node in cfg.nodes:
+			used |= node.uses
+
+		def dead_var(location, node):
+			if location is None or location.__class__ is not SimpleLocation:
+				return False
+			var = var_of[id(location)]
+			return decls[var] is not None and not (live[node.index] >> var) & 1
+
+		for node in cfg.nodes:
+			stmt = node.stmt
+			if node.kind != STMT or stmt is None or not seen[node.index]:
+				continue
+			cls = stmt.__class__
+			if cls is ForStmt:
+				update = stmt.updpStmt
+				location = update.location if update.__class__ is WriteLocation \
+					else _increment_target(update)
+				if dead_var(location, node) and (update.__class__ is not WriteLocation
+						or _safe(update.value)):
+					stmt.updpStmt = None
+					stats['stores'] += 1
+			elif cls is WriteLocation:
+				if dead_var(stmt.location, node):
+					value = stmt.value
+					if _safe(value):
+						changes[id(stmt)] = None
+					elif value.__class__ in (WriteLocation, FuncCall) or _increment_target(value):
+						changes[id(stmt)] = value
+			elif cls is UnaryOp:
+				if dead_var(_increment_target(stmt), node):
+					changes[id(stmt)] = None
+			elif cls is LocalDecl:
+				var = var_of[id(stmt)]
+				if stmt.value is not None and not (live[node.index] >> var) & 1 \
+						and _safe(stmt.value):
+					stmt.value = None
+					stats['stores'] += 1
+
+		# Variables que nunca se leen y que ya nadie escribe
+		written = 0
+		for node in cfg.nodes:
+			stmt = node.stmt
+			if not node.defs or changes.get(id(stmt), stmt) is None:
+				continue
+			if stmt.__class__ in (LocalDecl, ArrayLocalDecl):
+				# La declaración no cuenta, pero su valor puede asignar otras
+				written |= node.defs & ~(1 << var_of[id(stmt)])
+			else:
+				written |= node.defs
+		for var in bits(~used & ~written & ((1 << len(decls)) - 1)):
+			decl = decls[var]
+			if decl.__class__ is ArrayLocalDecl or (decl.__class__ is LocalDecl
+					and (decl.value is None or _safe(decl.value))):
+				changes[id(decl)] = None
+
+		if not changes:
+			break
+
+		def apply(stmt):
+			key = id(stmt)
+			if key not in changes:
+				return stmt
+			if stmt.__class__ in (LocalDecl, ArrayLocalDecl):
+				stats['decls'] += 1
+			else:
+				stats['stores'] += 1
+			return changes[key]
+
+		func.body = map_statements(func.body, apply) or Compound_Stmt([], [])
+
+
+class _CommonSubexpressions(object):
+	'''
+	Eliminación de subexpresiones comunes en una función. Se recorre dos
+	veces cada expresión, en el orden en que la evalúan los motores
+	(primero el valor de una asignación y después el índice): la primera
+	para saber qué expresiones son redundantes en algún punto y la
+	segunda para reescribirlas.
+	'''
+	def __init__(self, func, stats, min_size):
+		self.func = func
+		self.stats = stats
+		self.min_size = min_size
+		self.cfg = cfg = build_cfg(func)
+		self.infos = cfg.expressions.infos
+		self.of_node = cfg.expressions.of_node
+		self.var_of = cfg.var_of
+		self.by_var, memory = expression_kills(cfg)
+		calls = memory
+		for var in bits(cfg.variables.globals_mask):
+			calls |= self.by_var[var]
+		self.memory = memory
+		self.calls = calls
+		self.redundant = set()
+		self.temps = { }
+		self.local = 0
+		self.rewrite = False
+
+	def run(self):
+		cfg = self.cfg
+		avail = available_expressions(cfg).before
+		seen = cfg.reachable()
+		nodes = [ node for node in cfg.nodes if node.expr is not None and seen[node.index] ]
+		for node in nodes:
+			self.local = avail[node.index]
+			self.root(node)
+		if not self.redundant:
+			return
+		self.declare()
+		self.rewrite = True
+		for node in nodes:
+			self.local = avail[node.index]
+			self.root(node)
+
+	def declare(self):
+		'''
+		Una variable _cseN para cada expresión redundante que tiene tipo.
+		'''
+		if self.func.body.__class__ is not Compound_Stmt:
+			return
+		names = _declared_names(self.func)
+		decls = []
+		for number in sorted(self.redundant):
+			info = self.infos[number]
+			ty = getattr(info.node, 'type', None)
+			if ty not in SCALAR_TYPES:
+				continue
+			name = _fresh(names, '_cse')
+			decls.append(_temp_decl(name, ty, getattr(info.node, 'lineno', None)))
+			self.temps[number] = (name, ty)
+		_declare_temps(self.func, decls)
+		self.stats['expressions'] += len(decls)
+
+	def root(self, node):
+		'''
+		Recorre la expresión de node y reemplaza la raíz en su sentencia
+		si cambió. Una expresión que es toda la sentencia no se reemplaza.
+		'''
+		stmt = node.stmt
+		expr = node.expr
+		if expr is stmt:
+			self.children(expr)
+			return
+		new = self.visit(expr)
+		if new is expr:
+			return
+		cls = stmt.__class__
+		if node.kind == COND:
+			if cls is ForStmt:
+				stmt.testExpr = new
+			else:
+				stmt.condition = new
+		elif cls is ForStmt:
+			stmt.updpStmt = new
+		else:
+			stmt.value = new
+
+	def read(self, number):
+		name, ty = self.temps[number]
+		return _variable(name, ty, getattr(self.infos[number].node, 'lineno', None))
+
+	def write(self, number, expr):
+		name, ty = self.temps[number]
+		return _assign(_location(name, ty, getattr(expr, 'lineno', None)), expr, ty)
+
+	def visit(self, expr):
+		number = self.of_node.get(id(expr))
+		if number is None:
+			self.children(expr)
+			return expr
+		info = self.infos[number]
+		if info.bit < 0 or info.size < self.min_size:
+			self.children(expr)
+			return expr
+		if (self.local >> info.bit) & 1:
+			if not self.rewrite:
+				self.redundant.add(number)
+				return expr
+			if number in self.temps:
+				self.stats['replaced'] += 1
+				return self.read(number)
+		self.children(expr)
+		self.local |= 1 << info.bit
+		if self.rewrite and number in self.temps:
+			return self.write(number, expr)
+		return expr
+
+	def children(self, expr):
+		'''
+		Recorre (y reescribe) los hijos de expr y aplica las escrituras
+		que hace expr a las expresiones locales disponibles.
+		'''
+		cls = expr.__class__
+		visit = self.visit
+		rewrite = self.rewrite
+		if cls is BinOp:
+			left = visit(expr.left)
+			if expr.op in ('&&', '||'):
+				# Lo que calcula el lado derecho puede no haberse calculado
+				saved = self.local
+				right = visit(expr.right)
+				self.local &= saved
+			else:
+				right = visit(expr.right)
+			if rewrite:
+				expr.left = left
+				expr.right = right
+		elif cls is UnaryOp:
+			target = _increment_target(expr)
+			if target is None:
+				right = visit(expr.right)
+				if rewrite:
+					expr.right = right
+			else:
+				# El operando es la variable que se escribe: solo se recorre
+				# su índice
+				self.location(target)
+				self.kill(target)
+		elif cls is ReadLocation:
+			self.location(expr.location)
+		elif cls is WriteLocation:
+			value = visit(expr.value)
+			if rewrite:
+				expr.value = value
+			self.location(expr.location)
+			self.kill(expr.location)
+		elif cls is FuncCall:
+			args = [ visit(arg) for arg in expr.arguments ]
+			if rewrite:
+				expr.arguments = args
+			self.local &= ~self.calls
+		elif cls is NewArrayExpr:
+			size = visit(expr.expr)
+			if rewrite:
+				expr.expr = size
+
+	def location(self, location):
+		if location.__class__ is ArraySimpleLocation:
+			index = self.visit(location.size)
+			if self.rewrite:
+				location.size = index
+
+	def kill(self, location):
+		if location.__class__ is ArraySimpleLocation:
+			self.local &= ~self.memory
+		else:
+			self.local &= ~self.by_var[self.var_of[id(location)]]
+
+
+def eliminate_common_subexpressions(func, stats, min_size=3):
+	'''
+	Subexpresiones comunes de al menos min_size nodos.
+	'''
+	_CommonSubexpressions(func, stats, min_size).run()
+
+
+class _CannotInline(Exception):
+	'''
+	La función no se puede expandir en línea.
+	'''
+
+
+def _returns(stmt):
+	return any(s.__class__ is Return_Stmt for s in _walk_statements(stmt))
+
+
+def _always_returns(stmt):
+	'''
+	Todos los caminos por stmt terminan en un Return_Stmt.
+	'''
+	cls = stmt.__class__
+	if cls is Return_Stmt:
+		return True
+	if cls is Compound_Stmt:
+		return any(_always_returns(s) for s in stmt.stmt_list)
+	if cls is If_Stmt:
+		return stmt.false_block is not None and _always_returns(stmt.true_block) \
+			and _always_returns(stmt.false_block)
+	return False
+
+
+def _tail_returns(stmts):
+	'''
+	Reescribe la lista stmts para que después de cada Return_Stmt no se
+	ejecute nada más: lo que sigue a un If_Stmt con un return pasa a la
+	rama que no siempre retorna. Lanza _CannotInline si hay un return
+	dentro de un ciclo o si habría que duplicar sentencias.
+	'''
+	for index, stmt in enumerate(stmts):
+		if not _returns(stmt):
+			continue
+		rest = stmts[index + 1:]
+		cls = stmt.__class__
+		if cls is Return_Stmt:
+			return stmts[:index + 1]
+		if cls is If_Stmt:
+			other = stmt.false_block
+			if rest and not (_always_returns(stmt.true_block)
+					or (other is not None and _always_returns(other))):
+				raise _CannotInline()
+			stmt.true_block = _tail_branch(stmt.true_block, rest)
+			if other is not None or rest:
+				stmt.false_block = _tail_branch(other, rest)
+			return stmts[:index + 1]
+		if cls is Compound_Stmt and not stmt.local_decl:
+			return stmts[:index] + _tail_returns(stmt.stmt_list + rest)
+		if cls is Compound_Stmt and not rest:
+			stmt.stmt_list = _tail_returns(stmt.stmt_list)
+			return stmts
+		raise _CannotInline()
+	return stmts
+
+
+def _tail_branch(block, rest):
+	'''
+	La rama block de un If_Stmt seguida de rest (si no siempre retorna).
+	'''
+	if block is None:
+		return Compound_Stmt([], _tail_returns(rest))
+	if _always_returns(block):
+		rest = []
+	if block.__class__ is Compound_Stmt:
+		if rest and block.local_decl:
+			# Las declaraciones de la rama podrían tapar nombres de rest
+			raise _CannotInline()
+		block.stmt_list = _tail_returns(block.stmt_list + rest)
+		return block
+	return Compound_Stmt([], _tail_returns([block] + rest), lineno=getattr(block, 'lineno', None))
+
+
+def _pure(expr):
+	'''
+	expr no escribe variables ni llama funciones (pero puede fallar).
+	'''
+	for node in _nodes(expr):
+		cls = node.__class__
+		if cls is WriteLocation or cls is FuncCall or _increment_target(node) is not None:
+			return False
+	return True
+
+
+class _Template(object):
+	'''
+	Cuerpo de una función listo para expandirse: los Return_Stmt son lo
+	último que se ejecuta. locals son los nodos del cuerpo que nombran
+	parámetros o locales (se renombran en cada expansión), free los
+	nombres de las globales que usa y expression, si el cuerpo es solo
+	return expr sin efectos, esa expresión.
+	'''
+	def __init__(self, func, body, locals, free):
+		self.func = func
+		self.body = body
+		self.locals = locals
+		self.free = free
+		self.expression = None
+		self.uses = { }
+		stmts = body.stmt_list
+		if not body.local_decl and len(stmts) == 1 and stmts[0].__class__ is Return_Stmt \
+				and stmts[0].value is not None and _pure(stmts[0].value):
+			self.expression = stmts[0].value
+			for node in locals:
+				self.uses[node.name] = self.uses.get(node.name, 0) + 1
+
+
+def _make_template(func, budget):
+	'''
+	_Template de func, o None si es muy grande o no se puede expandir.
+	'''
+	ty = getattr(func.type_spec, 'name', None)
+	if func.body.__class__ is not Compound_Stmt or count_nodes(func.body) > budget \
+			or ty not in SCALAR_TYPES + ('void',) \
+			or any(getattr(param.type_spec, 'name', None) not in SCALAR_TYPES for param in func.params):
+		return None
+	cfg = build_cfg(func)
+	decls = cfg.variables.decls
+	local_ids = set()
+	free = set()
+	for node in _nodes(func.body):
+		if node.__class__ in (SimpleLocation, ArraySimpleLocation, ArraySize):
+			if decls[cfg.var_of[id(node)]] is None:
+				free.add(node.name)
+			else:
+				local_ids.add(id(node))
+	memo = { }
+	body = copy.deepcopy(func.body, memo)
+	try:
+		body.stmt_list = _tail_returns(body.stmt_list)
+	except _CannotInline:
+		return None
+	if ty != 'void' and not _always_returns(body):
+		return None
+	locals = [ memo[key] for key in local_ids if key in memo ]
+	return _Template(func, body, locals, free)
+
+
+def _leaf(expr):
+	return isinstance(expr, Literal) or (expr.__class__ is ReadLocation
+		and expr.location.__class__ is SimpleLocation)
+
+
+def _names(expr):
+	return { node.name for node in _nodes(expr)
+		if node.__class__ in (SimpleLocation, ArraySimpleLocation, ArraySize) }
+
+
+class _Inliner(object):
+	'''
+	Expansión en línea de las funciones no recursivas de un programa cuyo
+	cuerpo tiene a lo más budget nodos. Las funciones se procesan de las
+	llamadas hacia las que llaman, así que lo que se copia ya está
+	expandido.
+	'''
+	def __init__(self, program, stats, budget):
+		self.functions = { decl.name: decl for decl in program.decl_list
+			if decl.__class__ is FuncDeclaration }
+		self.stats = stats
+		self.budget = budget
+		self.templates = { }
+		self.inlined = set()
+		# Bloques de una expansión sin declaraciones propias
+		self.wrappers = { }
+		self.calls = { name: { node.name for node in _nodes(func.body) if node.__class__ is FuncCall }
+			for name, func in self.functions.items() }
+		self.recursive = { name for name in self.functions if name in self.reach(name) }
+
+	def reach(self, name):
+		'''
+		Funciones que se pueden llamar, directa o indirectamente, desde name.
+		'''
+		seen = set()
+		stack = list(self.calls[name])
+		while stack:
+			callee = stack.pop()
+			if callee in seen or callee not in self.calls:
+				continue
+			seen.add(callee)
+			stack.extend(self.calls[callee])
+		return seen
+
+	def order(self):
+		'''
+		Nombres de las funciones en orden posterior del grafo de llamadas.
+		'''
+		order = []
+		seen = set()
+		for name in self.functions:
+			if name in seen:
+				continue
+			seen.add(name)
+			stack = [(name, iter(sorted(self.calls[name])))]
+			while stack:
+				current, callees = stack[-1]
+				for callee in callees:
+					if callee in self.functions and callee not in seen:
+						seen.add(callee)
+						stack.append((callee, iter(sorted(self.calls[callee]))))
+						break
+				else:
+					stack.pop()
+					order.append(current)
+		return order
+
+	def run(self):
+		for name in self.order():
+			self.inline_into(self.functions[name])
+		self.stats['functions'] += len(self.inlined)
+
+	def template(self, call):
+		'''
+		_Template de la función de call si se puede expandir aquí, o None.
+		'''
+		name = call.name
+		if name not in self.functions or name in self.recursive:
+			return None
+		if name not in self.templates:
+			self.templates[name] = _make_template(self.functions[name], self.budget)
+		template = self.templates[name]
+		if template is None or len(call.arguments) != len(template.func.params) \
+				or template.free & self.names:
+			# Alguna global que usa la función está tapada por una local
+			return None
+		if not all(isinstance(arg, Expression) for arg in call.arguments):
+			# Una asignación no puede ser el valor de la LocalDecl del parámetro
+			return None
+		return template
+
+	def inline_into(self, func):
+		self.func = func
+		self.names = _declared_names(func)
+		# Nombres que siempre son locales de func
+		self.locals = { param.name for param in func.params }
+		if func.body.__class__ is Compound_Stmt:
+			self.locals.update(decl.name for decl in func.body.local_decl)
+		self.temps = []
+		func.body = map_statements(func.body, self.statement) or Compound_Stmt([], [])
+		if self.temps:
+			_declare_temps(func, self.temps)
+
+	def statement(self, stmt):
+		cls = stmt.__class__
+		# Primero las llamadas que se reemplazan por una expresión, en
+		# cualquier parte
+		substitute = self.substitute
+		if cls is WriteLocation or isinstance(stmt, Expression):
+			_map_children(stmt, substitute)
+		else:
+			for field in ('condition', 'testExpr', 'updpStmt', 'value'):
+				expr = getattr(stmt, field, None)
+				if isinstance(expr, Expression) or expr.__class__ is WriteLocation:
+					setattr(stmt, field, map_expression(expr, substitute))
+		if cls is Compound_Stmt:
+			stmt.stmt_list = _splice(stmt.stmt_list, self.wrappers)
+			return self.declarations(stmt)
+		return self.site(stmt)
+
+	def substitute(self, expr):
+		'''
+		Reemplaza una llamada a una función que solo retorna una expresión
+		sin efectos por esa expresión, si los argumentos no tienen efectos
+		ni pueden fallar (y, si el parámetro se usa más de una vez, son
+		hojas).
+		'''
+		if expr.__class__ is not FuncCall:
+			return expr
+		template = self.template(expr)
+		if template is None or template.expression is None:
+			return expr
+		params = [ param.name for param in template.func.params ]
+		for name, arg in zip(params, expr.arguments):
+			if not _safe(arg) or (template.uses.get(name, 0) > 1 and not _leaf(arg)):
+				return expr
+		memo = { }
+		result = copy.deepcopy(template.expression, memo)
+		args = dict(zip(params, expr.arguments))
+		param_nodes = { id(memo[id(node)]) for node in template.locals }
+
+		def replace(node):
+			if node.__class__ is ReadLocation and id(node.location) in param_nodes:
+				return copy.deepcopy(args[node.location.name])
+			return node
+
+		self.stats['calls'] += 1
+		self.inlined.add(expr.name)
+		return map_expression(result, replace)
+
+	# Expansión de una llamada en una sentencia
+
+	def roots(self, stmt):
+		'''
+		Expresiones de stmt que se evalúan una vez, en orden, antes que
+		cualquier sentencia que contenga.
+		'''
+		cls = stmt.__class__
+		if cls is FuncCall:
+			return [stmt]
+		if cls is WriteLocation:
+			if stmt.location.__class__ is ArraySimpleLocation:
+				return [stmt.value, stmt.location.size]
+			return [stmt.value]
+		if cls is Return_Stmt:
+			return [stmt.value] if stmt.value is not None else []
+		if cls is If_Stmt:
+			return [stmt.condition]
+		return []
+
+	def search(self, expr):
+		'''
+		Primera llamada expandible de expr (en orden de evaluación) tal que
+		lo que se evalúa antes no tiene efectos, no puede fallar y solo lee
+		locales de la función: la llamada se puede adelantar a la sentencia.
+		Pone self.dirty si encontró algo que no deja seguir buscando.
+		'''
+		cls = expr.__class__
+		if cls is FuncCall:
+			if self.template(expr) is not None:
+				return expr
+			for arg in expr.arguments:
+				found = self.search(arg)
+				if found is not None or self.dirty:
+					return found
+			self.dirty = True
+			return None
+		if cls is BinOp:
+			found = self.search(expr.left)
+			if found is not None or self.dirty:
+				return found
+			if expr.op in ('&&', '||'):
+				# Lo que está a la derecha puede no evaluarse
+				if not self.clean(expr.right):
+					self.dirty = True
+				return None
+			return self.search(expr.right)
+		if cls is UnaryOp and _increment_target(expr) is None:
+			return self.search(expr.right)
+		if cls is ReadLocation and expr.location.__class__ is SimpleLocation:
+			if expr.location.name not in self.locals:
+				self.dirty = True
+			return None
+		if not isinstance(expr, Literal):
+			self.dirty = True
+		return None
+
+	def clean(self, expr):
+		return _safe(expr) and all(node.location.name in self.locals
+			for node in _nodes(expr) if node.__class__ is ReadLocation)
+
+	def site(self, stmt):
+		'''
+		Si stmt tiene una llamada que se puede adelantar, retorna un
+		Compound_Stmt con la función expandida seguida de stmt (que lee el
+		resultado de una variable _fN).
+		'''
+		self.dirty = False
+		call = None
+		for expr in self.roots(stmt):
+			call = self.search(expr)
+			if call is not None or self.dirty:
+				break
+		if call is None:
+			return stmt
+		func = self.template(call).func
+		ty = func.type_spec.name
+		base = _fresh(self.names, f'_{func.name}')
+		line = getattr(call, 'lineno', None)
+		if call is stmt or (stmt.__class__ is WriteLocation and stmt.value is call
+				and stmt.location.__class__ is SimpleLocation):
+			# El resultado va directo a su destino
+			if call is stmt:
+				location = _location(base, ty, line) if ty != 'void' else None
+			else:
+				location = stmt.location
+			block = self.expand(call, base, location, ty)
+			if call is stmt and location is not None:
+				self.declare(base, ty, line)
+			return block
+		self.declare(base, ty, line)
+		block = self.expand(call, base, _location(base, ty, line), ty)
+		self.replace(stmt, call, _variable(base, ty, line))
+		block.stmt_list = _splice(block.stmt_list + [self.site(stmt)], self.wrappers)
+		return block
+
+	def declare(self, name, ty, line):
+		self.temps.append(_temp_decl(name, ty, line))
+		self.locals.add(name)
+
+	def replace(self, stmt, old, new):
+		fn = lambda expr: new if expr is old else expr
+		cls = stmt.__class__
+		if cls is WriteLocation or isinstance(stmt, Expression):
+			_map_children(stmt, fn)
+		elif cls is If_Stmt:
+			stmt.condition = map_expression(stmt.condition, fn)
+		else:
+			stmt.value = map_expression(stmt.value, fn)
+
+	def expand(self, call, base, location, ty):
+		'''
+		Compound_Stmt con el cuerpo de la función de call: los parámetros
+		son LocalDecl con los argumentos, las variables se llaman
+		base_nombre y cada return asigna su valor a location. Si todas las
+		declaraciones tienen un valor inicial que se puede escribir como
+		literal, el bloque no tiene declaraciones (queda en wrappers).
+		'''
+		template = self.template(call)
+		func = template.func
+		memo = { }
+		body = copy.deepcopy(template.body, memo)
+		for node in template.locals:
+			node = memo[id(node)]
+			node.name = f'{base}_{node.name}'
+		for stmt in _walk_statements(body):
+			if stmt.__class__ in (LocalDecl, ArrayLocalDecl):
+				stmt.name = f'{base}_{stmt.name}'
+		line = getattr(call, 'lineno', None)
+		params = [ LocalDecl(f'{base}_{param.name}', SimpleType(param.type_spec.name, lineno=line),
+			arg, lineno=line) for param, arg in zip(func.params, call.arguments) ]
+
+		def returned(stmt):
+			if stmt.__class__ is not Return_Stmt:
+				return stmt
+			if stmt.value is None or location is None:
+				return None
+			return _assign(copy.deepcopy(location), stmt.value, ty)
+
+		body = map_statements(body, returned)
+		self.stats['calls'] += 1
+		self.inlined.add(func.name)
+		decls = params + body.local_decl
+		if not all(decl.__class__ is LocalDecl and (decl.value is not None
+				or decl.type_spec.name in ('int', 'float')) for decl in decls):
+			return Compound_Stmt(decls, body.stmt_list, lineno=line)
+		# Los nombres ya son únicos: las variables se declaran al principio
+		# de la función y los valores iniciales pasan a ser asignaciones, así
+		# la expansión no abre un ámbito.
+		stmts = []
+		for decl in decls:
+			ty = decl.type_spec.name
+			value = decl.value
+			if value is None:
+				value = IntegerLiteral(0, lineno=line) if ty == 'int' else FloatLiteral(0.0, lineno=line)
+				value.type = ty
+			self.declare(decl.name, ty, line)
+			stmts.append(_assign(_location(decl.name, ty, line), value, ty))
+		block = Compound_Stmt([], stmts + body.stmt_list, lineno=line)
+		self.wrappers[id(block)] = block
+		return block
+
+	def declarations(self, stmt):
+		'''
+		Las LocalDecl de stmt inicializadas con una llamada que se puede
+		adelantar pasan a ser asignaciones al principio de stmt_list, si
+		las declaraciones que las siguen no calculan nada.
+		'''
+		moved = []
+		later = set()
+		for decl in reversed(stmt.local_decl):
+			value = getattr(decl, 'value', None)
+			if value is not None and not isinstance(value, Literal):
+				self.dirty = False
+				if decl.__class__ is not LocalDecl or self.search(value) is None \
+						or _names(value) & (later | { decl.name }):
+					break
+				moved.append(decl)
+			later.add(decl.name)
+		if not moved:
+			return stmt
+		assigns = []
+		for decl in reversed(moved):
+			ty = decl.type_spec.name
+			assign = _assign(_location(decl.name, ty, getattr(decl, 'lineno', None)), decl.value, ty)
+			decl.value = None
+			assigns.append(self.site(assign))
+		stmt.stmt_list[:0] = assigns
+		return stmt
+
+
+def inline_functions(program, stats, budget=INLINE_BUDGET):
+	'''
+	Expande en línea las llamadas a funciones no recursivas de program
+	cuyo cuerpo tiene a lo más budget nodos.
+	'''
+	_Inliner(program, stats, budget).run()
+
+
+class _LoopInvariants(object):
+	'''
+	Saca de los ciclos las expresiones que no cambian dentro de ellos.
+	Una expresión es invariante en un ciclo si ningún nodo del CFG del
+	ciclo (ni la inicialización de un for) escribe sus variables, y si lee
+	arreglos, si en el ciclo no se escriben elementos ni se llama a
+	funciones (una llamada escribe todas las globales). Se guarda en una
+	variable _invN antes del ciclo más externo en el que es invariante si
+	no puede fallar; si puede fallar (a.size, a[k], x / y), solo antes del
+	ciclo cuya condición la evalúa siempre en la primera vuelta, sin nada
+	que pueda fallar antes.
+	'''
+	def __init__(self, func, stats):
+		self.func = func
+		self.stats = stats
+		self.cfg = cfg = build_cfg(func)
+		self.infos = cfg.expressions.infos
+		self.of_node = cfg.expressions.of_node
+		self.names = _declared_names(func)
+		# Ciclos abiertos, del más externo al más interno: (ciclo, defs, memoria)
+		self.loops = []
+		self.guard = False
+		self.temps = { }
+		self.decls = []
+		# id(ciclo) -> asignaciones que van antes
+		self.hoisted = { }
+		self.wrappers = { }
+
+	def run(self):
+		self.statement(self.func.body)
+		if not self.hoisted:
+			return
+		_declare_temps(self.func, self.decls)
+		self.func.body = map_statements(self.func.body, self.place)
+
+	def effects(self, loop):
+		ids = { id(stmt) for stmt in _walk_statements(loop) }
+		defs = 0
+		memory = False
+		for node in self.cfg.nodes:
+			if id(node.stmt) in ids:
+				defs |= node.defs
+				memory = memory or node.stores or node.calls
+		return defs, memory
+
+	def statement(self, stmt):
+		cls = stmt.__class__
+		if cls is Compound_Stmt:
+			for s in stmt.local_decl + stmt.stmt_list:
+				self.statement(s)
+		elif cls is If_Stmt:
+			stmt.condition = self.visit(stmt.condition)
+			self.statement(stmt.true_block)
+			if stmt.false_block is not None:
+				self.statement(stmt.false_block)
+		elif cls is While_Stmt:
+			self.loop(stmt, 'condition', True)
+		elif cls is ForStmt:
+			self.statement(stmt.initialStmt)
+			init = stmt.initialStmt
+			guard = init.__class__ is Null_Stmt or (init.__class__ is WriteLocation
+				and init.location.__class__ is SimpleLocation and _safe(init.value))
+			self.loop(stmt, 'testExpr', guard)
+		elif cls in (LocalDecl, Return_Stmt):
+			if stmt.value is not None:
+				stmt.value = self.visit(stmt.value)
+		elif cls is WriteLocation or isinstance(stmt, Expression):
+			self.children(stmt)
+
+	def loop(self, stmt, field, guard):
+		defs, memory = self.effects(stmt)
+		self.loops.append((stmt, defs, memory))
+		test = getattr(stmt, field)
+		if isinstance(test, Expression):
+			self.guard = guard
+			setattr(stmt, field, self.visit(test))
+			self.guard = False
+		self.statement(stmt.body)
+		if stmt.__class__ is ForStmt and stmt.updpStmt is not None:
+			update = stmt.updpStmt
+			if update.__class__ is WriteLocation or _increment_target(update) is not None:
+				self.children(update)
+			else:
+				stmt.updpStmt = self.visit(update)
+		self.loops.pop()
+
+	def target(self, info, expr):
+		'''
+		Ciclo antes del que se puede calcular expr, o None.
+		'''
+		if getattr(expr, 'type', None) not in SCALAR_TYPES:
+			return None
+		if _safe(expr):
+			loops = self.loops
+		elif self.guard:
+			loops = self.loops[-1:]
+		else:
+			return None
+		for loop, defs, memory in loops:
+			if not info.vars & defs and not (info.memory and memory):
+				return loop
+		return None
+
+	def visit(self, expr):
+		if not self.loops:
+			return expr
+		number = self.of_node.get(id(expr))
+		if number is not None:
+			info = self.infos[number]
+			if info.bit >= 0 and (info.vars or info.memory):
+				loop = self.target(info, expr)
+				if loop is not None:
+					return self.hoist(loop, number, expr)
+		self.children(expr)
+		return expr
+
+	def children(self, expr):
+		'''
+		Recorre los hijos de expr en orden de evaluación. La condición
+		deja de estar protegida (guard) después de algo que puede fallar.
+		'''
+		cls = expr.__class__
+		if cls is BinOp:
+			expr.left = self.after(self.visit(expr.left))
+			if expr.op in ('&&', '||'):
+				guard = self.guard
+				self.guard = False
+				expr.right = self.visit(expr.right)
+				self.guard = guard and _safe(expr.right)
+			else:
+				expr.right = self.after(self.visit(expr.right))
+		elif cls is UnaryOp:
+			target = _increment_target(expr)
+			if target is None:
+				expr.right = self.after(self.visit(expr.right))
+			elif target.__class__ is ArraySimpleLocation:
+				target.size = self.after(self.visit(target.size))
+		elif cls is ReadLocation:
+			location = expr.location
+			if location.__class__ is ArraySimpleLocation:
+				location.size = self.after(self.visit(location.size))
+		elif cls is WriteLocation:
+			expr.value = self.after(self.visit(expr.value))
+			location = expr.location
+			if location.__class__ is ArraySimpleLocation:
+				location.size = self.after(self.visit(location.size))
+		elif cls is FuncCall:
+			expr.arguments = [ self.after(self.visit(arg)) for arg in expr.arguments ]
+		elif cls is NewArrayExpr:
+			expr.expr = self.after(self.visit(expr.expr))
+
+	def after(self, expr):
+		if self.guard and not _safe(expr):
+			self.guard = False
+		return expr
+
+	def hoist(self, loop, number, expr):
+		ty = expr.type
+		line = getattr(expr, 'lineno', None)
+		key = (id(loop), number)
+		name = self.temps.get(key)
+		if name is None:
+			name = self.temps[key] = _fresh(self.names, '_inv')
+			self.decls.append(_temp_decl(name, ty, line))
+			self.hoisted.setdefault(id(loop), []).append(_assign(_location(name, ty, line), expr, ty))
+			self.stats['expressions'] += 1
+		self.stats['replaced'] += 1
+		return _variable(name, ty, line)
+
+	def place(self, stmt):
+		'''
+		Pone las asignaciones antes de su ciclo; dentro de una lista van
+		directo en la lista.
+		'''
+		assigns = self.hoisted.get(id(stmt))
+		if assigns:
+			block = Compound_Stmt([], assigns + [stmt], lineno=getattr(stmt, 'lineno', None))
+			self.wrappers[id(block)] = block
+			return block
+		if stmt.__class__ is Compound_Stmt:
+			stmt.stmt_list = _splice(stmt.stmt_list, self.wrappers)
+		return stmt
+
+
+def hoist_loop_invariants(func, stats):
+	'''
+	Expresiones invariantes de los ciclos de func.
+	'''
+	_LoopInvariants(func, stats).run()
+
+
+# Nombre del paso -> (función, contadores de sus estadísticas)
+PASSES = {
+	'inline': (inline_functions, ('calls', 'functions')),
+	'unreachable': (eliminate_unreachable, ('branches', 'statements')),
+	'dead': (eliminate_dead_stores, ('stores', 'decls')),
+	'licm': (hoist_loop_invariants, ('expressions', 'replaced')),
+	'cse': (eliminate_common_subexpressions, ('expressions', 'replaced')),
+}
+
+# Pasos que reciben el Program completo (y el presupuesto) en vez de
+# cada función
+PROGRAM_PASSES = ('inline',)
+
+DEFAULT_PASSES = ('inline', 'unreachable', 'dead', 'licm', 'cse')
+
+
+def optimize(ast, passes=DEFAULT_PASSES, budget=INLINE_BUDGET):
+	'''
+	Aplica los pasos passes (nombres de PASSES, que se pueden repetir) a
+	cada función de ast; budget es el tamaño máximo de una función que
+	se expande en línea. Retorna el árbol y un diccionario con el número
+	de nodos antes y después y, para cada paso, sus contadores y los
+	segundos que tardó.
+	'''
+	stats = { 'before': count_nodes(ast) }
+	funcs = [ decl for decl in ast.decl_list if decl.__class__ is FuncDeclaration ]
+	for name in passes:
+		function, counters = PASSES[name]
+		# Un paso que se repite suma sus estadísticas
+		pass_stats = stats.setdefault(name, dict.fromkeys(counters, 0))
+		start = time.perf_counter()
+		if name in PROGRAM_PASSES:
+			function(ast, pass_stats, budget)
+		else:
+			for func in funcs:
+				function(func, pass_stats)
+		pass_stats['seconds'] = pass_stats.get('seconds', 0) + time.perf_counter() - start
+	stats['after'] = count_nodes(ast)
+	return ast, stats
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file, write_ast
+	from errors import Diagnostics
+	from typecheck import check_types
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 optimize.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_types(ast)
+	if ast is None or diag.records:
+		raise SystemExit(1)
+	ast, stats = optimize(ast)
+	write_ast(ast, sys.stdout)
+	for name in DEFAULT_PASSES:
+		print(name, stats[name], file=sys.stderr)
+	print(f"{stats['before']} nodos antes, {stats['after']} después", file=sys.stderr)
+
+if __name__ == '__main__':
+	main()
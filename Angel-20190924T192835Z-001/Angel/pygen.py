@@ -0,0 +1,600 @@
+# coding: utf-8
+'''
+Traducción de MiniC a código fuente de Python.
+
+generate_function() escribe cada FuncDeclaration como una función de
+Python: las variables locales y parámetros son variables locales de
+Python, While_Stmt y ForStmt son ciclos while, y FuncCall es una llamada
+directa. Después compile() de CPython genera el bytecode, así que el
+programa corre a la velocidad del propio intérprete de Python.
+
+Los nombres se traducen para que no choquen con palabras reservadas ni
+entre ámbitos: v_x para las locales (v_x_1, v_x_2, ... si un bloque
+interior oculta a otra con el mismo nombre), g_x para las globales y f_x
+para las funciones.
+
+Donde Python y MiniC difieren se sigue la semántica de interp:
+
+  - / y % enteros truncan hacia cero (_c_div, _c_mod);
+  - los int son de 64 bits. Como +, - y * conmutan con tomar el resto
+    módulo 2**64, una expresión hecha solo de ellos (y del - unario) se
+    calcula con los int de Python y se reduce una vez, en la raíz: el
+    resultado se guarda en un temporal con := y solo si no cabe se le
+    da la vuelta con _wrap. Los incrementos llaman a _wrap;
+  - los bool son True y False, como los de Python (literales, valores
+    iniciales y arreglos nuevos incluidos), y los char su código
+    (CharLiteral 'a' es 97);
+  - un índice negativo es un error (con checked, por omisión): el índice
+    se guarda en un temporal con := y se compara antes de indexar; los
+    índices mayores que el tamaño los rechaza la lista.
+
+Los objetos de código se guardan en un CodeCache indexado por el hash
+del AST de cada función (ast_hash), de modo que volver a cargar un
+programa sin cambios, o con pocas funciones cambiadas, no vuelve a
+llamar a compile() para las demás.
+
+    from pygen import PythonProgram
+    program = PythonProgram(ast)          # ast ya pasó por typecheck
+    print(program.call('fib', 20))
+    print(program.source('fib'))
+'''
+import hashlib
+from collections import OrderedDict
+
+from cast import *
+from interp import ExecutionError, INT_MIN, INT_MAX, c_div, c_mod, wrap, zero, literal_value
+
+_PYTHON_OPS = {
+	'+': '+', '-': '-', '*': '*',
+	'<': '<', '<=': '<=', '>': '>', '>=': '>=', '==': '==', '!=': '!=',
+	# Operadores compuestos de la gramática (vea typecheck._COMPOUND)
+	'pe': '+', 'me': '-', 'te': '*',
+}
+
+_DIVISION = { '/': '_c_div', 'de': '_c_div', '%': '_c_mod', 'mde': '_c_mod' }
+
+# Operadores de Python que pueden salirse de 64 bits
+_ARITHMETIC = frozenset(['+', '-', '*'])
+
+
+# Marca de fin de nodo en ast_hash()
+_END = object()
+
+
+def ast_hash(node):
+	'''
+	Hash (sha256 en hexadecimal) de la estructura de node: clases, campos
+	y tipos calculados por typecheck, pero no los lineno.
+	'''
+	h = hashlib.sha256()
+	update = h.update
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if isinstance(node, AST):
+			update(f'<{node.__class__.__name__}:{getattr(node, "type", None)}'.encode())
+			stack.append(_END)
+			stack.extend(reversed([ getattr(node, name) for name in node._fields ]))
+		elif node is _END:
+			update(b'>')
+		elif node.__class__ is list:
+			update(f'[{len(node)}'.encode())
+			stack.extend(reversed(node))
+		else:
+			update(f'{node.__class__.__name__}:{node!r}\0'.encode())
+	return h.hexdigest()
+
+
+class CodeCache(object):
+	'''
+	Cache LRU en memoria: llave -> objeto de código. hits y misses cuentan
+	los aciertos y fallos.
+	'''
+	def __init__(self, maxsize=4096):
+		self.maxsize = maxsize
+		self.codes = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, key):
+		code = self.codes.get(key)
+		if code is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.codes.move_to_end(key)
+		return code
+
+	def put(self, key, code):
+		self.codes[key] = code
+		if len(self.codes) > self.maxsize:
+			self.codes.popitem(last=False)
+
+	def clear(self):
+		self.codes.clear()
+
+# Cache compartido por omisión
+CODE_CACHE = CodeCache()
+
+
+def _oob(index):
+	raise IndexError(index)
+
+
+def _new_array(n, initial):
+	if n < 0:
+		raise ExecutionError(f'Tamaño de arreglo negativo: {n}')
+	return [initial] * n
+
+
+def _store(array, index, value):
+	if index < 0:
+		raise IndexError(index)
+	array[index] = value
+	return value
+
+
+def _store_unchecked(array, index, value):
+	array[index] = value
+	return value
+
+
+def _increment(array, index, step):
+	if index < 0:
+		raise IndexError(index)
+	value = array[index] = wrap(array[index] + step)
+	return value
+
+# Funciones auxiliares visibles en el código generado
+RUNTIME = {
+	'_c_div': c_div,
+	'_c_mod': c_mod,
+	'_wrap': wrap,
+	'_oob': _oob,
+	'_new_array': _new_array,
+	'_store': _store,
+	'_store_unchecked': _store_unchecked,
+	'_increment': _increment,
+}
+
+
+class _Generator(object):
+	'''
+	Escribe el código de Python de una función (o de los inicializadores
+	de las globales).
+	'''
+	def __init__(self, globals_, checked=True):
+		self.global_names = globals_
+		self.checked = checked
+		self.lines = []
+		self.indent = 1
+		# Nombre de Python de cada variable visible; cada ámbito guarda
+		# lo que ocultó para restaurarlo al cerrar.
+		self.names = { }
+		self.scopes = []
+		self.used = set()
+		self.written_globals = set()
+		self.ntemps = 0
+
+	def emit(self, line):
+		self.lines.append('    ' * self.indent + line)
+
+	def push_scope(self):
+		self.scopes.append([])
+
+	def pop_scope(self):
+		names = self.names
+		for name, hidden in reversed(self.scopes.pop()):
+			if hidden is None:
+				del names[name]
+			else:
+				names[name] = hidden
+
+	def declare(self, name):
+		pyname = f'v_{name}'
+		n = 0
+		while pyname in self.used:
+			n += 1
+			pyname = f'v_{name}_{n}'
+		self.used.add(pyname)
+		self.scopes[-1].append((name, self.names.get(name)))
+		self.names[name] = pyname
+		return pyname
+
+	def variable(self, name):
+		pyname = self.names.get(name)
+		if pyname is not None:
+			return pyname
+		if name not in self.global_names:
+			raise ExecutionError(f"'{name}' no está declarado")
+		return f'g_{name}'
+
+	def target(self, name):
+		'''
+		Como variable(), pero anota las globales que se asignan.
+		'''
+		pyname = self.variable(name)
+		if pyname.startswith('g_'):
+			self.written_globals.add(pyname)
+		return pyname
+
+	def temp(self):
+		self.ntemps += 1
+		return f'_t{self.ntemps}'
+
+	# Funciones
+
+	def function(self, node):
+		self.push_scope()
+		params = [ self.declare(param.name) for param in node.params ]
+		body = node.body
+		if body.__class__ is Compound_Stmt:
+			self.compound(body, new_scope=False)
+		else:
+			self.stmt(body)
+		self.pop_scope()
+		if self.written_globals:
+			self.lines.insert(0, '    global ' + ', '.join(sorted(self.written_globals)))
+		if not self.lines:
+			self.lines.append('    pass')
+		return f"def f_{node.name}({', '.join(params)}):\n" + '\n'.join(self.lines) + '\n'
+
+	# Sentencias
+
+	def block(self, node):
+		self.indent += 1
+		start = len(self.lines)
+		self.stmt(node)
+		if len(self.lines) == start:
+			self.emit('pass')
+		self.indent -= 1
+
+	def stmt(self, node):
+		method = _STATEMENTS.get(node.__class__)
+		if method is not None:
+			method(self, node)
+		elif node.__class__ is WriteLocation:
+			self.emit(self.assignment(node))
+		else:
+			self.emit(self.expr(node))
+
+	def compound(self, node, new_scope=True):
+		if new_scope:
+			self.push_scope()
+		for decl in node.local_decl:
+			self.stmt(decl)
+		for stmt in node.stmt_list:
+			self.stmt(stmt)
+		if new_scope:
+			self.pop_scope()
+
+	def local(self, node):
+		if node.value is not None:
+			value = self.expr(node.value)
+		else:
+			value = repr(zero(getattr(node.type_spec, 'name', None)))
+		self.emit(f'{self.declare(node.name)} = {value}')
+
+	def array_local(self, node):
+		self.emit(f'{self.declare(node.name)} = None')
+
+	def if_stmt(self, node):
+		self.emit(f'if {self.expr(node.condition)}:')
+		self.block(node.true_block)
+		if node.false_block is not None:
+			self.emit('else:')
+			self.block(node.false_block)
+
+	def while_stmt(self, node):
+		self.emit(f'while {self.expr(node.condition)}:')
+		self.block(node.body)
+
+	def for_stmt(self, node):
+		self.push_scope()
+		self.stmt(node.initialStmt)
+		test = node.testExpr
+		cond = 'True' if test is None or test.__class__ is Null_Stmt else self.expr(test)
+		self.emit(f'while {cond}:')
+		self.indent += 1
+		self.stmt(node.body)
+		if node.updpStmt is not None:
+			self.stmt(node.updpStmt)
+		else:
+			self.emit('pass')
+		self.indent -= 1
+		self.pop_scope()
+
+	def break_stmt(self, node):
+		self.emit('break')
+
+	def return_stmt(self, node):
+		self.emit('return' if node.value is None else f'return {self.expr(node.value)}')
+
+	def null_stmt(self, node):
+		pass
+
+	def assignment(self, node):
+		'''
+		Asignación como sentencia.
+		'''
+		location = node.location
+		value = self.expr(node.value)
+		if location.__class__ is ArraySimpleLocation:
+			array = self.variable(location.name)
+			return f'{array}[{self.index(location.size)}] = {value}'
+		return f'{self.target(location.name)} = {value}'
+
+	# Expresiones
+
+	def expr(self, node):
+		method = _EXPRESSIONS.get(node.__class__)
+		if method is None:
+			raise ExecutionError(f'No se puede traducir {node.__class__.__name__}')
+		return method(self, node)
+
+	def literal(self, node):
+		return repr(literal_value(node))
+
+	def index(self, node):
+		'''
+		Código del índice node, con la verificación de índice negativo.
+		'''
+		index = self.expr(node)
+		if not self.checked:
+			return index
+		if node.__class__ is IntegerLiteral:
+			return index if node.value >= 0 else f'_oob({index})'
+		t = self.temp()
+		return f'{t} if ({t} := {index}) >= 0 else _oob({t})'
+
+	def binop(self, node):
+		op = node.op
+		if _PYTHON_OPS.get(op) in _ARITHMETIC and getattr(node, 'type', None) != 'float':
+			return self.wrapped(node)
+		left = self.expr(node.left)
+		right = self.expr(node.right)
+		if op == '&&':
+			return f'(bool({left}) and bool({right}))'
+		if op == '||':
+			return f'(bool({left}) or bool({right}))'
+		if op in _DIVISION:
+			if op in ('/', 'de') and getattr(node.left, 'type', None) == 'float':
+				return f'({left} / {right})'
+			return f'{_DIVISION[op]}({left}, {right})'
+		pyop = _PYTHON_OPS.get(op)
+		if pyop is None:
+			raise ExecutionError(f"Operador '{op}' desconocido")
+		return f'({left} {pyop} {right})'
+
+	def arithmetic(self, node):
+		'''
+		Código de una expresión int de +, - y * (y - unario) sin reducir a
+		64 bits, o None si node no es una de ellas.
+		'''
+		if getattr(node, 'type', None) == 'float':
+			return None
+		cls = node.__class__
+		if cls is BinOp and _PYTHON_OPS.get(node.op) in _ARITHMETIC:
+			left = self.arithmetic(node.left) or self.expr(node.left)
+			right = self.arithmetic(node.right) or self.expr(node.right)
+			return f'({left} {_PYTHON_OPS[node.op]} {right})'
+		if cls is UnaryOp and node.op == '-':
+			return f'(-{self.arithmetic(node.right) or self.expr(node.right)})'
+		return None
+
+	def wrapped(self, node):
+		code = self.arithmetic(node)
+		t = self.temp()
+		return f'({t} if {INT_MIN} <= ({t} := {code}) <= {INT_MAX} else _wrap({t}))'
+
+	def unaryop(self, node):
+		op = node.op
+		if op == 'add' or op == 'sub':
+			step = '1' if op == 'add' else '-1'
+			operand = node.right
+			if operand.__class__ is ReadLocation:
+				location = operand.location
+				if location.__class__ is ArraySimpleLocation:
+					array = self.variable(location.name)
+					return f'_increment({array}, {self.expr(location.size)}, {step})'
+				name = self.target(location.name)
+				return f'({name} := _wrap({name} + {step}))'
+			return f'_wrap({self.expr(operand)} + {step})'
+		if op == '-' and getattr(node, 'type', None) != 'float':
+			return self.wrapped(node)
+		operand = self.expr(node.right)
+		if op == '-':
+			return f'(-{operand})'
+		if op == '+':
+			return operand
+		if op == '!':
+			return f'(not {operand})'
+		raise ExecutionError(f"Operador '{op}' desconocido")
+
+	def read(self, node):
+		location = node.location
+		if location.__class__ is ArraySimpleLocation:
+			return f'{self.variable(location.name)}[{self.index(location.size)}]'
+		return self.variable(location.name)
+
+	def write(self, node):
+		location = node.location
+		value = self.expr(node.value)
+		if location.__class__ is ArraySimpleLocation:
+			store = '_store' if self.checked else '_store_unchecked'
+			return f'{store}({self.variable(location.name)}, {self.expr(location.size)}, {value})'
+		return f'({self.target(location.name)} := {value})'
+
+	def call(self, node):
+		args = ', '.join(self.expr(arg) for arg in node.arguments)
+		return f'f_{node.name}({args})'
+
+	def new_array(self, node):
+		initial = zero(getattr(node.type_spec, 'name', None))
+		return f'_new_array({self.expr(node.expr)}, {initial!r})'
+
+	def array_size(self, node):
+		return f'len({self.variable(node.name)})'
+
+
+_STATEMENTS = {
+	Compound_Stmt: _Generator.compound,
+	LocalDecl: _Generator.local,
+	VarDeclaration: _Generator.local,
+	ArrayLocalDecl: _Generator.array_local,
+	If_Stmt: _Generator.if_stmt,
+	While_Stmt: _Generator.while_stmt,
+	ForStmt: _Generator.for_stmt,
+	Break_Stmt: _Generator.break_stmt,
+	Return_Stmt: _Generator.return_stmt,
+	Null_Stmt: _Generator.null_stmt,
+}
+
+_EXPRESSIONS = {
+	IntegerLiteral: _Generator.literal,
+	FloatLiteral: _Generator.literal,
+	BoolLiteral: _Generator.literal,
+	CharLiteral: _Generator.literal,
+	StringLiteral: _Generator.literal,
+	BinOp: _Generator.binop,
+	UnaryOp: _Generator.unaryop,
+	ReadLocation: _Generator.read,
+	WriteLocation: _Generator.write,
+	FuncCall: _Generator.call,
+	NewArrayExpr: _Generator.new_array,
+	ArraySize: _Generator.array_size,
+}
+
+
+def _global_names(program):
+	return frozenset(decl.name for decl in program.decl_list
+		if decl.__class__ in (VarDeclaration, ConstDeclaration, ArrayDeclaration))
+
+
+def generate_function(node, global_names, checked=True):
+	'''
+	Código de Python (una definición def f_nombre) de la FuncDeclaration
+	node. global_names son los nombres de las variables globales.
+	'''
+	return _Generator(global_names, checked).function(node)
+
+
+def generate_init(program, checked=True):
+	'''
+	Código de la función __init__, que asigna las variables globales en
+	orden.
+	'''
+	gen = _Generator(_global_names(program), checked)
+	for decl in program.decl_list:
+		cls = decl.__class__
+		if cls is VarDeclaration or cls is ConstDeclaration:
+			if decl.value is not None:
+				value = gen.expr(decl.value)
+			else:
+				value = repr(zero(getattr(decl.type_spec, 'name', None)))
+			gen.emit(f'{gen.target(decl.name)} = {value}')
+		elif cls is ArrayDeclaration:
+			gen.emit(f'{gen.target(decl.name)} = None')
+	if gen.written_globals:
+		gen.lines.insert(0, '    global ' + ', '.join(sorted(gen.written_globals)))
+	if not gen.lines:
+		gen.lines.append('    pass')
+	return 'def __init__():\n' + '\n'.join(gen.lines) + '\n'
+
+
+def generate_source(program, checked=True):
+	'''
+	Código de Python de todo el programa.
+	'''
+	names = _global_names(program)
+	parts = [ generate_function(decl, names, checked) for decl in program.decl_list
+		if decl.__class__ is FuncDeclaration ]
+	parts.append(generate_init(program, checked))
+	return '\n'.join(parts)
+
+
+class PythonProgram(object):
+	'''
+	Programa MiniC (ya verificado con typecheck) traducido a Python y
+	cargado en su propio espacio de nombres. compiled cuenta las
+	funciones que hubo que compilar (las demás salieron de cache).
+	'''
+	def __init__(self, program, checked=True, cache=CODE_CACHE):
+		self.checked = checked
+		self.namespace = dict(RUNTIME)
+		self.compiled = 0
+		names = _global_names(program)
+		# Las funciones se traducen según qué nombres son globales
+		env = hashlib.sha256(f'{sorted(names)}:{checked}'.encode()).hexdigest()
+		for decl in program.decl_list:
+			if decl.__class__ is FuncDeclaration:
+				key = (ast_hash(decl), env)
+				code = cache.get(key) if cache is not None else None
+				if code is None:
+					source = generate_function(decl, names, checked)
+					code = compile(source, f'<minic {decl.name}>', 'exec')
+					self.compiled += 1
+					if cache is not None:
+						cache.put(key, code)
+				exec(code, self.namespace)
+		self._program = program
+		self._names = names
+		self._init = generate_init(program, checked)
+		exec(compile(self._init, '<minic __init__>', 'exec'), self.namespace)
+		self._run(self.namespace['__init__'], ())
+
+	def source(self, name):
+		'''
+		Código de Python generado para la función name.
+		'''
+		if name == '__init__':
+			return self._init
+		for decl in self._program.decl_list:
+			if decl.__class__ is FuncDeclaration and decl.name == name:
+				return generate_function(decl, self._names, self.checked)
+		raise ExecutionError(f"La función '{name}' no existe")
+
+	def call(self, name, *args):
+		func = self.namespace.get(f'f_{name}')
+		if func is None:
+			raise ExecutionError(f"La función '{name}' no existe")
+		return self._run(func, args)
+
+	def _run(self, func, args):
+		try:
+			return func(*args)
+		except IndexError:
+			raise ExecutionError('Índice fuera del arreglo') from None
+		except ZeroDivisionError:
+			raise ExecutionError('División por cero') from None
+		except RecursionError:
+			raise ExecutionError('Demasiadas llamadas anidadas') from None
+		except TypeError as e:
+			if 'NoneType' in str(e):
+				raise ExecutionError('Arreglo sin crear') from None
+			raise
+
+
+def main():
+	'''
+	Programa principal. Usado para probar: imprime el código generado.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+	from typecheck import check_types
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 pygen.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_types(ast)
+	if diag.records:
+		raise SystemExit(1)
+	print(generate_source(ast))
+
+if __name__ == '__main__':
+	main()
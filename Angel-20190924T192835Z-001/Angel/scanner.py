@@ -0,0 +1,350 @@
+# coding: utf-8
+'''
+Analizador léxico escrito a mano, alternativo a lexer.Lexer.
+
+lexer.Lexer usa la expresión regular maestra de SLY: para cada token
+prueba en orden decenas de patrones, incluidas las palabras reservadas
+(INT = r'int', IF = r'if', ...). Scanner clasifica el primer carácter de
+cada token con una tabla y consume el resto con un solo patrón corto; las
+palabras reservadas se buscan en un diccionario después de leer el
+identificador completo.
+
+Scanner produce los mismos tokens (tipo, valor, lineno, index y end) y
+reporta los mismos errores que lexer.Lexer.
+
+Uso:
+
+    from scanner import Scanner
+    for tok in Scanner().tokenize(text):
+        ...
+
+Las tablas (caracteres ignorados, literales, palabras reservadas) se
+derivan de lexer.Lexer para que ambos analizadores no se separen.
+'''
+import re
+
+from sly.lex import Token
+
+from errors import error, column
+from lexer import Lexer
+
+# Clases de carácter
+(_IGNORE, _ALPHA, _DIGIT, _MINUS, _SLASH, _QUOTE, _OP, _LITERAL,
+	_NEWLINE, _CR) = range(10)
+
+# Palabras reservadas que lexer.Lexer reconoce (las demás salen como IDENT)
+KEYWORDS = { kw: tok.type for kw in Lexer.keywords
+	for tok in Lexer().tokenize(kw) if tok.type != 'IDENT' }
+
+# Operadores de dos caracteres, en el orden de prioridad de lexer.Lexer.
+# La entrada None indica el token de un solo carácter.
+_OPERATORS = {
+	'<': (('<=', 'LE'), (None, '<')),
+	'>': (('>=', 'GE'), (None, '>')),
+	'!': (('!=', 'NE'), (None, '!')),
+	'=': (('==', 'EQ'), (None, '=')),
+	'|': (('||', 'OR'),),
+	'&': (('&&', 'AND'),),
+	'+': (('++', 'INC'), ('+=', 'ADDEQ')),
+	'*': (('*=', 'MULEQ'),),
+	'%': (('%=', 'MODEQ'),),
+}
+
+# Los identificadores y los números consumen también lo ignorado que les
+# sigue, lo que ahorra una vuelta del ciclo principal por token.
+_ident_re = re.compile(r'([a-zA-Z]+[a-zA-Z0-9]*)[%s]*' % re.escape(Lexer.ignore))
+_number_re = re.compile(r'(?:([0-9]+[.][0-9]*)|(0[bB][01]+|0[xX][0-9a-fA-F]+|[1-9][0-9]*|0))[%s]*'
+	% re.escape(Lexer.ignore))
+_ignore_re = re.compile('[%s]+' % re.escape(Lexer.ignore))
+
+
+def _int_value(value):
+	if value[:2] in ('0b', '0B'):
+		return int(value, 2)
+	elif value[:2] in ('0x', '0X'):
+		return int(value, 16)
+	else:
+		return int(value, 10)
+
+
+def _build_classes():
+	classes = { }
+	for c in Lexer.literals:
+		classes[c] = _LITERAL
+	for c in _OPERATORS:
+		classes[c] = _OP
+	for c in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ':
+		classes[c] = _ALPHA
+	for c in '0123456789':
+		classes[c] = _DIGIT
+	classes['-'] = _MINUS
+	classes['/'] = _SLASH
+	classes["'"] = classes['"'] = _QUOTE
+	classes['\n'] = _NEWLINE
+	classes['\r'] = _CR
+	# Lo ignorado tiene prioridad sobre todo lo demás, igual que en SLY
+	for c in Lexer.ignore:
+		classes[c] = _IGNORE
+	return classes
+
+_CLASSES = _build_classes()
+
+
+class Scanner(object):
+	'''
+	Analizador léxico compatible con lexer.Lexer.tokenize().
+	'''
+	def __init__(self):
+		self.text = ''
+		self.index = 0
+		self.lineno = 1
+
+	def tokenize(self, text, lineno=1, index=0):
+		self.text = text
+		n = len(text)
+		classes = _CLASSES
+		keywords = KEYWORDS
+		ident_match = _ident_re.match
+		ignore_match = _ignore_re.match
+		literals = Lexer.literals
+		number_match = _number_re.match
+		try:
+			while index < n:
+				c = text[index]
+				k = classes.get(c)
+
+				if k is _IGNORE:
+					index = ignore_match(text, index).end()
+					continue
+
+				start = index
+				if k is _ALPHA:
+					m = ident_match(text, index)
+					end = m.end(1)
+					value = text[start:end]
+					tok = Token()
+					tok.type = keywords.get(value, 'IDENT')
+					tok.value = value
+					tok.lineno = lineno
+					tok.index = start
+					tok.end = end
+					index = m.end()
+					yield tok
+					continue
+
+				if k is _LITERAL:
+					index += 1
+					tok = Token()
+					tok.type = c
+					tok.value = c
+					tok.lineno = lineno
+					tok.index = start
+					tok.end = index
+					yield tok
+					continue
+
+				if k is _OP:
+					for seq, ty in _OPERATORS[c]:
+						if seq is None:
+							index += 1
+							break
+						if text.startswith(seq, index):
+							index += 2
+							break
+					else:
+						ty = None
+					if ty is not None:
+						tok = Token()
+						tok.type = ty
+						tok.value = text[start:index]
+						tok.lineno = lineno
+						tok.index = start
+						tok.end = index
+						yield tok
+						continue
+
+				elif k is _DIGIT:
+					m = number_match(text, index)
+					tok = Token()
+					if m.lastindex == 1:
+						tok.type = 'FLOAT_LIT'
+						tok.value = float(m.group(1))
+					else:
+						tok.type = 'INT_LIT'
+						tok.value = _int_value(m.group(2))
+					tok.lineno = lineno
+					tok.index = start
+					tok.end = m.end(m.lastindex)
+					index = m.end()
+					yield tok
+					continue
+
+				elif k is _MINUS:
+					if text.startswith('--', index):
+						ty = 'DEC'
+					elif text.startswith('-=', index):
+						ty = 'SUBEQ'
+					else:
+						ty = None
+					if ty is not None:
+						index += 2
+						tok = Token()
+						tok.type = ty
+						tok.value = text[start:index]
+						tok.lineno = lineno
+						tok.index = start
+						tok.end = index
+						yield tok
+						continue
+
+				elif k is _SLASH:
+					if text.startswith('/=', index):
+						index += 2
+						tok = Token()
+						tok.type = 'DIVEQ'
+						tok.value = '/='
+						tok.lineno = lineno
+						tok.index = start
+						tok.end = index
+						yield tok
+						continue
+					nl = text.find('\n', index)
+					eol = n if nl < 0 else nl
+					if text.startswith('/*', index):
+						close = text.rfind('*/', index + 2, eol)
+						if close >= 0:
+							index = close + 2
+						else:
+							error(lineno, 'Comentario no cerrado', column=column(text, start),
+								code='comentario-no-cerrado')
+							index = eol
+						continue
+					if text.startswith('//', index):
+						index = eol
+						continue
+
+				elif k is _QUOTE:
+					if index + 2 < n and text[index+1] != '\n' and text[index+2] in '\'"':
+						index += 3
+						ty = 'CHAR_LIT'
+					else:
+						nl = text.find('\n', index)
+						eol = n if nl < 0 else nl
+						close = max(text.rfind("'", index + 1, eol), text.rfind('"', index + 1, eol))
+						if close >= 0:
+							index = close + 1
+							ty = 'STRING_LIT'
+						else:
+							ty = None
+					if ty is not None:
+						tok = Token()
+						tok.type = ty
+						tok.value = text[start:index]
+						tok.lineno = lineno
+						tok.index = start
+						tok.end = index
+						yield tok
+						continue
+
+				elif k is _NEWLINE:
+					while index < n and text[index] == '\n':
+						index += 1
+					lineno += index - start
+					continue
+
+				elif k is _CR:
+					error(lineno, 'En la línea Cadena de código de escape invalido',
+						column=column(text, start), code='escape-invalido')
+					index += 1
+					continue
+
+				if c in literals:
+					index += 1
+					tok = Token()
+					tok.type = c
+					tok.value = c
+					tok.lineno = lineno
+					tok.index = start
+					tok.end = index
+					yield tok
+				else:
+					error(lineno, 'En la línea se encuentra un caracter ilegal %r' % c,
+						column=column(text, start), code='caracter-ilegal')
+					index += 1
+		finally:
+			self.index = index
+			self.lineno = lineno
+
+
+def tokenize_file(f, lexer=None, chunk_size=1 << 20):
+	'''
+	Produce los tokens de un archivo de texto abierto sin leerlo completo.
+
+	El archivo se lee en bloques de chunk_size caracteres que se cortan en
+	el último salto de línea; el resto del bloque pasa al siguiente. En
+	MiniC ningún token, comentario o cadena cruza un salto de línea, así
+	que analizar líneas completas da los mismos tokens que analizar todo
+	el texto. Los valores lineno e index de cada token corresponden a la
+	posición en el archivo completo. La memoria usada depende del tamaño
+	del bloque (y de la línea más larga), no del tamaño del archivo.
+
+	lexer puede ser un Scanner (por omisión) o un lexer.Lexer.
+	'''
+	if lexer is None:
+		lexer = Scanner()
+	lineno = 1
+	base = 0
+	pending = ''
+	while True:
+		chunk = f.read(chunk_size)
+		if chunk:
+			text = pending + chunk
+			cut = text.rfind('\n') + 1
+			if cut == 0:
+				pending = text
+				continue
+			text, pending = text[:cut], text[cut:]
+		else:
+			text, pending = pending, ''
+			if not text:
+				return
+		for tok in lexer.tokenize(text, lineno):
+			tok.index += base
+			tok.end += base
+			yield tok
+		lineno = lexer.lineno
+		base += len(text)
+
+
+def compare(text, lineno=1):
+	'''
+	Compara los tokens de Scanner con los de lexer.Lexer para el texto
+	dado. Retorna None si son iguales o una tupla (posición, token de
+	Lexer, token de Scanner) con la primera diferencia.
+	'''
+	def key(tok):
+		return None if tok is None else (tok.type, tok.value, tok.lineno, tok.index, tok.end)
+	expected = Lexer().tokenize(text, lineno)
+	actual = Scanner().tokenize(text, lineno)
+	pos = 0
+	while True:
+		a = next(expected, None)
+		b = next(actual, None)
+		if key(a) != key(b):
+			return (pos, a, b)
+		if a is None:
+			return None
+		pos += 1
+
+
+def main():
+	import sys
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 scanner.py filename\n')
+		raise SystemExit(1)
+	with open(sys.argv[1], "r") as f:
+		for tok in tokenize_file(f):
+			print(tok)
+
+if __name__ == '__main__':
+	main()
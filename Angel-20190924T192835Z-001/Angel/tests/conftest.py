@@ -0,0 +1,16 @@
+# coding: utf-8
+'''
+Los módulos del compilador se importan como módulos de primer nivel
+(from cast import *), así que las pruebas agregan su directorio a
+sys.path. SLY reporta advertencias de la gramática al importar cparse;
+se descartan aquí para no repetirlas en cada prueba.
+'''
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stderr(io.StringIO()):
+	import cparse
@@ -0,0 +1,135 @@
+# coding: utf-8
+'''
+Pruebas de astbin.py: dumps/loads debe reproducir cualquier árbol de
+cast.py y rechazar datos que no produjo.
+'''
+import io
+
+import pytest
+
+import astbin
+import cparse
+from astbin import FormatError
+from cast import *
+
+SOURCE = '''
+int g = 3;
+const k = 4 * 2;
+float a[];
+void p(void) { return; }
+int f(int n, int m) {
+	int x;
+	int y = (x = n + 1);
+	char c = 'c';
+	float z = 2.5;
+	int b[];
+	b = new int[n];
+	b[0] = x = y;
+	if (n < 2) return n; else x = x + 1;
+	if (!(n >= m) && n <= 3 || n != m) x = -x;
+	while (x > 0) { x = x - 1; f(x, m % 2); }
+	;
+	return b.size + +x + f(n - 1, b[0]) / (y = 2) * y;
+}
+'''
+
+
+def program():
+	'''
+	SOURCE más los nodos que la gramática no construye.
+	'''
+	ast = cparse.parse(SOURCE)
+	i = SimpleLocation('i', lineno=40)
+	loop = ForStmt(WriteLocation(i, IntegerLiteral(0, lineno=40)),
+		BinOp('<', ReadLocation(i), Size(10), lineno=40),
+		BinOp('+', ReadLocation(i), IntegerLiteral(-1 << 70)),
+		Compound_Stmt([], [Write_Stmt(StringLiteral('señal \x00 \ud800')),
+			Write_Stmt(BoolLiteral('true')), Break_Stmt(None)], lineno=41))
+	extra = FuncDeclaration('extra', [], SimpleType('void'), Compound_Stmt(
+		[ArrayLocalDecl('v', SimpleType('bool'), None),
+		 LocalDecl('i', SimpleType('int'), None)],
+		[loop, Null_Stmt(None), Write_Stmt(FloatLiteral(float('-inf'))),
+		 Write_Stmt(CharLiteral('señal'))]), lineno=39)
+	ast.decl_list.append(extra)
+	ast.decl_list.append(ArrayDeclaration('w', SimpleType('char')))
+	return ast
+
+
+def nodes(tree):
+	stack = [tree]
+	while stack:
+		value = stack.pop()
+		if isinstance(value, list):
+			stack.extend(value)
+		elif isinstance(value, AST):
+			yield value
+			stack.extend(getattr(value, name) for name in value._fields)
+
+
+def shape(value):
+	'''
+	Estructura completa de value (clases, lineno y campos) para comparar.
+	'''
+	if isinstance(value, list):
+		return [ shape(item) for item in value ]
+	if isinstance(value, AST):
+		return (value.__class__, getattr(value, 'lineno', None),
+			[ shape(getattr(value, name)) for name in value._fields ])
+	return (value.__class__, value)
+
+
+def test_program_covers_every_node_class():
+	concrete = { cls for cls in AST._nodes.values() if cls._fields }
+	assert { node.__class__ for node in nodes(program()) } == concrete
+
+
+def test_round_trip():
+	tree = program()
+	data = astbin.dumps(tree)
+	assert shape(astbin.loads(data)) == shape(tree)
+	assert shape(astbin.loads(bytearray(data))) == shape(tree)
+
+
+def test_round_trip_through_files():
+	tree = program()
+	f = io.BytesIO()
+	astbin.dump(tree, f)
+	f.seek(0)
+	assert shape(astbin.load(f)) == shape(tree)
+
+
+@pytest.mark.parametrize('tree', [None, [], [IntegerLiteral(1), [True, False]], 'texto'])
+def test_round_trip_values(tree):
+	assert shape(astbin.loads(astbin.dumps(tree))) == shape(tree)
+
+
+def test_deep_tree():
+	tree = IntegerLiteral(0)
+	for i in range(100000):
+		tree = UnaryOp('-', tree)
+	assert astbin.loads(astbin.dumps(tree)).right.right.op == '-'
+
+
+def test_unknown_values_are_rejected():
+	with trusted_nodes():
+		node = IntegerLiteral(object())
+	with pytest.raises(FormatError):
+		astbin.dumps(node)
+
+
+def test_bad_header():
+	data = astbin.dumps(program())
+	with pytest.raises(FormatError, match='No es un AST'):
+		astbin.loads(b'XX' + data)
+	with pytest.raises(FormatError, match='Versión'):
+		astbin.loads(data[:5] + bytes([astbin.VERSION + 1]) + data[6:])
+	with pytest.raises(FormatError, match='no coinciden'):
+		astbin.loads(data[:6] + bytes(8) + data[14:])
+
+
+def test_truncated_data():
+	data = astbin.dumps(program())
+	header = len(astbin.MAGIC) + 1 + 8
+	for end in range(header, len(data)):
+		with pytest.raises(FormatError):
+			astbin.loads(data[:end])
@@ -0,0 +1,73 @@
+# coding: utf-8
+'''
+Pruebas de astcache.py.
+'''
+import pickle
+import sys
+
+import pytest
+
+import astcache
+import cparse
+from astcache import ASTCache
+from lexer import Lexer
+from scanner import Scanner
+
+SOURCE = '''
+int f(int a, int b) {
+	return a + b * 2;
+}
+'''
+
+
+def test_hit_returns_same_tree(tmp_path):
+	cache = ASTCache(str(tmp_path))
+	first = cache.parse(SOURCE)
+	second = cache.parse(SOURCE)
+	assert (cache.hits, cache.misses) == (1, 1)
+	assert repr(second) == repr(first)
+
+
+def test_key_depends_on_lexer_class(tmp_path):
+	cache = ASTCache(str(tmp_path))
+	assert cache.key(SOURCE) == cache.key(SOURCE, Lexer())
+	assert cache.key(SOURCE, Lexer()) != cache.key(SOURCE, Scanner())
+
+
+def test_key_depends_on_lexer_source(tmp_path, monkeypatch):
+	module = tmp_path / 'mylexer.py'
+	text = 'from scanner import Scanner\nclass MyLexer(Scanner):\n    pass\n'
+	module.write_text(text)
+	monkeypatch.syspath_prepend(str(tmp_path))
+	import mylexer
+	try:
+		key = ASTCache(str(tmp_path / 'cache')).key(SOURCE, mylexer.MyLexer())
+		module.write_text(text.replace('pass', 'separator = ";"'))
+		assert ASTCache(str(tmp_path / 'cache')).key(SOURCE, mylexer.MyLexer()) != key
+	finally:
+		del sys.modules['mylexer']
+
+
+def test_key_depends_on_parser_source(tmp_path, monkeypatch):
+	key = ASTCache(str(tmp_path)).key(SOURCE)
+	real = astcache._module_fingerprint
+	monkeypatch.setattr(astcache, '_module_fingerprint',
+		lambda name: real(name) + ('x' if name == 'cparse' else ''))
+	assert ASTCache(str(tmp_path)).key(SOURCE) != key
+
+
+@pytest.mark.parametrize('payload', [
+	b'garbage',
+	# No es una tupla: TypeError al desempacarla
+	pickle.dumps(astcache.CACHE_VERSION),
+	# Referencia a un módulo que no existe: ModuleNotFoundError al cargar
+	b'cnonexistent_module\nthing\n.',
+])
+def test_corrupt_entry_is_a_miss(tmp_path, payload):
+	cache = ASTCache(str(tmp_path))
+	key = cache.key(SOURCE)
+	with open(cache._path(key), 'wb') as f:
+		f.write(payload)
+	assert cache._load(key) is None
+	cache.parse(SOURCE)
+	assert (cache.hits, cache.misses) == (0, 1)
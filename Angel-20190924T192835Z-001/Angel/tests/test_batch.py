@@ -0,0 +1,79 @@
+# coding: utf-8
+'''
+Pruebas de batch.py: cada archivo recibe su propia lista de errores y el
+código de salida es 1 si alguno falla.
+'''
+import sys
+
+import pytest
+
+import batch
+import minic
+
+GOOD = 'int f(int a) { return a + 1; }\n'
+BAD = 'int f(int a) {\n\treturn a + ;\n}\n'
+
+
+@pytest.fixture
+def sources(tmp_path):
+	'''
+	40 archivos (más que dos grupos de CHUNKSIZE) en subdirectorios; los
+	múltiplos de 7 tienen un error de sintaxis.
+	'''
+	names = []
+	for i in range(40):
+		path = tmp_path / f'd{i % 3}' / f'f{i:02d}.c'
+		path.parent.mkdir(exist_ok=True)
+		path.write_text(BAD if i % 7 == 0 else GOOD)
+		names.append(str(path))
+	(tmp_path / 'd0' / 'notas.txt').write_text('no es MiniC')
+	return tmp_path, names
+
+
+def test_find_sources(sources):
+	root, names = sources
+	assert sorted(batch.find_sources([str(root)])) == sorted(names)
+	assert list(batch.find_sources([names[3]])) == [names[3]]
+
+
+@pytest.mark.parametrize('chunksize', [1, 16, 100])
+def test_check_files_reports_errors_per_file(sources, chunksize):
+	root, names = sources
+	results = list(batch.check_files(names, jobs=2, chunksize=chunksize))
+	assert sorted(result.filename for result in results) == sorted(names)
+	for result in results:
+		i = int(result.filename[-4:-2])
+		if i % 7 == 0:
+			assert [ (d.filename, d.lineno, d.code) for d in result.errors ] == [
+				(result.filename, 2, 'sintaxis')]
+		else:
+			assert result.errors == []
+
+
+def test_missing_file_is_an_error(tmp_path):
+	missing = str(tmp_path / 'no-existe.c')
+	[result] = batch.check_files([missing], jobs=1)
+	assert [ d.code for d in result.errors ] == ['excepcion']
+	assert 'FileNotFoundError' in result.errors[0].message
+
+
+def run(monkeypatch, *args):
+	monkeypatch.setattr(sys, 'argv', ['minic.py', 'batch', *args])
+	with pytest.raises(SystemExit) as exit:
+		minic.main()
+	return exit.value.code
+
+
+def test_exit_status(sources, monkeypatch, capsys):
+	root, names = sources
+	good = [ name for i, name in enumerate(names) if i % 7 ]
+	assert run(monkeypatch, '-q', '-j', '2', *good) == 0
+	out, err = capsys.readouterr()
+	assert out == '' and err.startswith(f'{len(good)} archivos, 0 con errores')
+
+	assert run(monkeypatch, '-j', '2', str(root)) == 1
+	out, err = capsys.readouterr()
+	assert err.startswith('40 archivos, 6 con errores')
+	failed = [ line.split(':')[0] for line in out.splitlines() if ' errores (' in line ]
+	assert sorted(failed) == sorted(names[::7])
+	assert out.count(': OK (') == 34
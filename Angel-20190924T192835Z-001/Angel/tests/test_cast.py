@@ -0,0 +1,360 @@
+# coding: utf-8
+'''
+Pruebas de cast.py: validación de los constructores de nodos, NodeWalker,
+NodeTransformer, iter_flatten() y los volcados (write_dot, write_ast).
+'''
+import io
+import sys
+import threading
+
+import pytest
+
+import cast
+import cparse
+from cast import *
+from lexer import Lexer
+
+# Usa todas las reglas de la gramática que construyen nodos
+PROGRAM = '''
+int g = 3;
+int h;
+const k = 4 * 2;
+float a[];
+void p(void) { return; }
+int f(int n, int m) {
+	int x;
+	int y = (x = n + 1);
+	char c = 'c';
+	float z = 2.5;
+	int b[];
+	b = new int[n];
+	b[0] = x = y;
+	if (n < 2) return n; else x = x + 1;
+	if (!(n >= m) && n <= 3 || n != m) x = -x;
+	while (x > 0) { x = x - 1; f(x, m % 2); }
+	;
+	return b.size + +x + f(n - 1, b[0]) / (y = 2) * y;
+}
+'''
+
+
+def parse(source):
+	parser = cparse.Parser()
+	parser.validate = True
+	return parser.parse(Lexer().tokenize(source))
+
+
+def test_parser_output_passes_validation():
+	ast = parse(PROGRAM)
+	assert [ decl.name for decl in ast.decl_list ] == ['g', 'h', 'k', 'a', 'p', 'f']
+
+
+def test_trusted_nodes_skips_validation():
+	with pytest.raises(TypeError):
+		BinOp('+', 1, 2)
+	with trusted_nodes():
+		node = BinOp('+', 1, 2)
+	assert node.left == 1
+
+
+def test_trusted_nodes_is_per_thread():
+	entered = threading.Event()
+	done = threading.Event()
+
+	def trusted():
+		with trusted_nodes():
+			entered.set()
+			done.wait(5)
+
+	thread = threading.Thread(target=trusted)
+	thread.start()
+	try:
+		assert entered.wait(5)
+		with pytest.raises(TypeError):
+			BinOp('+', 1, 2)
+	finally:
+		done.set()
+		thread.join()
+
+
+def test_write_dot_marks_nodes_cut_by_max_nodes():
+	ast = cparse.parse('int f(int a) { return a + 1; }\nint g(int b) { return b; }\n')
+	out = io.StringIO()
+	assert write_dot(ast, out, max_nodes=3) == 3
+	text = out.getvalue()
+	# n03 es el primer hijo de FuncDeclaration f; a f (n02) y al
+	# Program (n01) les faltan hijos
+	assert 'n02_more [label="..."];\n' in text and 'n02 -> n02_more;\n' in text
+	assert 'n01_more [label="..."];\n' in text and 'n01 -> n01_more;\n' in text
+	assert 'n04' not in text
+	full = io.StringIO()
+	write_dot(ast, full)
+	assert '...' not in full.getvalue()
+
+
+def test_write_dot_escapes_backslashes_and_quotes():
+	node = StringLiteral('"C:\\dir\\"', lineno=1)
+	out = io.StringIO()
+	write_dot(node, out)
+	text = out.getvalue()
+	# Antes la barra final escapaba la comilla y cerraba la etiqueta
+	assert r'label="StringLiteral\n(value=\"C:\\dir\\\")"' in text
+
+
+class _Tracer(NodeWalker):
+	'''
+	Anota cada gancho llamado con la clase del nodo.
+	'''
+	def __init__(self):
+		self.calls = []
+
+	def enter(self, node):
+		self.calls.append(('enter', node.__class__.__name__))
+
+	def leave(self, node):
+		self.calls.append(('leave', node.__class__.__name__))
+
+	def enter_BinOp(self, node):
+		self.calls.append(('enter', node.op))
+
+	def leave_BinOp(self, node):
+		self.calls.append(('leave', node.op))
+
+
+def _expression(source):
+	return parse(f'int f(int a, int b) {{ return {source}; }}').decl_list[0].body.stmt_list[0].value
+
+
+def test_walker_hook_order():
+	tracer = _Tracer()
+	tracer.visit(_expression('a + -b * 2'))
+	assert tracer.calls == [
+		('enter', '+'),
+		('enter', 'ReadLocation'), ('enter', 'SimpleLocation'),
+		('leave', 'SimpleLocation'), ('leave', 'ReadLocation'),
+		('enter', '*'),
+		('enter', 'UnaryOp'), ('enter', 'ReadLocation'), ('enter', 'SimpleLocation'),
+		('leave', 'SimpleLocation'), ('leave', 'ReadLocation'), ('leave', 'UnaryOp'),
+		('enter', 'IntegerLiteral'), ('leave', 'IntegerLiteral'),
+		('leave', '*'),
+		('leave', '+'),
+	]
+
+
+def test_walker_visits_lists_in_order():
+	class Names(NodeWalker):
+		def __init__(self):
+			self.names = []
+		def enter_FuncDeclaration(self, node):
+			self.names.append(node.name)
+		def enter_VarDeclaration(self, node):
+			self.names.append(node.name)
+	walker = Names()
+	walker.visit(parse(PROGRAM).decl_list)
+	assert walker.names == ['g', 'h', 'p', 'f']
+
+
+def test_walker_matches_node_visitor():
+	# Una subclase con solo visit_NodeName recorre lo mismo que con
+	# NodeVisitor, incluidas las llamadas explícitas a visit y generic_visit
+	def collector(base):
+		class Collector(base):
+			def __init__(self):
+				self.seen = []
+			def visit_BinOp(self, node):
+				self.seen.append(node.op)
+				self.visit(node.right)
+				self.visit(node.left)
+			def visit_SimpleLocation(self, node):
+				self.seen.append(node.name)
+			def visit_FuncCall(self, node):
+				self.seen.append(node.name + '()')
+				self.generic_visit(node)
+		return Collector
+
+	ast = parse(PROGRAM)
+	expected = collector(NodeVisitor)()
+	expected.visit(ast)
+	walker = collector(NodeWalker)()
+	walker.visit(ast)
+	assert walker.seen == expected.seen
+	assert 'f()' in walker.seen and 'x' in walker.seen
+
+
+def test_walker_visit_takes_precedence_over_hooks():
+	class Walker(_Tracer):
+		def visit_UnaryOp(self, node):
+			self.calls.append(('visit', node.op))
+			self.generic_visit(node)
+
+	walker = Walker()
+	walker.visit(_expression('-a'))
+	assert walker.calls == [('visit', '-'), ('enter', 'ReadLocation'),
+		('enter', 'SimpleLocation'), ('leave', 'SimpleLocation'), ('leave', 'ReadLocation')]
+
+
+def test_walker_generic_visit_override():
+	# Sin visit_NodeName se llama al generic_visit de la subclase
+	class Walker(NodeWalker):
+		def __init__(self):
+			self.seen = []
+		def generic_visit(self, node):
+			self.seen.append(node.__class__.__name__)
+			NodeWalker.generic_visit(self, node)
+
+	walker = Walker()
+	walker.visit(_expression('a * 2'))
+	assert walker.seen == ['BinOp', 'ReadLocation', 'SimpleLocation', 'IntegerLiteral']
+
+
+def test_walker_beyond_the_recursion_limit():
+	depth = 20 * sys.getrecursionlimit()
+	tree = IntegerLiteral(1)
+	for i in range(depth):
+		tree = UnaryOp('-', tree)
+
+	class Count(NodeWalker):
+		count = 0
+		leaves = 0
+		def enter_UnaryOp(self, node):
+			self.count += 1
+		def leave_IntegerLiteral(self, node):
+			self.leaves += 1
+
+	counter = Count()
+	counter.visit(tree)
+	assert (counter.count, counter.leaves) == (depth, 1)
+
+
+def test_transformer_is_postorder_with_preorder_enter():
+	class Trace(NodeTransformer):
+		def __init__(self):
+			self.calls = []
+		def enter_BinOp(self, node):
+			self.calls.append(('enter', node.op))
+		def visit_BinOp(self, node):
+			# Los hijos ya fueron reemplazados
+			self.calls.append(('visit', node.op, node.left.__class__.__name__,
+				node.right.__class__.__name__))
+			return node
+		def visit_ReadLocation(self, node):
+			self.calls.append(('visit', node.location.name))
+			return IntegerLiteral(0)
+
+	trace = Trace()
+	tree = trace.visit(_expression('a + b * 2'))
+	assert trace.calls == [
+		('enter', '+'), ('visit', 'a'), ('enter', '*'), ('visit', 'b'),
+		('visit', '*', 'IntegerLiteral', 'IntegerLiteral'),
+		('visit', '+', 'IntegerLiteral', 'BinOp'),
+	]
+	assert tree.left.__class__ is IntegerLiteral and tree.right.left.__class__ is IntegerLiteral
+
+
+def test_transformer_replaces_and_deletes_in_lists():
+	class Rewrite(NodeTransformer):
+		def visit_Null_Stmt(self, node):
+			return None
+		def visit_LocalDecl(self, node):
+			return None if node.name == 'c' else node
+		def visit_Return_Stmt(self, node):
+			return Null_Stmt(None, lineno=node.lineno) if node.value is None else node
+		def visit_FuncCall(self, node):
+			node.arguments = node.arguments[::-1]
+			return node
+
+	ast = parse(PROGRAM)
+	before = parse(PROGRAM)
+	result = Rewrite().visit(ast)
+	assert result is ast
+	p, f = ast.decl_list[4], ast.decl_list[5]
+	# El return de p pasa a ser un Null_Stmt (se reemplaza, no se borra:
+	# visit_Null_Stmt solo ve los nodos originales)
+	assert [ s.__class__ for s in p.body.stmt_list ] == [Null_Stmt]
+	assert [ d.name for d in f.body.local_decl ] == ['x', 'y', 'z', 'b']
+	old = before.decl_list[5].body.stmt_list
+	assert len(f.body.stmt_list) == len(old) - 1
+	assert Null_Stmt not in { s.__class__ for s in f.body.stmt_list }
+	calls = [ node for _, node in flatten(f) if node.__class__ is FuncCall ]
+	assert [ arg.__class__ for arg in calls[0].arguments ] == [BinOp, ReadLocation]
+
+
+def test_transformer_visit_of_a_list():
+	class Drop(NodeTransformer):
+		def visit_IntegerLiteral(self, node):
+			return None if node.value == 0 else node
+	items = [IntegerLiteral(0), IntegerLiteral(1), 'texto', IntegerLiteral(0)]
+	assert [ repr(item) for item in Drop().visit(items) ] == ['IntegerLiteral(value=1)', "'texto'"]
+
+
+def test_transformer_beyond_the_recursion_limit():
+	depth = 20 * sys.getrecursionlimit()
+	tree = IntegerLiteral(1)
+	for i in range(depth):
+		tree = UnaryOp('-', tree)
+
+	class Fold(NodeTransformer):
+		def visit_UnaryOp(self, node):
+			if node.right.__class__ is IntegerLiteral:
+				return IntegerLiteral(-node.right.value)
+			return node
+
+	result = Fold().visit(tree)
+	assert result.__class__ is IntegerLiteral and result.value == 1
+
+
+def _old_dump(ast):
+	'''
+	Volcado que imprimía cparse.main() antes de write_ast().
+	'''
+	return ''.join('%s: %s%s\n' % (getattr(node, 'lineno', None), ' '*(4*depth), node)
+		for depth, node in flatten(ast))
+
+
+def test_iter_flatten_matches_flatten():
+	ast = parse(PROGRAM)
+	assert list(iter_flatten(ast)) == flatten(ast)
+	f = ast.decl_list[5]
+	assert list(iter_flatten(f.body.stmt_list)) == flatten(f.body.stmt_list)
+	assert list(iter_flatten(None)) == flatten(None) == []
+
+
+@pytest.mark.parametrize('bufsize', [1, 7, 4096])
+def test_write_ast_matches_the_old_dump(bufsize):
+	ast = parse(PROGRAM)
+	out = io.StringIO()
+	cparse.write_ast(ast, out, bufsize)
+	assert out.getvalue() == _old_dump(ast)
+
+
+def test_main_dump(tmp_path, monkeypatch, capsys):
+	path = tmp_path / 'program.c'
+	path.write_text(PROGRAM)
+	monkeypatch.setattr(sys, 'argv', ['cparse.py', str(path)])
+	cparse.main()
+	assert capsys.readouterr().out == _old_dump(parse(PROGRAM))
+
+
+def test_node_slots_come_from_annotations():
+	# Sin __dict__ un atributo mal escrito es un error; en Python 3.14
+	# (PEP 649) las anotaciones ya no están en el espacio de nombres
+	for cls in AST._nodes.values():
+		slots = { name for base in cls.__mro__ for name in getattr(base, '__slots__', ()) }
+		assert set(cls._fields) <= slots
+		assert not hasattr(cls.__new__(cls), '__dict__')
+	node = BinOp('+', IntegerLiteral(1), IntegerLiteral(2))
+	assert not hasattr(node, '__dict__')
+	with pytest.raises(AttributeError):
+		node.lefty = 1
+
+
+def test_annotated_names():
+	class Probe(metaclass=cast._ASTMeta):
+		left : int
+		right : 'Forward'
+	assert Probe.__slots__ == ('left', 'right')
+	class Empty(metaclass=cast._ASTMeta):
+		pass
+	assert Empty.__slots__ == ()
+	assert cast._annotated_names({ '__annotations__': { 'a': int } }) == ('a',)
+	assert cast._annotated_names({ }) == ()
@@ -0,0 +1,107 @@
+# coding: utf-8
+'''
+Pruebas de checker.py: los errores de nombres se reportan como registros
+de errors.Diagnostics con su línea y código.
+'''
+import cparse
+from checker import check_program
+from errors import Diagnostics
+
+
+def check(source):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(source)
+		assert not diag.records, diag.records
+		checker = check_program(ast)
+	assert checker.errors == len(diag.records)
+	return [ (d.lineno, d.code, d.severity) for d in diag.records ], diag.records
+
+
+def test_valid_program():
+	source = '''
+	int g;
+	int main(void) { return later(g, 1); }
+	int later(int a, int b) { int c[]; c = new int[a]; return c.size + b; }
+	'''
+	assert check(source)[0] == []
+
+
+def test_undeclared_identifiers():
+	source = '''int f(int a) {
+		x = a;
+		return y + v[0] + w.size + missing(a);
+	}
+	'''
+	records, diags = check(source)
+	assert records == [(2, 'no-declarado', 'error')] + [(3, 'no-declarado', 'error')] * 4
+	assert [ d.message for d in diags ] == [
+		"'x' no está declarado", "'y' no está declarado", "'v' no está declarado",
+		"'w' no está declarado", "'missing' no está declarado"]
+
+
+def test_global_is_declared_after_its_declaration():
+	records, _ = check('int f(void) { return g; }\nint g;\nint h(void) { return g; }\n')
+	assert records == [(1, 'no-declarado', 'error')]
+
+
+def test_duplicates_in_the_same_scope():
+	source = '''int g;
+	float g;
+	int f(int a, int a) {
+		int b;
+		int b;
+		return a;
+	}
+	int f(void) { return 0; }
+	'''
+	records, diags = check(source)
+	assert records == [
+		(8, 'duplicado', 'error'),
+		(2, 'duplicado', 'error'),
+		(3, 'duplicado', 'error'),
+		(5, 'duplicado', 'error'),
+	]
+	assert diags[1].message == "'g' ya fue declarado en la línea 1"
+
+
+def test_parameters_and_locals_share_a_scope():
+	records, _ = check('int f(int a) {\n\tint a;\n\treturn a;\n}\n')
+	assert records == [(2, 'duplicado', 'error')]
+
+
+def test_shadowing_is_allowed():
+	source = '''int x;
+	int f(int y) {
+		int x;
+		while (y > 0) { int y; y = 0; }
+		if (x > 0) { float x; x = 1.0; }
+		return x;
+	}
+	'''
+	assert check(source)[0] == []
+
+
+def test_block_scope_ends_with_the_block():
+	source = 'int f(int a) {\n\tif (a > 0) { int b; b = a; }\n\treturn b;\n}\n'
+	assert check(source)[0] == [(3, 'no-declarado', 'error')]
+
+
+def test_arity_across_the_translation_unit():
+	source = '''int f(void) {
+		return g(1) + g(1, 2, 3) + h();
+	}
+	int g(int a, int b) { return f(); }
+	int h(void) { return g(1, 2) + f(7); }
+	'''
+	records, diags = check(source)
+	assert records == [(2, 'aridad', 'error'), (2, 'aridad', 'error'), (5, 'aridad', 'error')]
+	assert [ d.message for d in diags ] == [
+		"'g' espera 2 argumentos y recibió 1",
+		"'g' espera 2 argumentos y recibió 3",
+		"'f' espera 0 argumentos y recibió 1"]
+
+
+def test_call_to_a_variable():
+	records, diags = check('int g;\nint f(void) {\n\treturn g(1);\n}\n')
+	assert records == [(3, 'no-es-funcion', 'error')]
+	assert diags[0].message == "'g' no es una función"
@@ -0,0 +1,76 @@
+# coding: utf-8
+'''
+Pruebas de dataflow.py sobre funciones pequeñas.
+'''
+import cparse
+import dataflow
+
+SOURCE = '''
+int f(int n) {
+	int x;
+	int y;
+	x = n + 1;
+	y = 0;
+	while (y < n) {
+		y = y + x * 2;
+	}
+	x = x * 2;
+	return y;
+}
+'''
+
+
+def cfg_of(source):
+	func = cparse.parse(source).decl_list[0]
+	return dataflow.build_cfg(func)
+
+
+def node_at(cfg, lineno):
+	return next(node for node in cfg.nodes if getattr(node.stmt, 'lineno', None) == lineno)
+
+
+def test_from_bits():
+	assert dataflow.from_bits([]) == 0
+	assert dataflow.from_bits([0, 3, 70]) == 1 | 8 | (1 << 70)
+	assert dataflow.bits(dataflow.from_bits([5, 1, 64])) == [1, 5, 64]
+
+
+def test_liveness():
+	cfg = cfg_of(SOURCE)
+	live = dataflow.liveness(cfg)
+	names = cfg.variables.names
+	# x se lee en el ciclo; la última escritura de x no se usa
+	assert sorted(names(live.after[node_at(cfg, 5).index])) == ['n', 'x']
+	assert names(live.after[node_at(cfg, 10).index]) == ['y']
+
+
+def test_reaching_definitions():
+	cfg = cfg_of(SOURCE)
+	solution, defs = dataflow.reaching_definitions(cfg)
+	y = cfg.variables.names_.index('y')
+	loop = node_at(cfg, 7)
+	# Llegan al ciclo la definición inicial y la del cuerpo
+	sites = defs.reaching(solution.before[loop.index], y)
+	assert sorted(sites) == sorted([node_at(cfg, 6).index, node_at(cfg, 8).index])
+
+
+def test_available_expressions():
+	cfg = cfg_of('''
+	int g(int a, int b) {
+		int x;
+		int y;
+		x = a * b;
+		y = a * b;
+		a = 1;
+		x = a * b;
+		return x + y;
+	}
+	''')
+	avail = dataflow.available_expressions(cfg)
+	candidates = cfg.expressions.candidates
+	def available(lineno):
+		return [ info.key[1] for info in candidates
+			if avail.before[node_at(cfg, lineno).index] >> info.bit & 1 ]
+	assert available(6) == ['*']
+	# La asignación a a invalida a * b
+	assert available(8) == []
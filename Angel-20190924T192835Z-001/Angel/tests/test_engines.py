@@ -0,0 +1,195 @@
+# coding: utf-8
+'''
+Todos los motores deben dar el mismo resultado, también cuando un int se
+sale de 64 bits: la aritmética entera da la vuelta (interp.wrap).
+'''
+import shutil
+import subprocess
+
+import pytest
+
+import cparse
+import ir
+from closures import ClosureInterpreter
+from constfold import fold_constants
+from errors import Diagnostics
+from interp import Interpreter, ExecutionError, INT_MIN, INT_MAX, wrap, c_div, c_mod
+from pygen import PythonProgram
+from typecheck import check_types
+from vm import VM, compile_program
+
+SOURCE = '''
+int add(int a, int b) { return a + b; }
+int sub(int a, int b) { return a - b; }
+int mul(int a, int b) { return a * b; }
+int div(int a, int b) { return a / b; }
+int mod(int a, int b) { return a % b; }
+int divm1(int a) { return a / -1; }
+int modm1(int a) { return a % -1; }
+int neg(int a) { return -a; }
+int twice(int a, int b) { a = a * b; a = a + b; return a; }
+int literal(int a) { return 9223372036854775807 + a; }
+int folded(void) { return 9223372036854775807 * 3 - (0 - 9223372036854775807 - 1) / -1; }
+int stored(int a) { int v[]; v = new int[1]; v[0] = a * a; return v[0]; }
+int keep(int a) { int v[]; v = new int[1]; v[0] = a; return v[0]; }
+int loop(int n) {
+	int v[];
+	int i;
+	int s;
+	v = new int[n];
+	i = 0;
+	s = 0;
+	while (i < n) {
+		v[i] = i * 4611686018427387904;
+		s = s + v[i];
+		i = i + 1;
+	}
+	return s + v[n - 1];
+}
+bool lt(int a, int b) { return a < b; }
+bool notlt(int a, int b) { return !(a < b); }
+bool initial(int a) { bool b; return b; }
+bool element(int a) { bool v[]; v = new bool[2]; v[1] = a > 0; return v[1]; }
+bool fresh(int a) { bool v[]; v = new bool[2]; return v[0]; }
+float fdiv(float a, float b) { return a / b; }
+bool both(int a) { return a > 0 && a < 10; }
+bool either(int a) { return a > 0 || a < -10; }
+'''
+
+BOOL_CASES = [
+	('lt', 1, 2),
+	('notlt', 1, 2),
+	('initial', 0),
+	('element', 3),
+	('fresh', 0),
+	('both', -1),
+	('both', 5),
+	('either', 5),
+	('either', 0),
+]
+
+CASES = [
+	('add', INT_MAX, 1),
+	('add', INT_MIN, -1),
+	('sub', INT_MIN, 1),
+	('mul', 1 << 32, 1 << 32),
+	('mul', INT_MIN, -1),
+	('mul', 3037000500, 3037000500),
+	('div', INT_MIN, -1),
+	('div', INT_MIN, 2),
+	('div', -7, 2),
+	('mod', INT_MIN, -1),
+	('mod', -7, 2),
+	('mod', 7, -2),
+	('divm1', INT_MIN),
+	('modm1', INT_MIN),
+	('neg', INT_MIN),
+	('twice', INT_MAX, 2),
+	('literal', 1),
+	('folded',),
+	('stored', 1 << 32),
+	('loop', 5),
+]
+
+
+def parse():
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(SOURCE)
+		check_types(ast)
+	assert not diag.records, diag.records
+	return ast
+
+
+def _numpy(ast):
+	nparray = pytest.importorskip('nparray')
+	return ClosureInterpreter(ast, nparray.NumpyArrays())
+
+
+def _folded(ast):
+	ast, _ = fold_constants(ast)
+	return Interpreter(ast)
+
+ENGINES = {
+	'interp': Interpreter,
+	'vm': lambda ast: VM(compile_program(ast)),
+	'closures': ClosureInterpreter,
+	'numpy': _numpy,
+	'pygen': PythonProgram,
+	'constfold': _folded,
+}
+
+
+def test_wrap():
+	assert wrap(INT_MAX + 1) == INT_MIN
+	assert wrap(INT_MIN - 1) == INT_MAX
+	assert wrap(1 << 64) == 0
+	assert wrap(-5) == -5
+	assert wrap(1e30) == 1e30
+	assert c_div(INT_MIN, -1) == INT_MIN
+	assert c_mod(INT_MIN, -1) == 0
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('case', CASES, ids=lambda case: '-'.join(map(str, case)))
+def test_int_semantics(engine, case):
+	name, *args = case
+	expected = Interpreter(parse()).call(name, *args)
+	assert INT_MIN <= expected <= INT_MAX
+	assert ENGINES[engine](parse()).call(name, *args) == expected
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('case', BOOL_CASES, ids=lambda case: '-'.join(map(str, case)))
+def test_bool_semantics(engine, case):
+	# Los bool son True y False en todos los motores de Python, también
+	# los que se leen de un arreglo.
+	name, *args = case
+	expected = Interpreter(parse()).call(name, *args)
+	result = ENGINES[engine](parse()).call(name, *args)
+	assert result.__class__ is bool and result == expected
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('divisor', [0.0, -0.0])
+def test_float_division_by_zero(engine, divisor):
+	with pytest.raises(ExecutionError, match='División por cero'):
+		ENGINES[engine](parse()).call('fdiv', 1.0, divisor)
+
+
+def test_vm_overflow_is_execution_error():
+	# Un argumento que no cabe en 64 bits no cabe en el array('q')
+	vm = VM(compile_program(parse()))
+	with pytest.raises(ExecutionError):
+		vm.call('keep', 1 << 70)
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason='sin compilador de C')
+@pytest.mark.parametrize('case', CASES, ids=lambda case: '-'.join(map(str, case)))
+def test_int_semantics_x86(case, tmp_path):
+	import x86
+	name, *args = case
+	expected = Interpreter(parse()).call(name, *args)
+	module = ir.lower(parse())
+	exe = x86.build(x86.generate(module), module, name, str(tmp_path / 'prog'))
+	out = subprocess.run([exe, *map(str, args)], capture_output=True, text=True, timeout=30)
+	assert out.returncode == 0, out.stderr
+	assert int(out.stdout.split()[0]) == expected
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason='sin compilador de C')
+@pytest.mark.parametrize('checked', [True, False])
+def test_float_division_x86(checked, tmp_path):
+	# Con checked la división de float por cero termina con código 3, como
+	# la de int; NaN no es cero y se divide normalmente.
+	import x86
+	module = ir.lower(parse())
+	exe = x86.build(x86.generate(module, checked), module, 'fdiv', str(tmp_path / 'prog'))
+	def run(*args):
+		return subprocess.run([exe, *args], capture_output=True, text=True, timeout=30)
+	assert float(run('7.5', '2').stdout.split()[0]) == 3.75
+	assert run('1', 'nan').stdout.split()[0] == 'nan'
+	out = run('1', '0')
+	if checked:
+		assert out.returncode == 3 and 'División por cero' in out.stderr
+	else:
+		assert out.returncode == 0 and out.stdout.split()[0] == 'inf'
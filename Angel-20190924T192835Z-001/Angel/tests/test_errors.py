@@ -0,0 +1,53 @@
+# coding: utf-8
+'''
+Pruebas de errors.py: el colector global no guarda registros y escribe
+cada mensaje al reportarlo.
+'''
+import io
+
+import errors
+from errors import Diagnostics
+
+
+class _Stream(io.StringIO):
+	'''
+	StringIO que cuenta las llamadas a flush().
+	'''
+	flushes = 0
+
+	def flush(self):
+		self.flushes += 1
+
+
+def test_default_collector_counts_without_keeping_records(monkeypatch):
+	stream = _Stream()
+	monkeypatch.setattr(errors._default, 'stream', stream)
+	errors.clear_errors()
+	for i in range(1000):
+		errors.error(i, 'Error de prueba')
+	errors.warning(5, 'Advertencia')
+	assert errors.errors_reported() == 1000
+	assert len(errors._default.records) == 0
+	assert stream.getvalue().count('\n') == 1001
+	assert stream.getvalue().startswith('0: Error de prueba\n')
+	assert stream.flushes == 0
+	errors.clear_errors()
+	assert errors.errors_reported() == 0
+
+
+def test_keep_bounds_records():
+	with Diagnostics(echo=False, keep=3) as diag:
+		for i in range(10):
+			errors.error(i, 'x')
+	assert [ d.lineno for d in diag.records ] == [7, 8, 9]
+	assert diag.num_errors == 10
+
+
+def test_batched_collector_keeps_everything():
+	stream = _Stream()
+	with Diagnostics(stream=stream, batch=4) as diag:
+		for i in range(10):
+			errors.error(i, 'x')
+		assert stream.getvalue().count('\n') == 8
+	assert len(diag.records) == 10
+	assert stream.getvalue().count('\n') == 10
@@ -0,0 +1,139 @@
+# coding: utf-8
+'''
+Pruebas de incremental.py: después de cada edición el árbol debe ser el
+mismo que da cparse.parse() con el texto editado, lineno incluido.
+'''
+import io
+import random
+
+import cparse
+from errors import Diagnostics
+from incremental import IncrementalParser
+
+SOURCE = '''int g;
+int f(int a) {
+	return a + 1;
+}
+
+float h(float x) {
+	float y;
+	y = x * 2.0;
+	return y;
+}
+int k(int n) { if (n < 2) return n; return k(n - 1); }
+int main(void) {
+	while (g < 10) { g = g + f(g); }
+	return k(g);
+}
+'''
+
+SNIPPETS = ['\n', '\n\n', ' ', 'g = g + 1;', 'int q;', '}', '{', ';', '// nota\n',
+	'/* nota */', '/*', 'int z(int a) { return a; }\n', 'return 0;', '(', '1']
+
+
+def dump(ast):
+	out = io.StringIO()
+	cparse.write_ast(ast, out)
+	return out.getvalue()
+
+
+def expected(text):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(text)
+	return dump(ast), [ (d.lineno, d.code) for d in diag.records ]
+
+
+def check(inc, call):
+	with Diagnostics(echo=False) as diag:
+		ast = call()
+	assert ast is inc.ast
+	assert (dump(ast), [ (d.lineno, d.code) for d in diag.records ]) == expected(inc.text)
+
+
+def start(text=SOURCE):
+	inc = IncrementalParser()
+	check(inc, lambda: inc.parse(text))
+	return inc
+
+
+def test_edit_inside_one_function():
+	inc = start()
+	program = inc.ast
+	decls = list(inc.ast.decl_list)
+	pos = SOURCE.index('y = x * 2.0;')
+	check(inc, lambda: inc.edit(pos, pos, 'y = x;\n\t'))
+	assert inc.ast is program
+	assert inc.partial_parses == 1 and inc.full_parses == 1
+	# Solo cambia h; las declaraciones siguientes se reutilizan con el
+	# lineno corrido una línea
+	assert inc.ast.decl_list[:2] == decls[:2]
+	assert inc.ast.decl_list[2] is not decls[2]
+	assert inc.ast.decl_list[3:] == decls[3:]
+	assert inc.ast.decl_list[3].lineno == 12
+
+
+def test_edit_without_new_lines_keeps_line_numbers():
+	inc = start()
+	pos = SOURCE.index('a + 1')
+	check(inc, lambda: inc.edit(pos, pos + 5, 'a * 2 - 3'))
+	assert inc.partial_parses == 1
+
+
+def test_edit_spanning_declarations():
+	inc = start()
+	lo = SOURCE.index('return a + 1;')
+	hi = SOURCE.index('y = x * 2.0;')
+	check(inc, lambda: inc.edit(lo, hi, 'return a; }\nint m(float x) {\n\tfloat y;\n\t'))
+	assert [ decl.name for decl in inc.ast.decl_list ] == ['g', 'f', 'm', 'k', 'main']
+	assert inc.partial_parses == 1
+
+
+def test_edit_that_joins_declarations():
+	inc = start()
+	lo = SOURCE.index('\treturn a + 1;\n}')
+	hi = SOURCE.index('float y;')
+	check(inc, lambda: inc.edit(lo, hi, ''))
+	assert [ decl.name for decl in inc.ast.decl_list ] == ['g', 'f', 'k', 'main']
+
+
+def test_syntax_error_falls_back_to_full_parse():
+	inc = start()
+	pos = SOURCE.index('return y;')
+	check(inc, lambda: inc.edit(pos, pos, 'y = ;'))
+	assert inc.partial_parses == 0 and inc.full_parses == 2
+	assert inc.spans is None
+	# Sin posiciones válidas la siguiente edición también es completa
+	check(inc, lambda: inc.edit(pos, pos + 5, ''))
+	assert inc.full_parses == 3
+	check(inc, lambda: inc.update(SOURCE))
+	assert inc.partial_parses == 1
+
+
+def test_unclosed_comment_falls_back_to_full_parse():
+	inc = start()
+	pos = SOURCE.index('float h')
+	check(inc, lambda: inc.edit(pos, pos, '/* '))
+	assert inc.partial_parses == 0
+
+
+def test_random_edits():
+	# Mezcla ediciones arbitrarias con otras que suelen dejar el programa
+	# válido (insertar en un límite entre sentencias) para que se usen
+	# tanto el análisis parcial como el completo
+	rng = random.Random(1234)
+	inc = start()
+	for step in range(600):
+		text = inc.text
+		if inc.spans is None and rng.random() < 0.3:
+			check(inc, lambda: inc.update(SOURCE))
+			continue
+		if rng.random() < 0.6:
+			bounds = [ i + 1 for i, c in enumerate(text) if c in ';{}\n' ]
+			lo = hi = rng.choice(bounds)
+			new = rng.choice(SNIPPETS[:5] + ['// nota\n', '/* nota */'])
+		else:
+			lo = rng.randrange(len(text) + 1)
+			hi = min(len(text), lo + rng.choice([0, 0, 1, 3, 10, 40]))
+			new = rng.choice(SNIPPETS + [SOURCE[lo:hi], ''])
+		check(inc, lambda: inc.edit(lo, hi, new))
+	assert inc.partial_parses > 100 and inc.full_parses > 50
@@ -0,0 +1,139 @@
+# coding: utf-8
+'''
+Pruebas de ir.py: forma de los bloques y saltos que produce lower() para
+cada sentencia de control, y constantes internadas por Function.const.
+'''
+import cparse
+import ir
+from cast import *
+from errors import Diagnostics
+from ir import OPNAMES
+from typecheck import check_types
+
+
+def lower(source):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(source) if isinstance(source, str) else source
+		check_types(ast)
+	assert not diag.records, diag.records
+	return ir.lower(ast).functions[0]
+
+
+def cfg(func):
+	'''
+	Por bloque: la instrucción final, los sucesores y los predecesores.
+	'''
+	return [ (OPNAMES[block.code[-4]].lower(), block.succ, block.pred) for block in func.blocks ]
+
+
+def ops(block):
+	return [ OPNAMES[op].lower() for op, _, _, _ in block ]
+
+
+def test_if_else():
+	func = lower('int f(int a) { if (a > 0) a = 1; else a = 2; return a; }')
+	assert cfg(func) == [
+		('br', [1, 2], []),
+		('jump', [3], [0]),       # then
+		('jump', [3], [0]),       # else
+		('ret', [], [1, 2]),      # join
+		('retv', [], []),         # después del return: inalcanzable
+	]
+	assert ops(func.blocks[0]) == ['gt', 'br']
+
+
+def test_if_without_else_jumps_to_the_join():
+	func = lower('int f(int a) { if (a > 0) a = 1; return a; }')
+	assert cfg(func)[:3] == [('br', [1, 2], []), ('jump', [2], [0]), ('ret', [], [0, 1])]
+
+
+def test_short_circuit_condition_does_not_materialize_a_bool():
+	func = lower('int f(int a) { if (a > 0 && a < 10) return 1; return 0; }')
+	assert cfg(func) == [
+		('br', [1, 4], []),
+		('br', [2, 4], [0]),
+		('ret', [], [1]),
+		('jump', [4], []),
+		('ret', [], [0, 1, 3]),
+		('retv', [], []),
+	]
+	assert 'mov' not in ops(func.blocks[0]) + ops(func.blocks[1])
+
+
+def test_while_and_break():
+	source = '''int f(int n) {
+		int s;
+		while (n > 0) {
+			if (n == 3) break;
+			s = s + n;
+			n = n - 1;
+		}
+		return s;
+	}'''
+	func = lower(source)
+	assert cfg(func) == [
+		('jump', [1], []),
+		('br', [2, 6], [0, 5]),   # cabecera: condición del while
+		('br', [3, 5], [1]),      # if (n == 3)
+		('jump', [6], [2]),       # break: a la salida del ciclo
+		('jump', [5], []),        # lo que sigue al break
+		('jump', [1], [2, 4]),    # resto del cuerpo y vuelta a la cabecera
+		('ret', [], [1, 3]),      # salida
+		('retv', [], []),
+	]
+
+
+def test_break_outside_a_loop_is_ignored():
+	# El checker no lo rechaza; lower() no emite nada para él
+	func = lower('int f(int a) { break; return a; }')
+	assert cfg(func)[0] == ('ret', [], [])
+
+
+def _for_program():
+	'''
+	int f(int n) { int s; for (int i = 0; i < n; i = i + 1) { s = s + i; } return s; }
+
+	La gramática no construye ForStmt, así que el árbol se arma a mano.
+	'''
+	def read(name):
+		return ReadLocation(SimpleLocation(name))
+	body = Compound_Stmt([], [WriteLocation(SimpleLocation('s'), BinOp('+', read('s'), read('i')))])
+	with trusted_nodes():
+		# updpStmt es una asignación, que no es una Expression
+		loop = ForStmt(LocalDecl('i', SimpleType('int'), IntegerLiteral(0)),
+			BinOp('<', read('i'), read('n')),
+			WriteLocation(SimpleLocation('i'), BinOp('+', read('i'), IntegerLiteral(1))), body)
+	return Program([FuncDeclaration('f', [FuncParameter('n', SimpleType('int'))], SimpleType('int'),
+		Compound_Stmt([LocalDecl('s', SimpleType('int'), None)], [loop, Return_Stmt(read('s'))]))])
+
+
+def test_for():
+	func = lower(_for_program())
+	assert cfg(func) == [
+		('jump', [1], []),        # inicialización
+		('br', [2, 3], [0, 2]),   # condición
+		('jump', [1], [1]),       # cuerpo y actualización
+		('ret', [], [1]),
+		('retv', [], []),
+	]
+	assert ops(func.blocks[0]) == ['mov', 'mov', 'jump']
+	assert ops(func.blocks[2]) == ['add', 'mov', 'add', 'mov', 'jump']
+	# La variable del for solo existe dentro del ciclo
+	assert func.regnames == ['n', 's', 'i', None, None, None]
+
+
+def test_return_ends_the_block():
+	func = lower('int f(int a) { return a; a = 2; }')
+	assert cfg(func) == [('ret', [], []), ('retv', [], [])]
+	assert ops(func.blocks[1]) == ['mov', 'retv']
+
+
+def test_constants_are_interned():
+	func = lower('int f(int a) { return a * 2 + 2 * a - 2; }')
+	assert func.consts == [2]
+	f = ir.Function('g')
+	assert f.const(1) == f.const(1)
+	# 1, 1.0 y True son iguales en Python pero son constantes distintas
+	assert len({ f.const(1), f.const(1.0), f.const(True), f.const(None) }) == 4
+	assert [ f.value(f.const(v)) for v in (1, 1.0, True) ] == [1, 1.0, True]
+	assert f.value(f.const(True)).__class__ is bool
@@ -0,0 +1,105 @@
+# coding: utf-8
+'''
+Pruebas de lexer.py contra cparse: los tokens de Lexer deben formar
+programas que la gramática acepta, con los valores y líneas correctos.
+'''
+import pytest
+
+import cparse
+from cast import *
+from errors import Diagnostics
+from lexer import Lexer
+from scanner import Scanner
+
+
+def parse(source, lexer=None):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(source, lexer or Lexer())
+	return ast, [ (d.lineno, d.code) for d in diag.records ]
+
+
+def body(ast, index=0):
+	return ast.decl_list[index].body.stmt_list
+
+
+def test_program_parses_without_errors():
+	source = '''
+	int n;
+	float x = 2.5;
+	int f(int a, float b) {
+		int v[];
+		v = new int[a];
+		if (a != 0) return v.size;
+		while (a < 10 && a > 0) { a = a - 1; }
+		return a;
+	}
+	int main(void) { return f(3, 1.0); }
+	'''
+	ast, errors = parse(source)
+	assert errors == []
+	assert [ decl.__class__ for decl in ast.decl_list ] == [VarDeclaration, VarDeclaration,
+		FuncDeclaration, FuncDeclaration]
+
+
+def test_comparison_operators_reach_the_grammar():
+	ast, errors = parse('int f(int a) { if (a != 1) return a < 2; return a >= 3; }')
+	assert errors == []
+	stmt = body(ast)[0]
+	assert stmt.condition.op == '!=' and stmt.true_block.value.op == '<'
+	assert body(ast)[1].value.op == '>='
+
+
+def test_keywords_and_identifiers():
+	# 'interval' y 'newx' empiezan con palabras reservadas pero son nombres
+	ast, errors = parse('int interval; int newx; int f(int note) { return note; }')
+	assert errors == []
+	assert [ decl.name for decl in ast.decl_list ] == ['interval', 'newx', 'f']
+
+
+def test_literal_values():
+	ast, errors = parse('int f(void) { return 0 + 42 + 0x1F + 0b101; }')
+	assert errors == []
+	values = []
+	node = body(ast)[0].value
+	while node.__class__ is BinOp:
+		values.append(node.right.value)
+		node = node.left
+	values.append(node.value)
+	assert values[::-1] == [0, 42, 31, 5]
+	ast, errors = parse('float g(void) { return 3.25; }')
+	assert body(ast)[0].value.value == 3.25
+
+
+def test_minus_is_not_part_of_the_literal():
+	ast, errors = parse('int f(int a) { return a-1; }')
+	assert errors == []
+	value = body(ast)[0].value
+	assert value.__class__ is BinOp and value.op == '-' and value.right.value == 1
+	ast, errors = parse('int g(void) { return -1; }')
+	value = body(ast)[0].value
+	assert value.__class__ is UnaryOp and value.right.value == 1
+
+
+def test_line_numbers_survive_comments():
+	source = 'int a; // uno\n/* dos */\n\nint b; /* tres */\n// cuatro\nint c;\n'
+	ast, errors = parse(source)
+	assert errors == []
+	assert [ decl.lineno for decl in ast.decl_list ] == [1, 4, 6]
+
+
+def test_errors_keep_line_numbers():
+	ast, errors = parse('int a;\nint b @;\n')
+	assert (2, 'caracter-ilegal') in errors
+	ast, errors = parse('int a;\n/* sin cerrar\n')
+	assert errors[0] == (2, 'comentario-no-cerrado')
+
+
+@pytest.mark.parametrize('source', [
+	'int f(int n) { if (n < 2) return n; return f(n - 1) + f(n - 2); }',
+	'int g; int h(int a) { g = a * 2; while (g > 0) { g = g - 3; } return g != 1; }',
+	'int f(void) { int v[]; v = new int[4]; v[0] = 1; return v[0] % 3 / 2; }',
+])
+def test_scanner_builds_the_same_tree(source):
+	ast, errors = parse(source)
+	assert errors == []
+	assert repr(parse(source, Scanner())) == repr((ast, errors))
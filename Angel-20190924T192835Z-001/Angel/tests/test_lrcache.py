@@ -0,0 +1,24 @@
+# coding: utf-8
+'''
+Pruebas de lrcache.py: solo se acepta una versión de SLY conocida.
+'''
+import pytest
+import sly
+
+import lrcache
+
+
+def test_installed_sly_is_supported():
+	lrcache._check_sly()
+
+
+def test_other_sly_version_is_rejected(monkeypatch):
+	monkeypatch.setattr(sly, '__version__', '0.6')
+	with pytest.raises(ImportError, match='SLY 0.6'):
+		lrcache._check_sly()
+
+
+def test_missing_private_method_is_rejected(monkeypatch):
+	monkeypatch.delattr(sly.Parser, '_Parser__build_grammar')
+	with pytest.raises(ImportError, match='_Parser__build_grammar'):
+		lrcache._check_sly()
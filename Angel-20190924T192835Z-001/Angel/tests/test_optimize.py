@@ -0,0 +1,150 @@
+# coding: utf-8
+'''
+Pruebas de optimize.py: cada paso debe conservar el resultado de los
+programas.
+'''
+import copy
+
+import pytest
+
+import cparse
+import optimize
+from errors import Diagnostics
+from interp import Interpreter
+from typecheck import check_types
+
+
+def parse(source):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(source)
+		check_types(ast)
+	assert not diag.records, diag.records
+	return ast
+
+
+def check(source, name, *args, passes=optimize.DEFAULT_PASSES):
+	'''
+	Optimiza source con passes y compara el resultado de name(*args)
+	con el del programa original. El árbol optimizado debe seguir
+	pasando la verificación de tipos.
+	'''
+	ast = parse(source)
+	expected = Interpreter(copy.deepcopy(ast)).call(name, *args)
+	opt, stats = optimize.optimize(ast, passes)
+	with Diagnostics(echo=False) as diag:
+		check_types(opt)
+	assert not diag.records, diag.records
+	assert Interpreter(opt).call(name, *args) == expected
+	return stats
+
+
+def test_dead_store_keeps_declaration_assigned_in_initializer():
+	# La declaración de x no tiene valor, pero el inicializador de y la
+	# asigna: eliminarla dejaba 'x = n + 1' sin declarar.
+	source = '''
+	int f(int n) {
+		int x;
+		int y = (x = n + 1);
+		return y;
+	}
+	'''
+	stats = check(source, 'f', 4, passes=('dead',))
+	assert stats['dead']['decls'] == 0
+
+
+def test_dead_store_removes_unused_assignment():
+	source = '''
+	int f(int n) {
+		int x;
+		int y;
+		x = n * 2;
+		y = n + 1;
+		return y;
+	}
+	'''
+	stats = check(source, 'f', 4, passes=('dead',))
+	assert stats['dead']['stores'] == 1
+	assert stats['dead']['decls'] == 1
+
+
+def test_unreachable_drops_constant_branch():
+	source = '''
+	int f(int n) {
+		if (1 == 2) n = n + 100;
+		return n;
+	}
+	'''
+	check(source, 'f', 3, passes=('unreachable',))
+
+
+def test_cse_reuses_expression():
+	source = '''
+	int f(int a, int b) {
+		int x;
+		int y;
+		x = (a + b) * (a - b);
+		y = (a + b) * (a - b) + 1;
+		return x + y;
+	}
+	'''
+	stats = check(source, 'f', 7, 3, passes=('cse',))
+	assert stats['cse']['replaced'] >= 1
+
+
+def test_cse_respects_intervening_store():
+	source = '''
+	int f(int a, int b) {
+		int x;
+		int y;
+		x = (a + b) * (a - b);
+		a = a + 1;
+		y = (a + b) * (a - b);
+		return x + y;
+	}
+	'''
+	check(source, 'f', 7, 3, passes=('cse',))
+
+
+def test_licm_keeps_loop_result():
+	source = '''
+	int f(int n, int k) {
+		int i;
+		int s;
+		i = 0;
+		s = 0;
+		while (i < n) {
+			s = s + k * k + i;
+			i = i + 1;
+		}
+		return s;
+	}
+	'''
+	check(source, 'f', 10, 3, passes=('licm',))
+
+
+@pytest.mark.parametrize('n', [0, 3, 20])
+def test_inline_with_globals(n):
+	source = '''
+	int total;
+	int sq(int x) { return x * x; }
+	int clamp(int v, int lo, int hi) {
+		if (v < lo) return lo;
+		if (v > hi) return hi;
+		return v;
+	}
+	void tally(int v) { total = total + v; }
+	int f(int n) {
+		int i;
+		int s;
+		i = 0;
+		s = 0;
+		while (i < n) {
+			s = s + sq(i) + clamp(i * 3, 2, 40);
+			tally(i);
+			i = i + 1;
+		}
+		return s + total;
+	}
+	'''
+	stats = check(source, 'f', n)
+	assert stats['inline']['calls'] >= 3
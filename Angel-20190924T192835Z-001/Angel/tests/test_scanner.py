@@ -0,0 +1,76 @@
+# coding: utf-8
+'''
+Pruebas de scanner.py: Scanner debe producir los mismos tokens y los
+mismos errores que lexer.Lexer.
+'''
+import io
+
+import pytest
+
+from errors import Diagnostics
+from lexer import Lexer
+from scanner import Scanner, tokenize_file
+
+CASES = {
+	'palabras reservadas': 'int if else for do while return break char delete void float size bool true false const new not',
+	'prefijo reservado': 'interval format done iffy returns newx notx sizes int1 if2',
+	'identificadores': 'a Z x1 abc123 sub add me pe',
+	'enteros': '0 7 42 00 007 0x1F 0XfF 0b101 0B1 0b2 0x 0x1F0b1',
+	'reales': '3. 3.25 0.5 10.0 1.2.3 3.x',
+	'signo': '-1 - 1 -1.5 x-1 x--1 x-=1 --x',
+	'operadores': '< <= > >= = == ! != && || + ++ += * *= / /= % %= -- -=',
+	'literales': '( ) { } [ ] ; , . & |',
+	'comentario de línea': 'a // comentario ; x = 1\nb // al final',
+	'comentario de bloque': 'a /* uno */ b /* dos */ c\n/* tres */ d',
+	'comentario sin cerrar': 'a /* abierto\nb',
+	'comentario sin cerrar al final': 'a /* abierto',
+	'ignorados': 'a \t b\t\tc   ;\t(',
+	'líneas': '\n\na\n\n\nb\nc\n',
+	'cadenas': '"s" \'c\' "abc" \'a b\' "sin cerrar',
+	'retorno de carro': 'a\r\nb\rc',
+	'ilegales': 'a @ b # c $ ` ~ ?',
+	'programa': 'int f(int n) {\n\tif (n < 2) return n;\n\treturn f(n - 1) + f(n - 2);\n}\n',
+}
+
+
+def tokens(lexer, text):
+	with Diagnostics(echo=False) as diag:
+		result = [ (tok.type, tok.value, tok.lineno, tok.index, tok.end)
+			for tok in lexer.tokenize(text) ]
+	return result, [ (d.lineno, d.column, d.code) for d in diag.records ]
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_same_tokens_and_errors(name):
+	text = CASES[name]
+	assert tokens(Scanner(), text) == tokens(Lexer(), text)
+
+
+def test_keyword_prefix_is_one_identifier():
+	toks, errs = tokens(Scanner(), 'interval notx int')
+	assert [ (ty, value) for ty, value, *_ in toks ] == [
+		('IDENT', 'interval'), ('IDENT', 'notx'), ('INT', 'int')]
+
+
+def test_number_values():
+	toks, errs = tokens(Scanner(), '0 42 0x1F 0b101 3. 2.5')
+	assert [ (ty, value) for ty, value, *_ in toks ] == [
+		('INT_LIT', 0), ('INT_LIT', 42), ('INT_LIT', 31), ('INT_LIT', 5),
+		('FLOAT_LIT', 3.0), ('FLOAT_LIT', 2.5)]
+
+
+def test_comments_keep_line_numbers():
+	toks, errs = tokens(Scanner(), 'a // x\nb /* y */\n/* z\nc')
+	assert [ (value, lineno) for _, value, lineno, *_ in toks ] == [
+		('a', 1), ('b', 2), ('c', 4)]
+	assert errs == [(3, 1, 'comentario-no-cerrado')]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64])
+def test_tokenize_file_matches_whole_text(chunk_size):
+	text = ''.join(CASES.values())
+	expected, _ = tokens(Lexer(), text)
+	with Diagnostics(echo=False):
+		actual = [ (tok.type, tok.value, tok.lineno, tok.index, tok.end)
+			for tok in tokenize_file(io.StringIO(text), Scanner(), chunk_size) ]
+	assert actual == expected
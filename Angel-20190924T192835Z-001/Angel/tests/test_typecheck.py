@@ -0,0 +1,96 @@
+# coding: utf-8
+'''
+Pruebas de typecheck.py: el type guardado en cada expresión sale de
+BINARY_OPS y UNARY_OPS, y las combinaciones que no están en las tablas
+se reportan con el código 'tipos'.
+'''
+import pytest
+
+import cparse
+from cast import *
+from errors import Diagnostics
+from typecheck import BINARY_OPS, UNARY_OPS, ERROR, check_types, type_of
+
+# Operadores que la gramática acepta en el texto fuente; el resto de las
+# llaves de las tablas son los nombres de los operadores compuestos
+OPERATORS = { '+', '-', '*', '/', '%', '<', '>', '<=', '>=', '==', '!=', '&&', '||', '!' }
+
+
+def check(source):
+	with Diagnostics(echo=False) as diag:
+		ast = cparse.parse(source)
+		assert not diag.records, diag.records
+		check_types(ast)
+	return ast, [ (d.lineno, d.code, d.message) for d in diag.records ]
+
+
+def find(ast, cls):
+	return [ node for _, node in iter_flatten(ast) if node.__class__ is cls ]
+
+
+@pytest.mark.parametrize('key', sorted(key for key in BINARY_OPS if key[0] in OPERATORS))
+def test_binary_types(key):
+	op, left, right = key
+	result = BINARY_OPS[key]
+	ast, errors = check(f'{result} f({left} a, {right} b) {{ return a {op} b; }}')
+	assert errors == []
+	[node] = find(ast, BinOp)
+	assert node.type == result
+	assert [ read.type for read in find(ast, ReadLocation) ] == [left, right]
+
+
+@pytest.mark.parametrize('key', sorted(key for key in UNARY_OPS if key[0] in OPERATORS))
+def test_unary_types(key):
+	op, operand = key
+	result = UNARY_OPS[key]
+	ast, errors = check(f'{result} f({operand} a) {{ return {op}a; }}')
+	assert errors == []
+	[node] = find(ast, UnaryOp)
+	assert node.type == result
+
+
+def test_call_array_and_location_types():
+	source = '''
+	float g(int n, bool b) { return 1.5; }
+	int f(int n) {
+		char c[];
+		float x;
+		c = new char[n + 1];
+		x = g(c.size, n < 3);
+		return c.size;
+	}
+	'''
+	ast, errors = check(source)
+	assert errors == []
+	[call] = find(ast, FuncCall)
+	assert call.type == 'float'
+	[new] = find(ast, NewArrayExpr)
+	assert new.type == 'char[]'
+	reads = find(ast, ReadLocation)
+	assert [ read.location.name for read in reads ] == ['n', 'n']
+	assert all(read.type == type_of(read.location) == 'int' for read in reads)
+	assert [ size.type for size in find(ast, ArraySize) ] == ['int', 'int']
+	assert [ w.type for w in find(ast, WriteLocation) ] == ['char[]', 'float']
+
+
+@pytest.mark.parametrize('source, lineno, message', [
+	('float f(int a, float b) { return a + b; }', 1, "Operador '+' no soportado entre int y float"),
+	('bool f(int a) { return !a; }', 1, "Operador '!' no soportado para int"),
+	('int f(bool a, bool b) { return a < b; }', 1, "Operador '<' no soportado entre bool y bool"),
+	('int f(float a, float b) { return a % b; }', 1, "Operador '%' no soportado entre float y float"),
+	('int g(int a, float b) { return a; }\nint f(void) {\n\treturn g(1, 2);\n}',
+		3, "Argumento 2 de 'g' debe ser float, no int"),
+	('int f(void) { int v[]; v = new int[2.0]; return 0; }',
+		1, 'El tamaño del arreglo debe ser int, no float'),
+])
+def test_mismatches_are_reported(source, lineno, message):
+	ast, errors = check(source)
+	assert errors == [(lineno, 'tipos', message)]
+
+
+def test_errors_are_not_reported_twice():
+	# La suma inválida deja ERROR en las expresiones que la contienen
+	ast, errors = check('bool f(int a, float b) { return !(a + b) && (a + b) * 2 > 1; }')
+	assert [ text for _, _, text in errors ] == ["Operador '+' no soportado entre int y float"] * 2
+	assert { node.type for node in find(ast, BinOp) if node.op != '+' } == {ERROR}
+	assert find(ast, UnaryOp)[0].type == ERROR
@@ -0,0 +1,274 @@
+# coding: utf-8
+'''
+Verificación de tipos.
+
+TypeCheckVisitor extiende checker.CheckProgramVisitor (que resuelve los
+nombres) y calcula en postorden el tipo de cada expresión, que queda
+guardado en el atributo type del nodo: las expresiones, las Location y
+WriteLocation. Los pasos siguientes leen node.type (o type_of(node)) sin
+volver a calcular nada.
+
+Los tipos son cadenas: 'int', 'float', 'bool', 'char', 'void', y para
+los arreglos el tipo del elemento seguido de '[]'. ERROR marca una
+expresión que ya produjo un error; las expresiones que la contienen
+también son ERROR y no se vuelven a reportar.
+
+La compatibilidad de operadores y tipos sale de las tablas BINARY_OPS y
+UNARY_OPS, indexadas por (operador, tipos de los operandos).
+
+    from typecheck import check_types
+    check_types(ast)
+'''
+from checker import CheckProgramVisitor
+from cast import *
+
+ERROR = '<error>'
+
+# Nombres de los operadores compuestos de la gramática (ME es '-=', etc.)
+_COMPOUND = { 'me': '-', 'pe': '+', 'de': '/', 'te': '*', 'mde': '%' }
+
+
+def _build_binary_ops():
+	table = { }
+	for ty in ('int', 'float'):
+		for op in ('+', '-', '*', '/'):
+			table[op, ty, ty] = ty
+	table['%', 'int', 'int'] = 'int'
+	for ty in ('int', 'float', 'char'):
+		for op in ('<', '>', '<=', '>='):
+			table[op, ty, ty] = 'bool'
+	for ty in ('int', 'float', 'char', 'bool'):
+		for op in ('==', '!='):
+			table[op, ty, ty] = 'bool'
+	for op in ('&&', '||'):
+		table[op, 'bool', 'bool'] = 'bool'
+	for name, op in _COMPOUND.items():
+		for (o, left, right), result in list(table.items()):
+			if o == op:
+				table[name, left, right] = result
+	return table
+
+
+def _build_unary_ops():
+	table = { }
+	for ty in ('int', 'float'):
+		for op in ('-', '+', 'add', 'sub'):
+			table[op, ty] = ty
+	table['!', 'bool'] = 'bool'
+	return table
+
+# (operador, tipo izquierdo, tipo derecho) -> tipo del resultado
+BINARY_OPS = _build_binary_ops()
+
+# (operador, tipo del operando) -> tipo del resultado
+UNARY_OPS = _build_unary_ops()
+
+# Tipos admitidos como condición de if/while
+CONDITION_TYPES = frozenset(['bool', 'int'])
+
+_LITERAL_TYPES = {
+	IntegerLiteral: 'int',
+	FloatLiteral: 'float',
+	BoolLiteral: 'bool',
+	CharLiteral: 'char',
+	StringLiteral: 'char[]',
+	Size: 'int',
+}
+
+
+def type_of(node):
+	'''
+	Tipo ya calculado de node, o None si no tiene.
+	'''
+	return getattr(node, 'type', None)
+
+
+class TypeCheckVisitor(CheckProgramVisitor):
+	'''
+	Resuelve los nombres y verifica los tipos del programa.
+	'''
+	def __init__(self):
+		super().__init__()
+		self.function = None
+
+	def mismatch(self, node, message):
+		self.error(getattr(node, 'lineno', None), message, 'tipos')
+
+	def enter_FuncDeclaration(self, node):
+		super().enter_FuncDeclaration(node)
+		self.function = node
+
+	def leave_FuncDeclaration(self, node):
+		super().leave_FuncDeclaration(node)
+		self.function = None
+
+	# Declaraciones con valor inicial
+
+	def _check_init(self, node, declared):
+		value = node.value
+		if value is not None:
+			ty = getattr(value, 'type', ERROR)
+			if ty != declared and ty is not ERROR and declared is not None:
+				self.mismatch(node, f"No se puede inicializar '{node.name}' ({declared}) con {ty}")
+
+	def leave_VarDeclaration(self, node):
+		self._check_init(node, getattr(node.type_spec, 'name', None))
+		super().leave_VarDeclaration(node)
+
+	def leave_LocalDecl(self, node):
+		self._check_init(node, getattr(node.type_spec, 'name', None))
+		super().leave_LocalDecl(node)
+
+	# Expresiones
+
+	def enter(self, node):
+		# Literales y demás nodos sin gancho propio
+		ty = _LITERAL_TYPES.get(node.__class__)
+		if ty is not None:
+			node.type = ty
+
+	def enter_SimpleLocation(self, node):
+		symbol = super().enter_SimpleLocation(node)
+		if symbol is None:
+			node.type = ERROR
+		elif symbol.kind == 'func':
+			self.mismatch(node, f"'{node.name}' es una función")
+			node.type = ERROR
+		elif symbol.kind == 'array':
+			node.type = f'{symbol.type}[]'
+		else:
+			node.type = symbol.type if symbol.type is not None else ERROR
+
+	def enter_ArraySimpleLocation(self, node):
+		symbol = super().enter_ArraySimpleLocation(node)
+		if symbol is None:
+			node.type = ERROR
+		elif symbol.kind != 'array':
+			self.mismatch(node, f"'{node.name}' no es un arreglo")
+			node.type = ERROR
+		else:
+			node.type = symbol.type
+
+	def enter_ArraySize(self, node):
+		symbol = super().enter_ArraySize(node)
+		if symbol is None:
+			node.type = ERROR
+		elif symbol.kind != 'array':
+			self.mismatch(node, f"'{node.name}' no es un arreglo")
+			node.type = ERROR
+		else:
+			node.type = 'int'
+
+	def leave_ArraySimpleLocation(self, node):
+		ty = getattr(node.size, 'type', ERROR)
+		if ty != 'int' and ty is not ERROR:
+			self.mismatch(node, f"El índice de '{node.name}' debe ser int, no {ty}")
+
+	def leave_ReadLocation(self, node):
+		node.type = getattr(node.location, 'type', ERROR)
+
+	def leave_WriteLocation(self, node):
+		target = getattr(node.location, 'type', ERROR)
+		ty = getattr(node.value, 'type', ERROR)
+		if target is ERROR or ty is ERROR:
+			node.type = ERROR
+		elif target != ty:
+			self.mismatch(node, f"No se puede asignar {ty} a '{node.location.name}' ({target})")
+			node.type = ERROR
+		else:
+			node.type = target
+
+	def leave_BinOp(self, node):
+		left = getattr(node.left, 'type', ERROR)
+		right = getattr(node.right, 'type', ERROR)
+		ty = BINARY_OPS.get((node.op, left, right))
+		if ty is None:
+			if left is not ERROR and right is not ERROR:
+				self.mismatch(node, f"Operador '{node.op}' no soportado entre {left} y {right}")
+			ty = ERROR
+		node.type = ty
+
+	def leave_UnaryOp(self, node):
+		operand = getattr(node.right, 'type', ERROR)
+		ty = UNARY_OPS.get((node.op, operand))
+		if ty is None:
+			if operand is not ERROR:
+				self.mismatch(node, f"Operador '{node.op}' no soportado para {operand}")
+			ty = ERROR
+		node.type = ty
+
+	def leave_FuncCall(self, node):
+		symbol = self.symtab.lookup(node.name)
+		if symbol is None or symbol.kind != 'func':
+			node.type = ERROR
+			return
+		node.type = symbol.type
+		if len(node.arguments) != len(symbol.params):
+			return
+		for i, (arg, param) in enumerate(zip(node.arguments, symbol.params), 1):
+			ty = getattr(arg, 'type', ERROR)
+			expected = getattr(param.type_spec, 'name', None)
+			if ty != expected and ty is not ERROR:
+				self.mismatch(node, f"Argumento {i} de '{node.name}' debe ser {expected}, no {ty}")
+
+	def leave_NewArrayExpr(self, node):
+		ty = getattr(node.expr, 'type', ERROR)
+		if ty != 'int' and ty is not ERROR:
+			self.mismatch(node, f'El tamaño del arreglo debe ser int, no {ty}')
+		node.type = f'{node.type_spec.name}[]'
+
+	# Sentencias
+
+	def _check_condition(self, node):
+		ty = getattr(node.condition, 'type', ERROR)
+		if ty not in CONDITION_TYPES and ty is not ERROR:
+			self.mismatch(node, f'La condición debe ser bool o int, no {ty}')
+
+	def leave_If_Stmt(self, node):
+		self._check_condition(node)
+
+	def leave_While_Stmt(self, node):
+		self._check_condition(node)
+
+	def leave_Return_Stmt(self, node):
+		if self.function is None:
+			return
+		expected = getattr(self.function.type_spec, 'name', None)
+		if node.value is None:
+			if expected != 'void':
+				self.mismatch(node, f"'{self.function.name}' debe retornar {expected}")
+			return
+		ty = getattr(node.value, 'type', ERROR)
+		if ty != expected and ty is not ERROR:
+			self.mismatch(node, f"'{self.function.name}' debe retornar {expected}, no {ty}")
+
+
+def check_types(ast):
+	'''
+	Resuelve nombres y verifica tipos. Retorna el TypeCheckVisitor usado.
+	'''
+	checker = TypeCheckVisitor()
+	checker.visit(ast)
+	return checker
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 typecheck.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_types(ast)
+	raise SystemExit(1 if diag.records else 0)
+
+if __name__ == '__main__':
+	main()
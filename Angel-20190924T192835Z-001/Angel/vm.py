@@ -0,0 +1,319 @@
+# coding: utf-8
+'''
+Máquina virtual de registros para MiniC.
+
+assemble(module) toma un ir.Module y genera, por cada función, un Code:
+el bytecode de todos sus bloques seguidos en un array('i') de cuatro
+enteros por instrucción (op, d, a, b), con los mismos códigos de
+operación de ir. Al ensamblar:
+
+  - los saltos a bloques pasan a ser posiciones dentro del array, y se
+    eliminan los JUMP al bloque que sigue;
+  - los operandos constantes se vuelven registros: la constante k de la
+    función ocupa el registro nregs + k, que ya viene cargado en la
+    plantilla del marco. Así todo operando R/W es un índice en la lista
+    de registros, sin preguntar si es constante.
+
+VM ejecuta el bytecode. Cada llamada crea un marco (copia de la
+plantilla de registros de la función) y guarda el del llamador en una
+pila explícita, de modo que la recursión de MiniC no usa la pila de
+Python. Las operaciones aritméticas y de comparación se despachan con
+tablas precalculadas indexadas por código de operación (BINARY_TABLE y
+UNARY_TABLE) que guardan directamente la función de operator (o la de
+interp.INT_OPERATORS para ADD, SUB y MUL, que dan la vuelta en 64 bits
+como en x86); el resto se atiende en el ciclo principal. NEWARRAY crea
+un array tipado con el typecode de ir.TYPECODES, salvo los de bool: un
+array('b') se leería como 1 y 0, así que son listas de False y se leen
+como True o False, igual que en los demás motores. Un valor que no cabe
+en el array (p.ej. un argumento int de más de 64 bits) es un
+ExecutionError.
+
+    from vm import compile_program, VM
+    vm = VM(compile_program(ast))      # ast ya pasó por typecheck
+    print(vm.call('fib', 20))
+'''
+import operator
+from array import array
+
+import ir
+from ir import (MOV, LOADG, STOREG, ALOAD, ASTORE, NEWARRAY, ALEN, PARAM, CALL, JUMP,
+	BR, RET, RETV, NOP)
+from interp import ExecutionError, INT_OPERATORS, c_div, c_mod, wrap
+
+# Profundidad máxima de llamadas anidadas
+MAX_DEPTH = 10000
+
+
+def _build_binary_table():
+	ops = {
+		'ADD': INT_OPERATORS['+'], 'SUB': INT_OPERATORS['-'], 'MUL': INT_OPERATORS['*'],
+		'DIV': c_div, 'MOD': c_mod,
+		'FADD': operator.add, 'FSUB': operator.sub, 'FMUL': operator.mul,
+		'FDIV': operator.truediv,
+		'LT': operator.lt, 'LE': operator.le, 'GT': operator.gt, 'GE': operator.ge,
+		'EQ': operator.eq, 'NE': operator.ne,
+	}
+	return [ ops.get(name) for name in ir.OPNAMES ]
+
+
+def _build_unary_table():
+	ops = { 'MOV': None, 'NEG': lambda a: wrap(-a), 'FNEG': operator.neg, 'NOT': operator.not_, 'ALEN': len }
+	return [ ops.get(name) for name in ir.OPNAMES ]
+
+# Código de operación -> función de dos operandos (o None)
+BINARY_TABLE = _build_binary_table()
+
+# Código de operación -> función de un operando (o None)
+UNARY_TABLE = _build_unary_table()
+
+
+class Code(object):
+	'''
+	Función ensamblada. code es el bytecode; frame es la plantilla de los
+	registros: nregs valores None seguidos de las constantes. params son
+	los registros de los parámetros.
+	'''
+	__slots__ = ('name', 'code', 'nregs', 'frame', 'params')
+
+	def __init__(self, name, code, nregs, frame, params):
+		self.name = name
+		self.code = code
+		self.nregs = nregs
+		self.frame = frame
+		self.params = params
+
+	def __len__(self):
+		return len(self.code) >> 2
+
+	def dump(self):
+		lines = [f'code {self.name} ({self.nregs} registros, {len(self.frame) - self.nregs} constantes)']
+		code = self.code
+		for pc in range(0, len(code), 4):
+			op, d, a, b = code[pc:pc+4]
+			fields = ' '.join(str(v) for kind, v in zip(ir.FORMATS[op], (d, a, b)) if kind != '-')
+			lines.append(f'  {pc:5d}  {ir.OPNAMES[op].lower():8s} {fields}')
+		return '\n'.join(lines)
+
+
+class Bytecode(object):
+	'''
+	Módulo ensamblado: las funciones (en el orden de ir.Module.functions),
+	la función de inicialización de globales y sus valores iniciales.
+	'''
+	def __init__(self, functions, function_index, init, globals, global_values):
+		self.functions = functions
+		self.function_index = function_index
+		self.init = init
+		self.globals = globals
+		self.global_values = global_values
+
+	def size(self):
+		'''
+		Bytes de bytecode de todas las funciones.
+		'''
+		return sum(len(c.code) * c.code.itemsize for c in [self.init, *self.functions])
+
+
+def assemble_function(func):
+	'''
+	Ensambla una ir.Function en un Code.
+	'''
+	nregs = func.nregs
+	blocks = func.blocks
+
+	def operand(v):
+		return v if v >= 0 else nregs - 1 - v
+
+	# Primera pasada: posición de cada bloque sin los JUMP al siguiente
+	offsets = []
+	pc = 0
+	for block in blocks:
+		offsets.append(pc)
+		n = len(block)
+		if n and block.code[-4] == JUMP and block.code[-3] == block.index + 1:
+			n -= 1
+		for op, _, _, _ in block:
+			if op == NOP:
+				n -= 1
+		pc += 4 * n
+
+	code = array('i')
+	for block in blocks:
+		last = len(block) - 1
+		for i, (op, d, a, b) in enumerate(block):
+			if op == NOP:
+				continue
+			if op == JUMP:
+				if i == last and d == block.index + 1:
+					continue
+				code.extend((JUMP, offsets[d], 0, 0))
+			elif op == BR:
+				code.extend((BR, operand(d), offsets[a], offsets[b]))
+			else:
+				fmt = ir.FORMATS[op]
+				code.extend((op,
+					operand(d) if fmt[0] in 'RW' else d,
+					operand(a) if fmt[1] in 'RW' else a,
+					operand(b) if fmt[2] in 'RW' else b))
+	frame = [None] * nregs + list(func.consts)
+	return Code(func.name, code, nregs, frame, list(func.params))
+
+
+def assemble(module):
+	'''
+	Ensambla un ir.Module en un Bytecode.
+	'''
+	return Bytecode([ assemble_function(func) for func in module.functions ],
+		dict(module.function_index), assemble_function(module.init),
+		list(module.globals), list(module.global_values))
+
+
+def compile_program(program):
+	'''
+	Traduce un Program (ya verificado con typecheck) a Bytecode.
+	'''
+	return assemble(ir.lower(program))
+
+
+class VM(object):
+	'''
+	Ejecuta un Bytecode. Al construirla se inicializan las globales.
+	'''
+	def __init__(self, bytecode):
+		self.bytecode = bytecode
+		self.globals = list(bytecode.global_values)
+		self.run(bytecode.init, ())
+
+	def call(self, name, *args):
+		index = self.bytecode.function_index.get(name)
+		if index is None:
+			raise ExecutionError(f"La función '{name}' no existe")
+		func = self.bytecode.functions[index]
+		if len(args) != len(func.params):
+			raise ExecutionError(f"'{name}' espera {len(func.params)} argumentos y recibió {len(args)}")
+		return self.run(func, args)
+
+	def run(self, func, args):
+		'''
+		Ejecuta func con los argumentos args hasta que retorna.
+		'''
+		functions = self.bytecode.functions
+		globals_ = self.globals
+		binary = BINARY_TABLE
+		unary = UNARY_TABLE
+
+		regs = func.frame[:]
+		for reg, arg in zip(func.params, args):
+			regs[reg] = arg
+		code = func.code
+		pc = 0
+		# Marcos de los llamadores: (func, code, regs, pc, registro destino)
+		stack = []
+		pending = []
+		try:
+			while True:
+				op = code[pc]
+				f = binary[op]
+				if f is not None:
+					regs[code[pc+1]] = f(regs[code[pc+2]], regs[code[pc+3]])
+					pc += 4
+				elif op == BR:
+					pc = code[pc+2] if regs[code[pc+1]] else code[pc+3]
+				elif op == MOV:
+					regs[code[pc+1]] = regs[code[pc+2]]
+					pc += 4
+				elif op == JUMP:
+					pc = code[pc+1]
+				elif op == ALOAD:
+					index = regs[code[pc+3]]
+					if index < 0:
+						raise IndexError(index)
+					regs[code[pc+1]] = regs[code[pc+2]][index]
+					pc += 4
+				elif op == ASTORE:
+					index = regs[code[pc+2]]
+					if index < 0:
+						raise IndexError(index)
+					regs[code[pc+1]][index] = regs[code[pc+3]]
+					pc += 4
+				elif op == LOADG:
+					regs[code[pc+1]] = globals_[code[pc+2]]
+					pc += 4
+				elif op == STOREG:
+					globals_[code[pc+1]] = regs[code[pc+2]]
+					pc += 4
+				elif op == PARAM:
+					pending.append(regs[code[pc+2]])
+					pc += 4
+				elif op == CALL:
+					if len(stack) >= MAX_DEPTH:
+						raise ExecutionError(f"Demasiadas llamadas anidadas en '{func.name}'")
+					stack.append((func, code, regs, pc + 4, code[pc+1]))
+					func = functions[code[pc+2]]
+					regs = func.frame[:]
+					for reg, arg in zip(func.params, pending):
+						regs[reg] = arg
+					pending.clear()
+					code = func.code
+					pc = 0
+				elif op == RET or op == RETV:
+					value = regs[code[pc+1]] if op == RET else None
+					if not stack:
+						return value
+					func, code, regs, pc, dest = stack.pop()
+					regs[dest] = value
+				elif unary[op] is not None:
+					regs[code[pc+1]] = unary[op](regs[code[pc+2]])
+					pc += 4
+				elif op == NEWARRAY:
+					size = regs[code[pc+2]]
+					if size < 0:
+						raise ExecutionError(f'Tamaño de arreglo negativo: {size}')
+					typecode = regs[code[pc+3]]
+					if typecode == 'b':
+						regs[code[pc+1]] = [False] * size
+					else:
+						regs[code[pc+1]] = array(typecode, bytes(size * array(typecode).itemsize))
+					pc += 4
+				else:
+					raise ExecutionError(f'Código de operación inválido {op} en {func.name}:{pc}')
+		except IndexError:
+			raise ExecutionError(f'Índice fuera del arreglo en {func.name}:{pc}') from None
+		except ZeroDivisionError:
+			raise ExecutionError(f'División por cero en {func.name}:{pc}') from None
+		except OverflowError:
+			raise ExecutionError(f'Valor fuera de rango en {func.name}:{pc}') from None
+		except TypeError:
+			if code[pc] in (ALOAD, ASTORE, ALEN):
+				raise ExecutionError(f'Arreglo sin crear en {func.name}:{pc}') from None
+			raise
+
+
+def main():
+	'''
+	Programa principal. Usado para probar.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+	from typecheck import check_types
+
+	if len(sys.argv) < 3:
+		sys.stderr.write('Uso: python3 vm.py filename función [argumentos...]\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_types(ast)
+	if diag.records:
+		raise SystemExit(1)
+	args = [ float(arg) if '.' in arg else int(arg) for arg in sys.argv[3:] ]
+	try:
+		print(VM(compile_program(ast)).call(sys.argv[2], *args))
+	except ExecutionError as e:
+		print(e, file=sys.stderr)
+		raise SystemExit(1)
+
+if __name__ == '__main__':
+	main()
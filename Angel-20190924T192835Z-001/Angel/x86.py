@@ -0,0 +1,774 @@
+# coding: utf-8
+'''
+Generación de código x86-64 (System V, sintaxis de GNU as).
+
+generate(module) traduce un ir.Module (el resultado de ir.lower sobre un
+AST verificado con typecheck) a texto de ensamblador. Cada ir.Function
+es una función mc_<nombre>; las globales son símbolos g_<nombre> en
+.data. build() ensambla y enlaza ese texto con el toolchain del sistema
+(cc), junto con un runtime en C (RUNTIME_C) y un main que llama a una
+función con los argumentos de la línea de comandos.
+
+Los registros virtuales se asignan con linear scan (Poletto y Sarkar):
+el intervalo de cada registro sale de la vivacidad por bloque, y se
+asignan en orden de inicio. Los intervalos que cruzan una llamada solo
+reciben registros que preserva el llamado (rbx, r12-r15); los demás
+prefieren rsi, rdi y r8-r10. Si no queda ninguno libre se desaloja el
+intervalo activo que termina más tarde a una posición de la pila. rax,
+rcx, rdx y r11 quedan libres para las secuencias de cada instrucción.
+
+Convenciones:
+
+  - int, bool y char ocupan 64 bits y la aritmética entera da la vuelta
+    (la semántica de interp); INT_MIN / -1, que en idivq es una
+    excepción, se emite aparte: da INT_MIN y su resto 0;
+  - los float viajan como bits en registros enteros y se operan en
+    xmm0/xmm1, de modo que todas las funciones reciben y retornan en
+    registros enteros (el main generado los reinterpreta);
+  - un arreglo es un puntero a sus elementos (8 bytes cada uno) con el
+    número de elementos en la posición -1; NEWARRAY llama a
+    minic_new_array;
+  - con checked (por omisión) se verifica el índice y que el arreglo
+    exista, y la división por cero (de int y de float); los errores
+    terminan el programa con un mensaje (código de salida 3);
+  - una comparación seguida del BR que usa su resultado se emite como
+    cmp + salto condicional.
+
+Las funciones pueden tener hasta 6 parámetros.
+
+    from x86 import generate, build
+    module = ir.lower(ast)
+    text = generate(module)
+    exe = build(text, module, 'fib', 'fib.exe')
+    subprocess.run([exe, '30'])
+'''
+import os
+import struct
+import subprocess
+import tempfile
+
+import ir
+from ir import (MOV, ADD, SUB, MUL, DIV, MOD, NEG, FADD, FSUB, FMUL, FDIV, FNEG, NOT,
+	LT, LE, GT, GE, EQ, NE, LOADG, STOREG, ALOAD, ASTORE, NEWARRAY, ALEN, PARAM, CALL,
+	JUMP, BR, RET, RETV, NOP)
+
+
+class CodegenError(Exception):
+	'''
+	Programa que este generador no puede traducir.
+	'''
+
+ARG_REGS = ['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9']
+
+# Registros asignables: los que preserva el llamado y los que no
+CALLEE_SAVED = ['%rbx', '%r12', '%r13', '%r14', '%r15']
+CALLER_SAVED = ['%rsi', '%rdi', '%r8', '%r9', '%r10']
+
+# Código de operación -> sufijo de setcc/jcc, para enteros y para float
+_INT_CC = { LT: 'l', LE: 'le', GT: 'g', GE: 'ge', EQ: 'e', NE: 'ne' }
+_FLOAT_CC = { LT: 'b', LE: 'be', GT: 'a', GE: 'ae', EQ: 'e', NE: 'ne' }
+_NEGATE = { 'l': 'ge', 'le': 'g', 'g': 'le', 'ge': 'l', 'e': 'ne', 'ne': 'e',
+	'b': 'ae', 'be': 'a', 'a': 'be', 'ae': 'b' }
+
+_INT_OPS = { ADD: 'addq', SUB: 'subq', MUL: 'imulq' }
+_FLOAT_OPS = { FADD: 'addsd', FSUB: 'subsd', FMUL: 'mulsd', FDIV: 'divsd' }
+
+# Operaciones que llaman a otra función (la de NEWARRAY está en el runtime)
+_CALLS = frozenset([CALL, NEWARRAY])
+
+RUNTIME_C = r'''
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+static void fail(const char *message) {
+	fprintf(stderr, "%s\n", message);
+	exit(3);
+}
+
+void minic_oob(void) { fail("Índice fuera del arreglo"); }
+void minic_null(void) { fail("Arreglo sin crear"); }
+void minic_divzero(void) { fail("División por cero"); }
+
+int64_t *minic_new_array(int64_t n) {
+	if (n < 0)
+		fail("Tamaño de arreglo negativo");
+	int64_t *p = calloc((size_t)n + 1, sizeof(int64_t));
+	if (p == NULL)
+		fail("Memoria insuficiente");
+	p[0] = n;
+	return p + 1;
+}
+'''
+
+
+def float_bits(value):
+	'''
+	Entero de 64 bits con la representación IEEE 754 de value.
+	'''
+	return struct.unpack('<q', struct.pack('<d', value))[0]
+
+
+def _fits32(value):
+	return -2**31 <= value < 2**31
+
+
+def _low32(reg):
+	'''
+	Nombre de los 32 bits bajos de un registro: %rax -> %eax, %r8 -> %r8d.
+	'''
+	return reg + 'd' if reg[2:].isdigit() else '%e' + reg[2:]
+
+
+class Interval(object):
+	'''
+	Intervalo de vida de un registro virtual: posiciones [start, end] en
+	el orden lineal de las instrucciones. location es el registro físico
+	('%rbx') o la posición de la pila asignada.
+	'''
+	__slots__ = ('reg', 'start', 'end', 'crosses_call', 'location')
+
+	def __init__(self, reg, start, end):
+		self.reg = reg
+		self.start = start
+		self.end = end
+		self.crosses_call = False
+		self.location = None
+
+	def __repr__(self):
+		return f'Interval(r{self.reg}, {self.start}, {self.end}, {self.location})'
+
+
+def _uses_defs(op, d, a, b):
+	'''
+	Registros virtuales que lee y que escribe una instrucción.
+	'''
+	fmt = ir.FORMATS[op]
+	uses = []
+	defs = []
+	for kind, v in zip(fmt, (d, a, b)):
+		if kind == 'R' and v >= 0:
+			uses.append(v)
+		elif kind == 'W':
+			defs.append(v)
+	return uses, defs
+
+
+def live_intervals(func):
+	'''
+	Intervalos de vida de los registros de func y las posiciones de las
+	llamadas. La vivacidad se calcula por bloque con el algoritmo
+	iterativo clásico.
+	'''
+	blocks = func.blocks
+	use = []
+	defs = []
+	for block in blocks:
+		u = set()
+		d = set()
+		for instr in block:
+			uses, writes = _uses_defs(*instr)
+			u.update(r for r in uses if r not in d)
+			d.update(writes)
+		use.append(u)
+		defs.append(d)
+
+	live_in = [ set() for _ in blocks ]
+	live_out = [ set() for _ in blocks ]
+	changed = True
+	while changed:
+		changed = False
+		for block in reversed(blocks):
+			i = block.index
+			out = set()
+			for s in block.succ:
+				out |= live_in[s]
+			new_in = use[i] | (out - defs[i])
+			if new_in != live_in[i] or out != live_out[i]:
+				live_in[i] = new_in
+				live_out[i] = out
+				changed = True
+
+	intervals = { }
+	calls = []
+
+	def extend(reg, pos):
+		interval = intervals.get(reg)
+		if interval is None:
+			intervals[reg] = Interval(reg, pos, pos)
+		elif pos < interval.start:
+			interval.start = pos
+		elif pos > interval.end:
+			interval.end = pos
+
+	# Los parámetros llegan vivos a la posición 0
+	for reg in func.params:
+		extend(reg, 0)
+	pos = 1
+	for block in blocks:
+		start = pos
+		for reg in live_in[block.index]:
+			extend(reg, start)
+		for op, d, a, b in block:
+			uses, writes = _uses_defs(op, d, a, b)
+			for reg in uses:
+				extend(reg, pos)
+			for reg in writes:
+				extend(reg, pos)
+			if op in _CALLS:
+				calls.append(pos)
+			pos += 1
+		for reg in live_out[block.index]:
+			extend(reg, pos - 1)
+
+	for interval in intervals.values():
+		interval.crosses_call = any(interval.start < p < interval.end for p in calls)
+	return intervals, calls
+
+
+def linear_scan(intervals):
+	'''
+	Asigna interval.location a cada intervalo: un registro físico o
+	('stack', k). Retorna el número de posiciones de pila usadas y los
+	registros que preserva el llamado que se usaron.
+	'''
+	order = sorted(intervals.values(), key=lambda iv: iv.start)
+	free_callee = list(CALLEE_SAVED)
+	free_caller = list(CALLER_SAVED)
+	active = []
+	nslots = 0
+	used_callee = set()
+
+	def release(reg):
+		(free_callee if reg in CALLEE_SAVED else free_caller).append(reg)
+
+	for interval in order:
+		# Liberar los intervalos que ya terminaron
+		still = []
+		for other in active:
+			if other.end < interval.start:
+				release(other.location)
+			else:
+				still.append(other)
+		active = still
+
+		reg = None
+		if interval.crosses_call:
+			if free_callee:
+				reg = free_callee.pop(0)
+		elif free_caller:
+			reg = free_caller.pop(0)
+		elif free_callee:
+			reg = free_callee.pop(0)
+
+		if reg is None:
+			# Desalojar el activo compatible que termina más tarde
+			candidates = [ other for other in active
+				if not interval.crosses_call or other.location in CALLEE_SAVED ]
+			victim = max(candidates, key=lambda iv: iv.end, default=None)
+			if victim is not None and victim.end > interval.end:
+				reg = victim.location
+				victim.location = ('stack', nslots)
+				nslots += 1
+				active.remove(victim)
+			else:
+				interval.location = ('stack', nslots)
+				nslots += 1
+				continue
+		interval.location = reg
+		if reg in CALLEE_SAVED:
+			used_callee.add(reg)
+		active.append(interval)
+	return nslots, [ reg for reg in CALLEE_SAVED if reg in used_callee ]
+
+
+class _FunctionCodegen(object):
+	'''
+	Emite el código de una ir.Function.
+	'''
+	def __init__(self, module, func, index, checked):
+		self.module = module
+		self.func = func
+		self.index = index
+		self.checked = checked
+		self.lines = []
+		self.intervals, _ = live_intervals(func)
+		self.nslots, self.saved = linear_scan(self.intervals)
+		self.errors = set()
+		self.nlabels = 0
+		# Operandos de los PARAM emitidos que esperan su CALL
+		self.pending = []
+		uses = { }
+		for block in func.blocks:
+			for instr in block:
+				for reg in _uses_defs(*instr)[0]:
+					uses[reg] = uses.get(reg, 0) + 1
+		self.use_counts = uses
+
+	def emit(self, line):
+		self.lines.append('\t' + line)
+
+	def label(self, block):
+		return f'.L{self.index}_{block}'
+
+	# Operandos
+
+	def is_float(self, v):
+		if v < 0:
+			return isinstance(self.func.value(v), float)
+		return self.func.regtypes[v] == 'float'
+
+	def const(self, v):
+		value = self.func.value(v)
+		if value is None:
+			return 0
+		if isinstance(value, float):
+			return float_bits(value)
+		if isinstance(value, str):
+			raise CodegenError(f'Cadenas no soportadas en {self.func.name}')
+		return int(value)
+
+	def loc(self, v):
+		'''
+		Ubicación de un operando: '%reg', 'N(%rbp)' o '$imm' (solo si cabe
+		en 32 bits; si no, None).
+		'''
+		if v < 0:
+			value = self.const(v)
+			return f'${value}' if _fits32(value) else None
+		interval = self.intervals.get(v)
+		if interval is None:
+			# Registro que nunca se usa: se descarta en %rax
+			return '%rax'
+		location = interval.location
+		if isinstance(location, tuple):
+			return f'{-8 * (len(self.saved) + location[1] + 1)}(%rbp)'
+		return location
+
+	def src(self, v, scratch):
+		'''
+		Operando fuente para una instrucción; las constantes que no caben
+		en 32 bits se cargan en scratch.
+		'''
+		location = self.loc(v)
+		if location is None:
+			self.emit(f'movabsq ${self.const(v)}, {scratch}')
+			return scratch
+		return location
+
+	def reg(self, v, scratch):
+		'''
+		Registro con el valor de v (el suyo, o scratch si no tiene).
+		'''
+		location = self.loc(v)
+		if location is not None and location.startswith('%'):
+			return location
+		self.load(scratch, v)
+		return scratch
+
+	def load(self, reg, v):
+		location = self.loc(v)
+		if location is None:
+			self.emit(f'movabsq ${self.const(v)}, {reg}')
+		elif location == '$0':
+			low = _low32(reg)
+			self.emit(f'xorl {low}, {low}')
+		elif location != reg:
+			self.emit(f'movq {location}, {reg}')
+
+	def store(self, v, reg):
+		location = self.loc(v)
+		if location != reg:
+			self.emit(f'movq {reg}, {location}')
+
+	def move(self, d, a):
+		dst = self.loc(d)
+		if dst.startswith('%'):
+			self.load(dst, a)
+			return
+		source = self.loc(a)
+		if source is not None and not source.endswith('(%rbp)'):
+			if source != dst:
+				self.emit(f'movq {source}, {dst}')
+		else:
+			self.load('%rax', a)
+			self.store(d, '%rax')
+
+	def to_xmm(self, xmm, v):
+		location = self.loc(v)
+		if location is None or location.startswith('$'):
+			self.load('%rax', v)
+			location = '%rax'
+		self.emit(f'movq {location}, {xmm}')
+
+	def fail(self, kind):
+		self.errors.add(kind)
+		return f'.L{self.index}_{kind}'
+
+	# Función
+
+	def generate(self):
+		func = self.func
+		name = f'mc_{func.name}'
+		if len(func.params) > len(ARG_REGS):
+			raise CodegenError(f"'{func.name}' tiene más de {len(ARG_REGS)} parámetros")
+		out = [f'\t.globl {name}', f'\t.type {name}, @function', f'{name}:']
+		self.emit('pushq %rbp')
+		self.emit('movq %rsp, %rbp')
+		for reg in self.saved:
+			self.emit(f'pushq {reg}')
+		frame = 8 * self.nslots
+		if (8 * len(self.saved) + frame) % 16:
+			frame += 8
+		if frame:
+			self.emit(f'subq ${frame}, %rsp')
+		# Parámetros: se apilan todos y se sacan a su ubicación, para no
+		# pisar un registro de argumento que todavía no se leyó
+		for reg in ARG_REGS[:len(func.params)]:
+			self.emit(f'pushq {reg}')
+		for param in reversed(func.params):
+			if param in self.intervals:
+				self.emit(f'popq {self.loc(param)}')
+			else:
+				self.emit('popq %rax')
+
+		blocks = func.blocks
+		for i, block in enumerate(blocks):
+			self.lines.append(f'{self.label(block.index)}:')
+			next_block = blocks[i + 1].index if i + 1 < len(blocks) else None
+			code = list(block)
+			j = 0
+			while j < len(code):
+				op, d, a, b = code[j]
+				if op in _INT_CC and j + 1 < len(code) and self.fuse(code[j], code[j+1], next_block):
+					j += 2
+					continue
+				self.instruction(op, d, a, b, next_block)
+				j += 1
+
+		self.lines.append(f'.L{self.index}_ret:')
+		if self.saved:
+			self.emit(f'leaq {-8 * len(self.saved)}(%rbp), %rsp')
+		for reg in reversed(self.saved):
+			self.emit(f'popq {reg}')
+		self.emit('popq %rbp')
+		self.emit('ret')
+		for kind in sorted(self.errors):
+			self.lines.append(f'.L{self.index}_{kind}:')
+			self.emit(f'call minic_{kind}')
+		self.lines.append(f'\t.size {name}, .-{name}')
+		return '\n'.join(out + self.lines)
+
+	def branch(self, cc, true, false, next_block):
+		if true == next_block:
+			self.emit(f'j{_NEGATE[cc]} {self.label(false)}')
+		else:
+			self.emit(f'j{cc} {self.label(true)}')
+			if false != next_block:
+				self.emit(f'jmp {self.label(false)}')
+
+	def compare(self, op, a, b):
+		'''
+		Emite la comparación de a y b; retorna el sufijo de la condición.
+		'''
+		if self.is_float(a) or self.is_float(b):
+			self.to_xmm('%xmm0', a)
+			self.to_xmm('%xmm1', b)
+			self.emit('ucomisd %xmm1, %xmm0')
+			return _FLOAT_CC[op]
+		left = self.reg(a, '%rax')
+		self.emit(f'cmpq {self.src(b, "%r11")}, {left}')
+		return _INT_CC[op]
+
+	def fuse(self, instr, following, next_block):
+		'''
+		Comparación seguida del BR que la usa: cmp + salto.
+		'''
+		op, d, a, b = instr
+		bop, cond, true, false = following
+		if bop != BR or cond != d or self.use_counts.get(d, 0) != 1:
+			return False
+		cc = self.compare(op, a, b)
+		self.branch(cc, true, false, next_block)
+		return True
+
+	def instruction(self, op, d, a, b, next_block):
+		if op == NOP:
+			return
+		if op == MOV:
+			self.move(d, a)
+		elif op in _INT_OPS:
+			self.arithmetic(_INT_OPS[op], d, a, b)
+		elif op == DIV or op == MOD:
+			self.load('%rax', a)
+			if b < 0 and self.const(b) == -1:
+				# x / -1 es -x y x % -1 es 0, sin idivq
+				if op == DIV:
+					self.emit('negq %rax')
+				else:
+					self.emit('xorl %eax, %eax')
+				self.store(d, '%rax')
+				return
+			divisor = self.reg(b, '%rcx')
+			if self.checked and (b >= 0 or self.const(b) == 0):
+				self.emit(f'testq {divisor}, {divisor}')
+				self.emit(f'je {self.fail("divzero")}')
+			if b >= 0:
+				self.nlabels += 1
+				label = f'.L{self.index}_div{self.nlabels}'
+				done = f'{label}_done'
+				self.emit(f'cmpq $-1, {divisor}')
+				self.emit(f'jne {label}')
+				if op == DIV:
+					self.emit('negq %rax')
+				else:
+					self.emit('xorl %eax, %eax')
+				self.emit(f'jmp {done}')
+				self.lines.append(f'{label}:')
+			self.emit('cqto')
+			self.emit(f'idivq {divisor}')
+			if op == MOD:
+				self.emit('movq %rdx, %rax')
+			if b >= 0:
+				self.lines.append(f'{done}:')
+			self.store(d, '%rax')
+		elif op == NEG:
+			self.load('%rax', a)
+			self.emit('negq %rax')
+			self.store(d, '%rax')
+		elif op in _FLOAT_OPS:
+			self.to_xmm('%xmm0', a)
+			self.to_xmm('%xmm1', b)
+			if op == FDIV and self.checked and (b >= 0 or not self.func.value(b)):
+				# ucomisd con un NaN deja ZF=1 y PF=1: NaN no es cero
+				self.nlabels += 1
+				label = f'.L{self.index}_fdiv{self.nlabels}'
+				self.emit('xorpd %xmm2, %xmm2')
+				self.emit('ucomisd %xmm2, %xmm1')
+				self.emit(f'jp {label}')
+				self.emit(f'je {self.fail("divzero")}')
+				self.lines.append(f'{label}:')
+			self.emit(f'{_FLOAT_OPS[op]} %xmm1, %xmm0')
+			self.emit(f'movq %xmm0, {self.loc(d)}')
+		elif op == FNEG:
+			self.load('%rax', a)
+			self.emit('btcq $63, %rax')
+			self.store(d, '%rax')
+		elif op == NOT:
+			value = self.reg(a, '%rax')
+			self.emit(f'testq {value}, {value}')
+			self.emit('sete %al')
+			self.emit('movzbq %al, %rax')
+			self.store(d, '%rax')
+		elif op in _INT_CC:
+			cc = self.compare(op, a, b)
+			self.emit(f'set{cc} %al')
+			self.emit('movzbq %al, %rax')
+			self.store(d, '%rax')
+		elif op == LOADG:
+			dst = self.loc(d)
+			if dst.startswith('%'):
+				self.emit(f'movq g_{self.module.globals[a]}(%rip), {dst}')
+			else:
+				self.emit(f'movq g_{self.module.globals[a]}(%rip), %rax')
+				self.store(d, '%rax')
+		elif op == STOREG:
+			value = self.reg(a, '%rax')
+			self.emit(f'movq {value}, g_{self.module.globals[d]}(%rip)')
+		elif op == ALOAD:
+			array = self.reg(a, '%rax')
+			index = self.reg(b, '%rcx')
+			self.bounds(array, index)
+			dst = self.loc(d)
+			if dst.startswith('%'):
+				self.emit(f'movq ({array},{index},8), {dst}')
+			else:
+				self.emit(f'movq ({array},{index},8), %rax')
+				self.store(d, '%rax')
+		elif op == ASTORE:
+			array = self.reg(d, '%rax')
+			index = self.reg(a, '%rcx')
+			self.bounds(array, index)
+			value = self.src(b, '%r11')
+			if value.endswith('(%rbp)'):
+				self.emit(f'movq {value}, %r11')
+				value = '%r11'
+			self.emit(f'movq {value}, ({array},{index},8)')
+		elif op == ALEN:
+			array = self.reg(a, '%rax')
+			if self.checked:
+				self.emit(f'testq {array}, {array}')
+				self.emit(f'je {self.fail("null")}')
+			self.emit(f'movq -8({array}), %rax')
+			self.store(d, '%rax')
+		elif op == NEWARRAY:
+			self.load('%rdi', a)
+			self.emit('call minic_new_array')
+			self.store(d, '%rax')
+		elif op == PARAM:
+			self.pending.append(a)
+		elif op == CALL:
+			self.call(d, a, b)
+		elif op == JUMP:
+			if d != next_block:
+				self.emit(f'jmp {self.label(d)}')
+		elif op == BR:
+			if d < 0:
+				target = a if self.const(d) else b
+				if target != next_block:
+					self.emit(f'jmp {self.label(target)}')
+				return
+			value = self.reg(d, '%rax')
+			self.emit(f'testq {value}, {value}')
+			self.branch('ne', a, b, next_block)
+		elif op == RET:
+			self.load('%rax', d)
+			self.emit(f'jmp .L{self.index}_ret')
+		elif op == RETV:
+			self.emit('xorl %eax, %eax')
+			self.emit(f'jmp .L{self.index}_ret')
+		else:
+			raise CodegenError(f'Operación {ir.OPNAMES[op]} no soportada')
+
+	def arithmetic(self, mnemonic, d, a, b):
+		dst = self.loc(d)
+		right = self.loc(b)
+		if dst.startswith('%') and dst != right:
+			self.load(dst, a)
+			self.emit(f'{mnemonic} {self.src(b, "%r11")}, {dst}')
+			return
+		if dst.startswith('%') and mnemonic != 'subq':
+			# d es el mismo registro que b: la operación conmuta
+			self.emit(f'{mnemonic} {self.src(a, "%r11")}, {dst}')
+			return
+		self.load('%rax', a)
+		self.emit(f'{mnemonic} {self.src(b, "%r11")}, %rax')
+		self.store(d, '%rax')
+
+	def bounds(self, array, index):
+		if not self.checked:
+			return
+		self.emit(f'testq {array}, {array}')
+		self.emit(f'je {self.fail("null")}')
+		# Comparación sin signo: un índice negativo también queda fuera
+		self.emit(f'cmpq -8({array}), {index}')
+		self.emit(f'jae {self.fail("oob")}')
+
+	def call(self, d, index, nargs):
+		args = self.pending[len(self.pending) - nargs:]
+		del self.pending[len(self.pending) - nargs:]
+		if nargs > len(ARG_REGS):
+			raise CodegenError(f'Llamada con más de {len(ARG_REGS)} argumentos en {self.func.name}')
+		for arg in args:
+			location = self.loc(arg)
+			if location is None:
+				self.load('%rax', arg)
+				location = '%rax'
+			self.emit(f'pushq {location}')
+		for reg in reversed(ARG_REGS[:nargs]):
+			self.emit(f'popq {reg}')
+		self.emit(f'call mc_{self.module.functions[index].name}')
+		self.store(d, '%rax')
+
+
+def generate(module, checked=True):
+	'''
+	Texto de ensamblador de todo el módulo.
+	'''
+	out = ['\t.data']
+	for name, ty, value in zip(module.globals, module.global_types, module.global_values):
+		if isinstance(value, float):
+			value = float_bits(value)
+		elif value is None:
+			value = 0
+		elif isinstance(value, str):
+			raise CodegenError(f"Cadenas no soportadas en la global '{name}'")
+		out.append(f'g_{name}:\n\t.quad {int(value)}')
+	out.append('\t.text')
+	for index, func in enumerate([*module.functions, module.init]):
+		out.append(_FunctionCodegen(module, func, index, checked).generate())
+	out.append('\t.section .note.GNU-stack,"",@progbits')
+	return '\n'.join(out) + '\n'
+
+
+def driver_source(module, entry):
+	'''
+	main en C que inicializa las globales, llama a entry con los
+	argumentos de la línea de comandos e imprime el resultado y los
+	nanosegundos que tardó la llamada.
+	'''
+	index = module.function_index.get(entry)
+	if index is None:
+		raise CodegenError(f"La función '{entry}' no existe")
+	func = module.functions[index]
+	types = [ func.regtypes[reg] for reg in func.params ]
+	params = ', '.join(['int64_t'] * len(types)) or 'void'
+	lines = [
+		'#include <stdint.h>', '#include <stdio.h>', '#include <stdlib.h>',
+		'#include <string.h>', '#include <time.h>',
+		'void mc___init__(void);',
+		f'int64_t mc_{entry}({params});',
+		'static int64_t bits(double d) { int64_t i; memcpy(&i, &d, 8); return i; }',
+		'static double real(int64_t i) { double d; memcpy(&d, &i, 8); return d; }',
+		'int main(int argc, char **argv) {',
+		f'\tif (argc != {len(types) + 1}) {{ fprintf(stderr, "Uso: %s{" ARG" * len(types)}\\n", argv[0]); return 2; }}',
+		'\tstruct timespec t0, t1;',
+		'\t(void)real;',
+		'\tmc___init__();',
+	]
+	args = [ f'bits(atof(argv[{i+1}]))' if ty == 'float' else f'strtoll(argv[{i+1}], 0, 10)'
+		for i, ty in enumerate(types) ]
+	lines += [
+		'\tclock_gettime(CLOCK_MONOTONIC, &t0);',
+		f'\tint64_t r = mc_{entry}({", ".join(args)});',
+		'\tclock_gettime(CLOCK_MONOTONIC, &t1);',
+		'\tlong long ns = (t1.tv_sec - t0.tv_sec) * 1000000000LL + (t1.tv_nsec - t0.tv_nsec);',
+	]
+	if func.rettype == 'float':
+		lines.append('\tprintf("%.17g %lld\\n", real(r), ns);')
+	else:
+		lines.append('\tprintf("%lld %lld\\n", (long long)r, ns);')
+	lines += ['\t(void)bits;', '\treturn 0;', '}']
+	return '\n'.join(lines) + '\n'
+
+
+def build(text, module, entry, output, cc='cc'):
+	'''
+	Ensambla y enlaza text con el runtime y un main para entry (vea
+	driver_source). Retorna la ruta del ejecutable.
+	'''
+	with tempfile.TemporaryDirectory(prefix='minic-x86-') as tmp:
+		paths = { 'program.s': text, 'runtime.c': RUNTIME_C, 'main.c': driver_source(module, entry) }
+		for name, content in paths.items():
+			with open(os.path.join(tmp, name), 'w') as f:
+				f.write(content)
+		result = subprocess.run([cc, '-O2', '-o', os.path.abspath(output),
+			*(os.path.join(tmp, name) for name in paths)], capture_output=True, text=True)
+		if result.returncode != 0:
+			raise CodegenError(f'{cc} falló:\n{result.stderr}')
+	return os.path.abspath(output)
+
+
+def main():
+	'''
+	Programa principal. Usado para probar: imprime el ensamblador.
+	'''
+	import sys
+	from cparse import parse_file
+	from errors import Diagnostics
+	from typecheck import check_types
+
+	if len(sys.argv) != 2:
+		sys.stderr.write('Uso: python3 x86.py filename\n')
+		raise SystemExit(1)
+
+	with Diagnostics() as diag:
+		ast = parse_file(sys.argv[1])
+		if ast is not None:
+			check_types(ast)
+	if diag.records:
+		raise SystemExit(1)
+	print(generate(ir.lower(ast)), end='')
+
+if __name__ == '__main__':
+	main()